@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Measure concurrent imports with subtree locks.
+
+Runs W imports at once, each adding N new pages in its own process and
+transaction, with the pages of each import either:
+
+* in its own section (disjoint), which shouldn't wait for each other; or
+* all in the same section (overlapping), which queue for its lock.
+
+For each it reports the throughput of all the imports together, and the
+time they spent waiting for locks. With --no-lock the imports are run
+without locks, to compare (overlapping imports are then likely to fail).
+
+Concurrent imports need a database file or server. By default a temporary
+SQLite file is used, which only allows one writer at a time whatever is
+locked. To use PostgreSQL, create a database and run with, e.g.:
+
+    DATABASE_ENGINE=django.db.backends.postgresql \\
+    DATABASE_NAME=benchmark DATABASE_USER=postgres \\
+        python benchmarks/locking.py
+
+Run from the repository root:
+
+    python benchmarks/locking.py [--workers W] [--pages N] [--no-lock]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.app.settings')
+
+
+def make_docs(section, prefix, count):
+    """Make documents for `count' new pages under `section'."""
+    return [
+        {'type': 'app.basicpage', 'url': f'/{section}/{prefix}-{i}/',
+         'title': f"Page {prefix}-{i}", 'body': f"Page {i} body"}
+        for i in range(count)
+    ]
+
+
+def worker(args):
+    """Import pages in one process, returning (seconds, waited, error)."""
+    section, prefix, count, lock = args
+
+    from django.db import transaction
+
+    from wagtailimporter.importer import Importer
+    from wagtailimporter.locking import SubtreeLocks
+
+    importer = Importer(locks=SubtreeLocks() if lock else None)
+    start = time.perf_counter()
+    try:
+        with transaction.atomic():
+            importer.import_documents(make_docs(section, prefix, count))
+    except Exception as exc:  # noqa: E501 pylint:disable=broad-exception-caught
+        return time.perf_counter() - start, 0.0, f"{type(exc).__name__}: {exc}"
+
+    waited = importer.locks.waited if lock else 0.0
+    return time.perf_counter() - start, waited, importer.errors or None
+
+
+def setup_sections(workers):
+    """Create a section for each worker."""
+    from wagtailimporter.importer import Importer
+
+    Importer().import_documents([
+        {'type': 'app.basicpage', 'url': f'/section-{i}/',
+         'title': f"Section {i}"}
+        for i in range(workers)
+    ])
+
+
+def run(name, jobs):
+    """Run `jobs' at once, and report them."""
+    from django.db import connections
+
+    # Each process opens its own connections
+    connections.close_all()
+    start = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+        results = pool.map(worker, jobs)
+    seconds = time.perf_counter() - start
+
+    pages = sum(count for _, _, count, _ in jobs)
+    waited = sum(result[1] for result in results)
+    errors = [result[2] for result in results if result[2]]
+    print(f"{name:<12} {pages:>6} pages {seconds:8.2f}s "
+          f"{pages / seconds:8.1f} pages/s  "
+          f"waited {waited:7.2f}s ({waited / len(jobs):.2f}s/import)  "
+          f"{len(errors)} failed")
+    for error in errors:
+        print(f"  {error}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=100,
+                        help="Pages per import")
+    parser.add_argument('--no-lock', dest='lock', action='store_false')
+    args = parser.parse_args()
+
+    tempdir = None
+    if 'DATABASE_NAME' not in os.environ:
+        tempdir = tempfile.TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        os.environ['DATABASE_NAME'] = os.path.join(tempdir.name, 'db.sqlite3')
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        # Wait for other writers rather than failing
+        settings.DATABASES['default']['OPTIONS'] = {'timeout': 600}
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+    setup_sections(args.workers)
+
+    for run_number, (name, sections) in enumerate((
+            ("disjoint", range(args.workers)),
+            ("overlapping", [0] * args.workers),
+    )):
+        run(name, [
+            (f'section-{section}', f'run{run_number}-w{worker_number}',
+             args.pages, args.lock)
+            for worker_number, section in enumerate(sections)
+        ])
+
+    if tempdir is not None:
+        tempdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
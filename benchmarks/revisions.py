@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Compare the wall time of importing pages with and without revisions.
+
+Imports N new pages into an in-memory database:
+
+* without revisions;
+* with --revisions, which creates and publishes revisions in bulk;
+* without revisions, then calling save_revision().publish() on each page,
+  which is what --revisions replaces.
+
+Run from the repository root:
+
+    python benchmarks/revisions.py [N ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.app.settings')
+
+
+def make_docs(count):
+    """Make documents for `count' pages under a section."""
+    docs = ["url: /section/\ntype: app.basicpage\ntitle: Section"]
+    docs.extend(
+        f"url: /section/page-{i}/\ntype: app.basicpage\ntitle: Page {i}\n"
+        f"body: Page {i} body"
+        for i in range(count)
+    )
+    return '\n---\n'.join(docs)
+
+
+@contextmanager
+def rolled_back():
+    """Roll back the database changes made in the block."""
+    from django.db import transaction
+
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def import_file(filename, **options):
+    """Import a file with import_pages."""
+    from django.core.management import call_command
+
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        call_command('import_pages', filename, stdout=devnull, **options)
+
+
+def publish_each():
+    """Publish a revision of every imported page, one at a time."""
+    from tests.app.models import BasicPage
+
+    for page in BasicPage.objects.all():
+        page.save_revision().publish()
+
+
+def run(count):
+    """Time each way of importing `count' pages."""
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml') as file_:
+        file_.write(make_docs(count))
+        file_.flush()
+
+        timings = {}
+        for name, options, after in (
+                ("no revisions", {}, None),
+                ("--revisions", {'revisions': 'publish'}, None),
+                ("--draft", {'revisions': 'draft'}, None),
+                ("per-page publish()", {}, publish_each),
+        ):
+            with rolled_back():
+                start = time.perf_counter()
+                import_file(file_.name, **options)
+                if after:
+                    after()
+                timings[name] = time.perf_counter() - start
+
+    return timings
+
+
+def main():
+    """Run the benchmark at each size given on the command line."""
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000]
+    for count in sizes:
+        for name, seconds in run(count).items():
+            print(f"{count:>6} pages  {name:<20} {seconds:8.2f}s "
+                  f"{seconds / count * 1000:8.2f}ms/page")
+
+
+if __name__ == '__main__':
+    main()
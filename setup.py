@@ -40,6 +40,9 @@ with open('README.rst') as readme, \
         packages=find_packages(),
         include_package_data=True,
         install_requires=requirements.readlines(),
+        extras_require={
+            'jsonl': ['orjson'],
+        },
         setup_requires=[
             'setuptools_scm',
         ],
@@ -2,8 +2,13 @@
 Models for testing wagtailimporter.
 """
 from django.db import models
+from modelcluster.fields import ParentalKey
+from wagtail import blocks
 from wagtail.contrib.settings.models import BaseSiteSetting, register_setting
-from wagtail.models import Page
+from wagtail.documents.blocks import DocumentChooserBlock
+from wagtail.fields import StreamField
+from wagtail.images.blocks import ImageChooserBlock
+from wagtail.models import Orderable, Page
 
 
 class BasicPage(Page):
@@ -21,6 +26,33 @@ class ForeignKeyPage(Page):
         null=True, blank=True, default=None, on_delete=models.SET_NULL)
 
 
+class StreamPage(Page):
+    """A page with a stream field."""
+    body = StreamField([
+        ('heading', blocks.CharBlock()),
+        ('paragraph', blocks.RichTextBlock()),
+        ('link', blocks.StructBlock([
+            ('page', blocks.PageChooserBlock()),
+            ('text', blocks.CharBlock()),
+        ])),
+        ('gallery', blocks.ListBlock(ImageChooserBlock())),
+        ('download', DocumentChooserBlock()),
+    ], blank=True, use_json_field=True)
+
+
+class RelatedPagesPage(Page):
+    """A page with an inline list of related pages."""
+
+
+class RelatedPage(Orderable):
+    """A related page."""
+    parent = ParentalKey(RelatedPagesPage, related_name='related_pages')
+    page = models.ForeignKey(
+        Page, related_name='+',
+        null=True, blank=True, on_delete=models.CASCADE)
+    text = models.CharField(max_length=255, blank=True)
+
+
 @register_setting
 class BasicSetting(BaseSiteSetting):
     """The simplest setting."""
@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     'wagtail.documents',
     'wagtail.images',
     'wagtail.contrib.routable_page',
+    'wagtail.contrib.settings',
 
 
     'django.contrib.admin',
@@ -35,8 +36,20 @@ ROOT_URLCONF = 'tests.app.urls'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': os.environ.get('DATABASE_ENGINE',
+                                 'django.db.backends.sqlite3'),
         'NAME': os.environ.get('DATABASE_NAME', ':memory:'),
+        'USER': os.environ.get('DATABASE_USER', ''),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', ''),
+        'PORT': os.environ.get('DATABASE_PORT', ''),
+    },
+    # Stands in for a read replica in the routing tests
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('REPLICA_DATABASE_NAME', ':memory:'),
+        # Wagtail's data migrations only work on the default database
+        'TEST': {'MIGRATE': False},
     },
 }
 
@@ -15,14 +15,16 @@ class ImporterTestCaseMixin:
     """
     TestCase mixin for testing the import_pages management command.
     """
-    def run_import(self, yaml,
+    def run_import(self, yaml, suffix=None,
                    **kwargs):
         """
         Run an import with the supplied YAML document. ``stdout`` and
         ``stderr`` are silenced by default, pass in an ``io.StringIO`` instance
-        as a kwarg if you want to collect either.
+        as a kwarg if you want to collect either. Pass ``suffix`` to give the
+        import file an extension.
         """
-        with NamedTemporaryFile('w+', dir=str(self.get_import_dir())) as temp:
+        with NamedTemporaryFile('w+', dir=str(self.get_import_dir()),
+                                suffix=suffix) as temp:
             temp.write(yaml)
             temp.seek(0)
 
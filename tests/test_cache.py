@@ -0,0 +1,71 @@
+"""
+Test the parsed document cache.
+"""
+import textwrap
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import yaml
+from django.test import TestCase
+
+from wagtailimporter import cache, serializer
+
+from .app.models import BasicPage, ForeignKeyPage
+from .base import ImporterTestCaseMixin
+
+
+class TestParseCache(ImporterTestCaseMixin, TestCase):
+    """Test importing with a parse cache."""
+
+    doc = textwrap.dedent(
+        """
+        url: /target/
+        type: app.basicpage
+        title: Target page
+
+        ---
+
+        url: /source/
+        type: app.foreignkeypage
+        title: Source page
+        other_page: !page { url: /target/ }
+        """
+    )
+
+    def test_round_trip(self):
+        """Tag objects survive being cached."""
+        docs = list(yaml.safe_load_all(self.doc))
+        loaded = cache.loads(cache.dumps(docs))
+
+        self.assertEqual(loaded[0], docs[0])
+        self.assertIsInstance(loaded[1]['other_page'], serializer.Page)
+        self.assertEqual(loaded[1]['other_page'].url, '/target/')
+
+    def test_cached_import(self):
+        """The second import is loaded from the cache."""
+        with TemporaryDirectory() as cache_dir:
+            self.run_import(self.doc, cache_dir=cache_dir)
+            BasicPage.objects.update(title="Changed")
+
+            with mock.patch('yaml.safe_load_all') as safe_load_all:
+                self.run_import(self.doc, cache_dir=cache_dir)
+                self.assertFalse(safe_load_all.called)
+
+        self.assertEqual(BasicPage.objects.get().title, "Target page")
+        self.assertEqual(ForeignKeyPage.objects.get().other_page.specific,
+                         BasicPage.objects.get())
+
+    def test_invalidation(self):
+        """Changed files and changed tag registries miss the cache."""
+        with TemporaryDirectory() as cache_dir:
+            parse_cache = cache.ParseCache(cache_dir)
+            key = parse_cache.key(self.doc.encode())
+
+            self.assertNotEqual(
+                key, parse_cache.key(self.doc.encode() + b'\n# edit'))
+
+            with mock.patch.dict(yaml.SafeLoader.yaml_constructors,
+                                 {'!new': serializer.Page.from_yaml}):
+                self.assertNotEqual(key,
+                                    cache.ParseCache(cache_dir).key(
+                                        self.doc.encode()))
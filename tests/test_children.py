@@ -0,0 +1,99 @@
+"""
+Test importing the children of ClusterableModels.
+"""
+import textwrap
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from wagtailimporter.serializer import GetOrCreateClusterableForeignObject
+
+from .app.models import RelatedPage, RelatedPagesPage
+from .base import ImporterTestCaseMixin
+
+
+class RelatedPageTag(GetOrCreateClusterableForeignObject):
+    """A related page."""
+    model = RelatedPage
+    yaml_tag = '!relatedpage'
+    lookup_keys = ('page',)
+
+
+def make_doc(*items):
+    """Make documents for a page with related pages, and the pages."""
+    docs = [
+        f"url: /{slug}/\ntype: app.basicpage\ntitle: {slug}"
+        for slug, _ in items
+    ]
+    related = ', '.join(
+        f"!relatedpage {{ page: !page {{ url: /{slug}/ }}, text: {text} }}"
+        for slug, text in items
+    )
+    docs.append(textwrap.dedent(
+        f"""
+        url: /related/
+        type: app.relatedpagespage
+        title: Related
+        related_pages: [{related}]
+        """
+    ))
+    return '\n---\n'.join(docs)
+
+
+class TestChildren(ImporterTestCaseMixin, TestCase):
+    """Test importing the children of a page."""
+
+    def get_children(self):
+        """Get the page slugs and text of the related pages, in order."""
+        return [(related.page.slug, related.text)
+                for related in RelatedPagesPage.objects.get()
+                .related_pages.order_by('sort_order', 'pk')]
+
+    def test_create(self):
+        """Children of new pages are created."""
+        self.run_import(make_doc(('a', 'A'), ('b', 'B')))
+        self.assertEqual(self.get_children(), [('a', 'A'), ('b', 'B')])
+
+    def test_update(self):
+        """Existing children are matched, changed and removed in bulk."""
+        self.run_import(make_doc(('a', 'A'), ('b', 'B'), ('c', 'C')))
+        ids = dict(RelatedPage.objects.values_list('page__slug', 'pk'))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(make_doc(('c', 'New C'), ('a', 'A'),
+                                     ('d', 'D'), ('e', 'E')))
+
+        self.assertEqual(self.get_children(), [
+            ('c', 'New C'), ('a', 'A'), ('d', 'D'), ('e', 'E'),
+        ])
+
+        related = dict(RelatedPage.objects.values_list('page__slug', 'pk'))
+        self.assertEqual(related['a'], ids['a'])
+        self.assertEqual(related['c'], ids['c'])
+
+        # One query each to find, create and update children, and two to
+        # delete them (Django collects them first, for the signals)
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if '"app_relatedpage"' in query['sql']
+        ]), 5)
+
+    def test_clear(self):
+        """An empty list removes every child."""
+        self.run_import(make_doc(('a', 'A'), ('b', 'B')))
+        self.run_import(make_doc())
+
+        self.assertFalse(RelatedPage.objects.exists())
+
+    def test_revisions(self):
+        """Revisions have the imported children."""
+        self.run_import(make_doc(('a', 'A')), revisions='publish')
+        self.run_import(make_doc(('a', 'A'), ('b', 'B')), revisions='draft')
+
+        page = RelatedPagesPage.objects.get()
+        self.assertEqual(page.related_pages.count(), 1)
+        self.assertEqual(
+            [related.text for related
+             in page.latest_revision.as_object().related_pages.all()],
+            ['A', 'B'])
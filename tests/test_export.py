@@ -0,0 +1,153 @@
+"""
+Test exporting Wagtail pages.
+"""
+import io
+import textwrap
+
+import yaml
+from django.core.management import call_command
+from django.test import TestCase
+from wagtail.images.models import Image
+
+from wagtailimporter import serializer
+
+from .app.models import BasicPage, ForeignKeyPage, StreamPage
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+
+class TestPageExport(ImporterTestCaseMixin, TestCase):
+    """Test exporting Wagtail pages."""
+
+    doc = textwrap.dedent(
+        """
+        url: /site/
+        type: app.basicpage
+        title: Site
+        body: Hello, world!
+
+        ---
+
+        url: /site/target/
+        type: app.basicpage
+        title: Target page
+        show_in_menus: true
+
+        ---
+
+        url: /site/source/
+        type: app.foreignkeypage
+        title: Source page
+        other_page: !page { url: /site/target/ }
+        image: !image { file: floral.jpeg }
+
+        ---
+
+        url: /site/stream/
+        type: app.streampage
+        title: Stream page
+        body:
+            - type: heading
+              value: Welcome
+            - type: link
+              value:
+                  page: !page { url: /site/target/ }
+                  text: Target
+            - type: gallery
+              value:
+                  - !image { file: suunn.jpg }
+        """
+    )
+
+    def run_export(self, url, **kwargs):
+        """Export `url' and return the parsed documents."""
+        stdout = io.StringIO()
+        call_command('export_pages', url, stdout=stdout, **kwargs)
+        return list(yaml.safe_load_all(stdout.getvalue()))
+
+    @fresh_media_root()
+    def test_export(self):
+        """Test the exported documents."""
+        self.run_import(self.doc)
+
+        docs = self.run_export('/site/', batch_size=2)
+        self.assertEqual([doc['url'] for doc in docs],
+                         ['/site/', '/site/target/', '/site/source/',
+                          '/site/stream/'])
+
+        site, target, source, stream = docs
+        self.assertEqual(site['type'], 'app.basicpage')
+        self.assertEqual(site['body'], 'Hello, world!')
+        self.assertNotIn('show_in_menus', site)
+        self.assertTrue(target['show_in_menus'])
+
+        self.assertIsInstance(source['other_page'], serializer.Page)
+        self.assertEqual(source['other_page'].url, '/site/target/')
+        self.assertIsInstance(source['image'], serializer.Image)
+        self.assertEqual(source['image'].file, 'floral.jpeg')
+
+        heading, link, gallery = stream['body']
+        self.assertEqual(heading['value'], 'Welcome')
+        self.assertEqual(link['value']['page'].url, '/site/target/')
+        self.assertEqual(gallery['value'][0].file, 'suunn.jpg')
+
+    @fresh_media_root()
+    def test_round_trip(self):
+        """Exported pages can be imported again."""
+        self.run_import(self.doc)
+
+        stdout = io.StringIO()
+        call_command('export_pages', '/site/', stdout=stdout)
+
+        BasicPage.objects.filter(url_path='/site/target/')\
+            .update(title="Changed")
+        ForeignKeyPage.objects.update(other_page=None)
+
+        self.run_import(stdout.getvalue())
+
+        target = BasicPage.objects.get(url_path='/site/target/')
+        self.assertEqual(target.title, "Target page")
+        self.assertEqual(ForeignKeyPage.objects.get().other_page.specific,
+                         target)
+        self.assertEqual(StreamPage.objects.get().body[1].value['page'].id,
+                         target.id)
+        self.assertEqual(Image.objects.count(), 2)
+
+    @fresh_media_root()
+    def test_uploaded_image(self):
+        """Images that weren't imported are found by their stored name."""
+        self.run_import(self.doc.split('---')[0])
+        self.run_import(textwrap.dedent(
+            """
+            url: /site/source/
+            type: app.foreignkeypage
+            title: Source page
+            image: !image { file: floral.jpeg }
+            """
+        ))
+        # As if uploaded in the admin
+        uploaded = Image.objects.create(title="Uploaded", width=1, height=1,
+                                        file='original_images/uploaded.jpg')
+        ForeignKeyPage.objects.update(image=uploaded)
+
+        stdout = io.StringIO()
+        call_command('export_pages', '/site/', stdout=stdout)
+        _, source = yaml.safe_load_all(stdout.getvalue())
+        self.assertEqual(source['image'].stored_file,
+                         'original_images/uploaded.jpg')
+
+        ForeignKeyPage.objects.update(image=None)
+        self.run_import(stdout.getvalue(), validate=True)
+
+        self.assertEqual(ForeignKeyPage.objects.get().image, uploaded)
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_query_count(self):
+        """The number of queries doesn't grow with the number of pages."""
+        self.run_import(self.doc.split('---')[0])
+        self.run_import('\n---\n'.join(
+            f'url: /site/page-{i}/\ntype: app.basicpage\ntitle: Page {i}'
+            for i in range(20)
+        ))
+
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.run_export('/site/')), 21)
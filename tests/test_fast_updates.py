@@ -0,0 +1,124 @@
+"""
+Test updating existing pages without saving them.
+"""
+import textwrap
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .app.models import BasicPage, StreamPage
+from .base import ImporterTestCaseMixin
+
+
+class TestFastUpdates(ImporterTestCaseMixin, TestCase):
+    """Test importing with --fast-updates."""
+
+    def setUp(self):
+        super().setUp()
+        self.run_import(self.make_docs(title="Page {i}", body="Old"))
+
+    def make_docs(self, **fields):
+        """Make documents for five pages under a section."""
+        docs = [textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: Section
+            """
+        )]
+        for i in range(5):
+            docs.append('\n'.join(
+                [f'url: /section/page-{i}/', 'type: app.basicpage'] + [
+                    f'{key}: {value.format(i=i)}'
+                    for key, value in fields.items()
+                ]))
+        return '\n---\n'.join(docs)
+
+    def updates(self, docs):
+        """
+        Import with fast updates and return the UPDATE queries, apart from
+        the search index's.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(docs, fast_updates=True)
+
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('UPDATE')
+                and 'wagtailsearch' not in query['sql']]
+
+    def test_changed_columns(self):
+        """Only the changed columns are written, in one query per table."""
+        updates = self.updates(self.make_docs(title="Page {i}", body="New"))
+
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"app_basicpage"', updates[0])
+        self.assertNotIn('"title"', updates[0])
+
+        for page in BasicPage.objects.filter(depth=3):
+            self.assertEqual(page.body, "New")
+
+    def test_inherited_columns(self):
+        """Fields from the Page table are updated too."""
+        updates = self.updates(self.make_docs(title="New {i}", body="New"))
+
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            BasicPage.objects.get(url_path='/section/page-3/').title,
+            "New 3")
+
+    def test_unchanged(self):
+        """Pages that haven't changed aren't written."""
+        self.assertEqual(
+            self.updates(self.make_docs(title="Page {i}", body="Old")), [])
+
+    def test_repeated(self):
+        """Later documents for a page see the earlier changes."""
+        docs = textwrap.dedent(
+            """
+            url: /section/page-1/
+            type: app.basicpage
+            body: First
+
+            ---
+
+            url: /section/page-1/
+            type: app.basicpage
+            title: Second
+            """
+        )
+        self.run_import(docs, fast_updates=True)
+
+        page = BasicPage.objects.get(url_path='/section/page-1/')
+        self.assertEqual((page.title, page.body), ("Second", "First"))
+
+    def test_slug_change(self):
+        """Pages are saved when their slug changes."""
+        self.run_import(textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            slug: renamed
+            """
+        ), fast_updates=True)
+
+        self.assertEqual(
+            BasicPage.objects.filter(url_path__startswith='/renamed/')
+            .count(), 6)
+
+    def test_stream_field(self):
+        """Pages are saved when a StreamField changes."""
+        doc = textwrap.dedent(
+            """
+            url: /section/stream/
+            type: app.streampage
+            title: Stream
+            body:
+                - type: heading
+                  value: {heading}
+            """
+        )
+        self.run_import(doc.format(heading="Old"))
+        self.run_import(doc.format(heading="New"), fast_updates=True)
+
+        self.assertEqual(StreamPage.objects.get().body[0].value, "New")
@@ -1,13 +1,19 @@
 """
 Test importing Wagtail pages.
 """
+import hashlib
 import textwrap
 from pathlib import Path
+from unittest import mock
 
 from django.conf import settings
+from django.core.files.images import get_image_dimensions
 from django.test import TestCase
 from wagtail.images.models import Image
 
+from wagtailimporter import serializer
+
+from .app.models import ForeignKeyPage
 from .base import ImporterTestCaseMixin, fresh_media_root
 
 
@@ -88,3 +94,48 @@ class TestImageImport(ImporterTestCaseMixin, TestCase):
         image = Image.objects.get()
         self.assertEqual(Path(image.file.name),
                          Path('original_images') / filename)
+
+    @fresh_media_root()
+    def test_bulk_import(self):
+        """All the new images in a file are created together."""
+        doc = textwrap.dedent(
+            """
+            url: /page/
+            type: app.foreignkeypage
+            title: Page
+            image: !image { file: floral.jpeg }
+
+            ---
+
+            !image
+                title: Lazors
+                file: lazors.jpg
+
+            ---
+
+            !image
+                title: Floral doge
+                file: floral.jpeg
+            """
+        )
+        with mock.patch('wagtailimporter.serializer.Image.stage',
+                        autospec=True,
+                        side_effect=serializer.Image.stage) as stage:
+            self.run_import(doc)
+
+        self.assertEqual(stage.call_count, 2)
+        self.assertEqual(Image.objects.count(), 2)
+
+        page = ForeignKeyPage.objects.get()
+        image = Image.objects.get(file='original_images/images/floral.jpeg')
+        self.assertEqual(page.image, image)
+        self.assertEqual(image.title, "Floral doge")
+
+        # Metadata is filled in the same way Wagtail does
+        original_filename = self.get_import_dir() / 'images/floral.jpeg'
+        with open(str(original_filename), 'rb') as original:
+            self.assertEqual(image.file_hash,
+                             hashlib.sha1(original.read()).hexdigest())
+        self.assertEqual(image.file_size, original_filename.stat().st_size)
+        self.assertEqual((image.width, image.height),
+                         get_image_dimensions(str(original_filename)))
@@ -0,0 +1,119 @@
+"""
+Test importing with the Importer API.
+"""
+import copy
+from unittest import mock
+
+from django.test import TestCase
+from wagtail.images.models import Image
+from wagtail.models import Site
+
+from wagtailimporter import serializer
+from wagtailimporter.importer import (
+    CREATED, FAILED, IMPORTED, UPDATED, Importer)
+
+from .app.models import BasicPage, ForeignKeyPage
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+
+class TestImporter(ImporterTestCaseMixin, TestCase):
+    """Test importing Python objects directly."""
+
+    def test_import_documents(self):
+        """Documents are imported and the results returned."""
+        results = Importer().import_documents(iter([
+            {
+                'url': '/target/',
+                'type': 'app.basicpage',
+                'title': "Target page",
+            },
+            {
+                'url': '/source/',
+                'type': 'app.foreignkeypage',
+                'title': "Source page",
+                'other_page': serializer.Page(url='/target/'),
+            },
+            {
+                'url': '/target/',
+                'type': 'app.basicpage',
+                'title': "New title",
+            },
+            serializer.Site(hostname='example.com',
+                            site_name="Example",
+                            root_page=serializer.Page(url='/target/')),
+            {
+                'url': '/missing/child/',
+                'type': 'app.basicpage',
+            },
+        ]))
+
+        target = BasicPage.objects.get()
+        source = ForeignKeyPage.objects.get()
+        site = Site.objects.get(hostname='example.com')
+
+        self.assertEqual(target.title, "New title")
+        self.assertEqual(source.other_page.specific, target)
+        self.assertEqual(site.root_page.specific, target)
+
+        self.assertEqual([result.action for result in results],
+                         [CREATED, CREATED, UPDATED, IMPORTED, FAILED])
+        self.assertEqual(results[0].object, target)
+        self.assertEqual(results[1].url, '/source/')
+        self.assertEqual(results[3].object, site)
+        self.assertEqual(results[4].error,
+                         "Parent of /missing/child doesn't exist")
+
+    @fresh_media_root()
+    def test_base_dir(self):
+        """Media is found relative to the base directory."""
+        Importer().import_documents([
+            serializer.Image(file='floral.jpeg', title="Floral doge"),
+        ], base_dir=self.get_import_dir())
+
+        self.assertEqual(Image.objects.get().title, "Floral doge")
+
+    def test_batches(self):
+        """Documents are resolved in batches."""
+        importer = Importer()
+        importer.batch_size = 2
+
+        with mock.patch.object(serializer.Image, 'bulk_get_objects') \
+                as bulk_get_objects:
+            results = importer.import_documents(
+                {
+                    'url': f'/page-{i}/',
+                    'type': 'app.basicpage',
+                    'title': f"Page {i}",
+                }
+                for i in range(5)
+            )
+
+        self.assertEqual(bulk_get_objects.call_count, 3)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(BasicPage.objects.count(), 5)
+
+    def test_documents_unchanged(self):
+        """The documents aren't changed, so they can be imported again."""
+        docs = [
+            {
+                'url': '/target/',
+                'type': 'app.basicpage',
+                'title': "Target page",
+            },
+            {
+                'url': '/source/',
+                'type': 'app.basicpage',
+                'title': "Source page",
+                'body': '<p><a data-import-page-url="/target/">Target</a></p>',
+            },
+        ]
+        original = copy.deepcopy(docs)
+
+        Importer().import_documents(docs)
+        self.assertEqual(docs, original)
+
+        results = Importer().import_documents(docs)
+        self.assertEqual([result.action for result in results],
+                         [UPDATED, UPDATED])
+        self.assertIn(f'id="{BasicPage.objects.get(title="Target page").pk}"',
+                      BasicPage.objects.get(title="Source page").body)
@@ -0,0 +1,222 @@
+"""
+Test including fragments shared between import files.
+"""
+import textwrap
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import yaml
+from django.test import SimpleTestCase, TestCase
+
+from wagtailimporter.importer import working_directory
+from wagtailimporter.includes import Fragments, Include
+from wagtailimporter.serializer import Page, Shared
+
+from .app.models import StreamPage
+from .base import ImporterTestCaseMixin
+
+PAGES = textwrap.dedent(
+    """
+    url: /section/
+    type: app.basicpage
+    title: Section
+
+    ---
+
+    url: /section/a/
+    type: app.streampage
+    title: A
+    body:
+        - !include blocks.yml.inc#header
+        - type: paragraph
+          value: <p>Page A</p>
+        - !include blocks.yml.inc#footer
+
+    ---
+
+    url: /section/b/
+    type: app.streampage
+    title: B
+    body:
+        - !include blocks.yml.inc#header
+        - !include blocks.yml.inc#footer
+    """
+)
+
+
+class TestFragments(SimpleTestCase):
+    """Test splicing fragments into documents."""
+
+    def setUp(self):
+        super().setUp()
+        tempdir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(tempdir.cleanup)
+        self.directory = Path(tempdir.name).resolve()
+        self.fragments = Fragments()
+
+    def write(self, name, content):
+        """Write a file in the directory."""
+        (self.directory / name).write_text(textwrap.dedent(content))
+
+    def splice(self, *docs):
+        """Splice fragments into documents from a file in the directory."""
+        return list(self.fragments.splice_documents(
+            docs, self.directory / 'pages.yaml'))
+
+    def test_tag(self):
+        """Includes are written as a path and fragment name."""
+        include = yaml.safe_load("!include blocks.yml#header")
+        self.assertIsInstance(include, Include)
+        self.assertEqual(include.ref, 'blocks.yml#header')
+        self.assertEqual(yaml.safe_dump(include).strip(),
+                         "!include 'blocks.yml#header'")
+
+    def test_splice(self):
+        """Fragments are spliced in by reference, lists into lists."""
+        self.write('blocks.yml', """
+            header: {type: heading, value: Hello}
+            footer:
+                - {type: heading, value: Goodbye}
+                - {type: paragraph, value: <p>Bye</p>}
+            link: {type: link, value: {page: !page {url: /a/}}}
+        """)
+        first, second = self.splice(*(
+            {'body': [Include('blocks.yml#header'),
+                      Include('blocks.yml#footer')],
+             'links': [Include('blocks.yml#link')]}
+            for _ in range(2)))
+
+        self.assertEqual(first['body'], [
+            {'type': 'heading', 'value': 'Hello'},
+            {'type': 'heading', 'value': 'Goodbye'},
+            {'type': 'paragraph', 'value': '<p>Bye</p>'},
+        ])
+        self.assertIs(first['body'][0], second['body'][0])
+        self.assertIsInstance(first['links'][0]['value']['page'], Page)
+        self.assertIs(first['links'][0], second['links'][0])
+
+    def test_whole_field(self):
+        """Tag-free fragments that are whole fields are shared."""
+        self.write('blocks.yml', """
+            body: [{type: heading, value: Hello}]
+            link: {type: link, value: {page: !page {url: /a/}}}
+        """)
+        first, second = self.splice(*(
+            {'body': Include('blocks.yml#body'),
+             'link': Include('blocks.yml#link')}
+            for _ in range(2)))
+
+        self.assertIsInstance(first['body'], Shared)
+        self.assertIs(first['body'], second['body'])
+        self.assertNotIsInstance(first['link'], Shared)
+
+    def test_nested(self):
+        """Fragment files include others relative to themselves."""
+        (self.directory / 'shared').mkdir()
+        self.write('shared/outer.yml', """
+            title: !include inner.yml#title
+        """)
+        self.write('shared/inner.yml', """
+            title: Hello
+        """)
+
+        doc, = self.splice({'page': Include('shared/outer.yml')})
+        self.assertEqual(doc['page'].value, {'title': 'Hello'})
+        self.assertEqual(
+            self.fragments.used[str(self.directory / 'pages.yaml')],
+            {self.directory / 'shared' / 'outer.yml',
+             self.directory / 'shared' / 'inner.yml'})
+
+    def test_parsed_once(self):
+        """Files are only parsed again when they change."""
+        self.write('blocks.yml', "header: Hello\n")
+
+        with mock.patch.object(Fragments, 'parse',
+                               wraps=self.fragments.parse) as parse:
+            self.splice(*[{'a': [Include('blocks.yml#header')]}] * 3)
+            self.assertEqual(parse.call_count, 1)
+
+            # Unchanged files aren't parsed again on the next run
+            self.fragments.revalidate()
+            self.splice({'a': [Include('blocks.yml#header')]})
+            self.assertEqual(parse.call_count, 1)
+
+            self.write('blocks.yml', "header: Goodbye\n")
+            self.fragments.revalidate()
+            doc, = self.splice({'a': [Include('blocks.yml#header')]})
+            self.assertEqual(parse.call_count, 2)
+            self.assertEqual(doc['a'], ['Goodbye'])
+
+    def test_errors(self):
+        """Missing fragments and loops are reported."""
+        self.write('loop.yml', "a: !include loop.yml#a\n")
+        self.write('blocks.yml', "header: Hello\n")
+
+        for ref, message in (
+                ('missing.yml', "can't read it"),
+                ('blocks.yml#footer', "no fragment `footer'"),
+                ('loop.yml#a', "includes itself"),
+                ('#a', "!include needs a path"),
+        ):
+            with self.subTest(ref=ref), \
+                    self.assertRaisesMessage(ValueError, message):
+                self.splice({'a': Include(ref)})
+
+    def test_outside(self):
+        """Files outside the including file's directory can't be read."""
+        (self.directory / 'pages').mkdir()
+        self.write('blocks.yml', "header: Hello\n")
+        self.write('pages/nested.yml', "a: !include ../blocks.yml#header\n")
+
+        for ref, message in (
+                (str(self.directory / 'blocks.yml'), "must be a relative"),
+                ('../blocks.yml#header', "must be under"),
+                ('nested.yml#a', "must be under"),
+        ):
+            with self.subTest(ref=ref), \
+                    self.assertRaisesMessage(ValueError, message):
+                list(self.fragments.splice_documents(
+                    [{'a': Include(ref)}], self.directory / 'pages' / 'x.yml'))
+
+        # Unless they are under the root
+        fragments = Fragments(root=self.directory)
+        doc, = fragments.splice_documents(
+            [{'a': [Include('../blocks.yml#header')]}],
+            self.directory / 'pages' / 'x.yml')
+        self.assertEqual(doc['a'], ['Hello'])
+
+    def test_relative_root(self):
+        """A relative root is relative to where the import started."""
+        (self.directory / 'pages').mkdir()
+        self.write('blocks.yml', "header: Hello\n")
+
+        with working_directory(self.directory):
+            fragments = Fragments(root='.')
+
+        # As while importing a file in `pages'
+        with working_directory(self.directory / 'pages'):
+            doc, = fragments.splice_documents(
+                [{'a': [Include('../blocks.yml#header')]}],
+                self.directory / 'pages' / 'x.yml')
+        self.assertEqual(doc['a'], ['Hello'])
+
+
+class TestIncludeImport(ImporterTestCaseMixin, TestCase):
+    """Test importing documents with includes."""
+
+    def test_import(self):
+        """Included blocks are imported on every page."""
+        self.run_import(PAGES)
+
+        section = StreamPage.objects.get(url_path='/section/a/').get_parent()
+        for url, blocks in (
+                ('/section/a/', ['heading', 'paragraph', 'link',
+                                 'paragraph']),
+                ('/section/b/', ['heading', 'link', 'paragraph']),
+        ):
+            page = StreamPage.objects.get(url_path=url)
+            self.assertEqual([block.block_type for block in page.body],
+                             blocks)
+            self.assertEqual(page.body[0].value, "Welcome")
+            self.assertEqual(page.body[-2].value['page'].pk, section.pk)
@@ -0,0 +1,364 @@
+"""
+Test import jobs queued from the Wagtail admin.
+"""
+import io
+import textwrap
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from wagtail.documents.models import Document
+from wagtail.images.models import Image
+
+from wagtailimporter import jobs, sandbox
+from wagtailimporter.models import ImportJob
+
+from .app.models import BasicPage, StreamPage
+from .base import fresh_media_root
+
+IMPORT_DATA = Path(__file__).parent / 'import_data'
+
+PAGES = textwrap.dedent(
+    """
+    url: /section/
+    type: app.basicpage
+    title: Section
+
+    ---
+
+    url: /section/page/
+    type: app.basicpage
+    title: Page
+    """
+)
+
+
+def make_zip(files):
+    """Make a zip file of a dict of name -> contents."""
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, 'w') as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return content.getvalue()
+
+
+def make_job(name, content, **kwargs):
+    """Queue an ImportJob for a bundle."""
+    if isinstance(content, str):
+        content = content.encode()
+    job = ImportJob(**kwargs)
+    job.file.save(name, ContentFile(content))
+    return job
+
+
+class JobFilesMixin:
+    """Delete the bundles uploaded for jobs after each test."""
+
+    def tearDown(self):
+        for job in ImportJob.objects.all():
+            job.file.storage.delete(job.file.name)
+        super().tearDown()
+
+
+class TestBundle(SimpleTestCase):
+    """Test finding the import files in bundles."""
+
+    def test_bundle_files(self):
+        """Import files are found in order, without fragments or junk."""
+        with TemporaryDirectory() as directory:
+            for name in ('b.yml', 'a/c.jsonl', 'a/blocks.yml.inc',
+                         'images/a.jpg', '.hidden.yml',
+                         '__MACOSX/._b.yml'):
+                path = Path(directory) / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.touch()
+
+            self.assertEqual(jobs.bundle_files(directory),
+                             ['a/c.jsonl', 'b.yml'])
+
+
+class TestJobs(JobFilesMixin, TestCase):
+    """Test claiming and running jobs."""
+
+    @fresh_media_root()
+    def test_claim(self):
+        """Jobs are claimed once each, oldest first."""
+        first = make_job('first.yml', PAGES)
+        second = make_job('second.yml', PAGES)
+
+        job = jobs.claim('worker:1')
+        self.assertEqual(job, first)
+        self.assertEqual(job.status, ImportJob.RUNNING)
+        first.refresh_from_db()
+        self.assertEqual(first.status, ImportJob.RUNNING)
+        self.assertEqual(first.worker, 'worker:1')
+        self.assertIsNotNone(first.started_at)
+
+        self.assertEqual(jobs.claim('worker:2'), second)
+        self.assertIsNone(jobs.claim('worker:3'))
+
+    @fresh_media_root()
+    def test_claim_stale(self):
+        """Running jobs whose heartbeat has stopped are claimed again."""
+        stale = make_job('stale.yml', PAGES, status=ImportJob.RUNNING,
+                         worker='worker:1',
+                         heartbeat_at=timezone.now() - timedelta(minutes=10))
+        make_job('alive.yml', PAGES, status=ImportJob.RUNNING,
+                 worker='worker:2', heartbeat_at=timezone.now())
+
+        # Not without heartbeats, as on SQLite
+        self.assertIsNone(jobs.claim('worker:3', stale_after=60))
+
+        with mock.patch.object(jobs, 'heartbeats', return_value=True):
+            self.assertIsNone(jobs.claim('worker:3'))
+            job = jobs.claim('worker:3', stale_after=60)
+            self.assertEqual(job, stale)
+            self.assertEqual(job.worker, 'worker:3')
+            self.assertIn("Worker worker:1 stopped", job.log)
+            self.assertIsNone(jobs.claim('worker:3', stale_after=60))
+
+        job = jobs.run(job)
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertIn("Worker worker:1 stopped", job.log)
+        self.assertIn("Reading stale.yml", job.log)
+
+    @fresh_media_root()
+    def test_run(self):
+        """Jobs' results are recorded."""
+        make_job('pages.yml', PAGES)
+        job = jobs.run(jobs.claim())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual((job.expected, job.documents, job.created,
+                          job.updated, job.errors),
+                         (2, 2, 2, 0, 0))
+        self.assertIn("Reading pages.yml", job.log)
+        self.assertIn("for 3 subtree locks", job.log)
+        self.assertIsNotNone(job.finished_at)
+        self.assertTrue(BasicPage.objects.filter(
+            url_path='/section/page/').exists())
+
+    @fresh_media_root()
+    def test_zip(self):
+        """Zip files of import files and media are imported."""
+        make_job('bundle.zip', make_zip({
+            'gallery.yml': textwrap.dedent(
+                """
+                url: /gallery/
+                type: app.streampage
+                title: Gallery
+                body:
+                    - type: gallery
+                      value:
+                          - !image { file: lazors.jpg }
+                """
+            ),
+            'images/lazors.jpg':
+                (IMPORT_DATA / 'images' / 'lazors.jpg').read_bytes(),
+        }))
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, ImportJob.DONE, job.log)
+        self.assertEqual(job.created, 1)
+        page = StreamPage.objects.get(url_path='/gallery/')
+        self.assertEqual(list(page.body[0].value), [Image.objects.get()])
+
+    @fresh_media_root()
+    def test_failed(self):
+        """Jobs that can't be imported fail, and nothing is imported."""
+        make_job('pages.yml', PAGES + "---\nurl: /section/other/\n"
+                                      "type: app.nosuchpage\ntitle: Other\n")
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn("1 errors found, nothing imported", job.log)
+        self.assertFalse(BasicPage.objects.filter(
+            url_path='/section/').exists())
+
+        make_job('bundle.zip', make_zip({'readme.txt': "Nothing here"}))
+        job = jobs.run(jobs.claim())
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn("No import files in the bundle", job.log)
+
+    @fresh_media_root()
+    def test_dry_run(self):
+        """Dry runs are rolled back."""
+        make_job('pages.yml', PAGES, dry_run=True)
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.created, 2)
+        self.assertIn("Dry run, rolling back", job.log)
+        self.assertFalse(BasicPage.objects.filter(
+            url_path='/section/').exists())
+
+    @fresh_media_root()
+    def test_outside(self):
+        """Bundles can't read files outside them."""
+        with NamedTemporaryFile('w', suffix='.yml') as outside:
+            outside.write("secret: hunter2\n")
+            outside.flush()
+
+            for name, content in (
+                    ('include.yml',
+                     "url: /secret/\ntype: app.basicpage\n"
+                     f"title: !include {outside.name}#secret\n"),
+                    ('parent.yml', "url: /secret/\ntype: app.basicpage\n"
+                                   "title: !include ../secret.yml#secret\n"),
+                    ('document.yml', textwrap.dedent(
+                        f"""
+                        url: /secret/
+                        type: app.streampage
+                        title: Secret
+                        body:
+                            - type: download
+                              value: !document
+                                  file: ../../../../../../..{outside.name}
+                        """)),
+                    ('template.yml', textwrap.dedent(
+                        """
+                        !template
+                        page:
+                            url: /secret/{slug}/
+                            type: app.basicpage
+                            title: Secret
+                        parameters: ../../../../../../../etc/passwd.csv
+                        """)),
+            ):
+                with self.subTest(name=name):
+                    make_job(name, content, validate=False)
+                    job = jobs.run(jobs.claim())
+
+                    self.assertEqual(job.status, ImportJob.FAILED, job.log)
+                    self.assertRegex(job.log, "is outside|must be")
+                    self.assertFalse(BasicPage.objects.filter(
+                        url_path='/secret/').exists())
+                    self.assertFalse(Document.objects.exists())
+
+    @fresh_media_root()
+    def test_upload_deleted(self):
+        """Uploaded bundles are kept privately, and deleted once imported."""
+        job = make_job('pages.yml', PAGES)
+        storage = job.file.storage
+        self.assertTrue(storage.exists(job.file.name))
+        self.assertFalse(sandbox.is_under(storage.path(job.file.name),
+                                          settings.MEDIA_ROOT))
+
+        jobs.run(jobs.claim())
+        self.assertFalse(storage.exists(job.file.name))
+
+    @fresh_media_root()
+    def test_progress(self):
+        """Progress is only written as it goes where it can be seen."""
+        self.assertFalse(jobs.heartbeats())
+        make_job('pages.yml', PAGES)
+        job = jobs.claim()
+
+        reporter = mock.Mock()
+        progress = jobs.JobProgress(job, reporter)
+        progress.expected = 2
+        progress.report()
+        reporter.update.assert_called_once_with(
+            {'expected': 2, 'documents': 0, 'errors': 0})
+        self.assertEqual(job.expected, 2)
+
+    @fresh_media_root()
+    def test_command(self):
+        """The worker imports the queued jobs."""
+        make_job('first.yml', PAGES)
+        make_job('second.yml', "url: /other/\ntype: app.basicpage\n"
+                               "title: Other\n")
+        stdout = io.StringIO()
+        call_command('import_worker', once=True, stdout=stdout)
+
+        self.assertEqual(
+            [job.status for job in ImportJob.objects.order_by('pk')],
+            [ImportJob.DONE, ImportJob.DONE])
+        self.assertIn("2 documents, 2 created, 0 updated, 0 errors",
+                      stdout.getvalue())
+        self.assertIn("1 documents, 1 created, 0 updated, 0 errors",
+                      stdout.getvalue())
+
+
+class TestAdmin(JobFilesMixin, TestCase):
+    """Test submitting and monitoring jobs in the Wagtail admin."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('admin', 'admin@localhost',
+                                                  'password')
+        self.client.force_login(self.user)
+
+    @fresh_media_root()
+    def test_submit(self):
+        """Bundles are uploaded as queued jobs."""
+        response = self.client.post(reverse('wagtailimporter_jobs:add'), {
+            'file': SimpleUploadedFile('pages.yml', PAGES.encode()),
+            'validate': 'on',
+        })
+
+        job = ImportJob.objects.get()
+        self.assertRedirects(
+            response, reverse('wagtailimporter_jobs:detail', args=[job.pk]))
+        self.assertEqual(job.status, ImportJob.QUEUED)
+        self.assertEqual(job.submitted_by, self.user)
+        self.assertTrue(job.validate)
+        self.assertFalse(job.dry_run)
+
+    @fresh_media_root()
+    def test_submit_invalid(self):
+        """Only import files and zip files can be uploaded."""
+        response = self.client.post(reverse('wagtailimporter_jobs:add'), {
+            'file': SimpleUploadedFile('pages.txt', PAGES.encode()),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Upload a file ending in")
+        self.assertFalse(ImportJob.objects.exists())
+
+    @fresh_media_root()
+    def test_monitor(self):
+        """Jobs' progress and results are shown."""
+        make_job('pages.yml', PAGES)
+        job = jobs.run(jobs.claim())
+
+        response = self.client.get(reverse('wagtailimporter_jobs:index'))
+        self.assertContains(response, 'pages.yml')
+        self.assertContains(response, '2/2')
+
+        response = self.client.get(
+            reverse('wagtailimporter_jobs:detail', args=[job.pk]))
+        self.assertContains(response, "2 created, 0 updated")
+        self.assertContains(response, "Reading pages.yml")
+
+    @fresh_media_root()
+    def test_permission(self):
+        """Only users with permission to add jobs can see them."""
+        editor = User.objects.create_user('editor', 'editor@localhost',
+                                          'password')
+        group = Group.objects.create(name="Writers")
+        group.permissions.add(Permission.objects.get(
+            content_type__app_label='wagtailadmin', codename='access_admin'))
+        editor.groups.add(group)
+        self.client.force_login(editor)
+
+        url = reverse('wagtailimporter_jobs:index')
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+
+        group.permissions.add(Permission.objects.get(
+            content_type__app_label='wagtailimporter',
+            codename='add_importjob'))
+        editor = User.objects.get(pk=editor.pk)
+        self.client.force_login(editor)
+        self.assertEqual(self.client.get(url).status_code, 200)
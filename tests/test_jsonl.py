@@ -0,0 +1,103 @@
+"""
+Test importing JSON Lines files.
+"""
+import io
+import json
+import textwrap
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+
+from wagtailimporter import jsonl, serializer
+
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+
+class TestJSONLinesImport(ImporterTestCaseMixin, TestCase):
+    """Test importing JSON Lines files."""
+
+    yaml = textwrap.dedent(
+        """
+        url: /site/
+        type: app.basicpage
+        title: Site
+
+        ---
+
+        url: /site/source/
+        type: app.foreignkeypage
+        title: Source page
+        other_page: !page { url: /site/ }
+        image: !image { file: floral.jpeg, title: Floral doge }
+
+        ---
+
+        url: /site/stream/
+        type: app.streampage
+        title: Stream page
+        body:
+            - type: link
+              id: link
+              value:
+                  page: !page { url: /site/source/ }
+                  text: Source
+
+        ---
+
+        !site
+            hostname: example.com
+            root_page: !page { url: /site/ }
+        """
+    )
+
+    jsonl = '\n'.join(json.dumps(doc) for doc in [
+        {'url': '/site/', 'type': 'app.basicpage', 'title': 'Site'},
+        {'url': '/site/source/', 'type': 'app.foreignkeypage',
+         'title': 'Source page',
+         'other_page': {'$page': {'url': '/site/'}},
+         'image': {'$image': {'file': 'floral.jpeg',
+                              'title': 'Floral doge'}}},
+        {},
+        {'url': '/site/stream/', 'type': 'app.streampage',
+         'title': 'Stream page',
+         'body': [{'type': 'link', 'id': 'link', 'value': {
+             'page': {'$page': {'url': '/site/source/'}},
+             'text': 'Source',
+         }}]},
+        {'$site': {'hostname': 'example.com',
+                   'root_page': {'$page': {'url': '/site/'}}}},
+    ]).replace('{}', '')
+
+    def import_and_export(self, doc, **kwargs):
+        """Import `doc', returning the export, and roll it back."""
+        with transaction.atomic():
+            self.run_import(doc, **kwargs)
+
+            stdout = io.StringIO()
+            call_command('export_pages', '/site/', stdout=stdout)
+            transaction.set_rollback(True)
+
+        return stdout.getvalue()
+
+    @fresh_media_root()
+    def test_same_as_yaml(self):
+        """JSON Lines files import the same as YAML files."""
+        exported = self.import_and_export(self.jsonl, suffix='.jsonl')
+
+        self.assertIn('/site/stream/', exported)
+        self.assertEqual(exported, self.import_and_export(self.yaml))
+
+    def test_untag(self):
+        """Test decoding tags."""
+        registry = {'!page': serializer.Page}
+
+        page = jsonl.untag({'$page': {'url': '/page/'}}, registry)
+        self.assertIsInstance(page, serializer.Page)
+        self.assertEqual(page.url, '/page/')
+
+        self.assertEqual(jsonl.untag({'$page': 1, 'other': 2}, registry),
+                         {'$page': 1, 'other': 2})
+
+        with self.assertRaisesMessage(ValueError, "Unknown tag $nope"):
+            jsonl.untag([{'$nope': {}}], registry)
@@ -0,0 +1,131 @@
+"""
+Test locking subtrees of the page tree.
+"""
+import io
+import textwrap
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from wagtail.models import Page
+
+from wagtailimporter.locking import WHOLE_TREE, SubtreeLocks, advisory_key
+from wagtailimporter.models import ImportLock
+
+from .app.models import BasicPage
+from .base import ImporterTestCaseMixin
+
+PAGES = textwrap.dedent(
+    """
+    url: /section/
+    type: app.basicpage
+    title: Section
+
+    ---
+
+    url: /section/a/
+    type: app.basicpage
+    title: A
+
+    ---
+
+    url: /section/b/
+    type: app.basicpage
+    title: B
+    """
+)
+
+
+class TestKeys(SimpleTestCase):
+    """Test the keys subtrees are locked by."""
+
+    def test_key(self):
+        """Parents are locked by their tree path, or an ancestor's."""
+        self.assertEqual(SubtreeLocks().key('000100020003'), '000100020003')
+        self.assertEqual(SubtreeLocks(depth=2).key('000100020003'),
+                         '00010002')
+        self.assertEqual(SubtreeLocks(depth=4).key('000100020003'),
+                         '000100020003')
+
+    def test_advisory_key(self):
+        """Advisory lock keys are stable signed 64 bit integers."""
+        key = advisory_key('00010002')
+        self.assertEqual(key, advisory_key('00010002'))
+        self.assertNotEqual(key, advisory_key('00010003'))
+        self.assertTrue(-2 ** 63 <= key < 2 ** 63)
+
+
+class TestSubtreeLocks(ImporterTestCaseMixin, TestCase):
+    """Test importing with --lock."""
+
+    def get_keys(self):
+        """Get the keys of the subtrees that have been locked."""
+        return set(ImportLock.objects.exclude(key=WHOLE_TREE)
+                   .values_list('key', flat=True))
+
+    def test_lock(self):
+        """The parents of new pages are locked once each."""
+        stdout = io.StringIO()
+        self.run_import(PAGES, lock=True, stdout=stdout)
+
+        section = BasicPage.objects.get(url_path='/section/')
+        home = section.get_parent()
+        self.assertEqual(self.get_keys(), {home.path, section.path})
+        # SQLite's whole database is locked too
+        self.assertTrue(ImportLock.objects.filter(key=WHOLE_TREE).exists())
+        self.assertIn("for 3 subtree locks", stdout.getvalue())
+
+    def test_lock_depth(self):
+        """With --lock-depth, whole sections are locked."""
+        self.run_import(PAGES, lock_depth=1)
+
+        self.assertEqual(self.get_keys(), {Page.get_first_root_node().path})
+
+    def test_existing_pages(self):
+        """Updating existing pages takes no locks."""
+        self.run_import(PAGES)
+        self.run_import(PAGES, lock=True)
+
+        self.assertEqual(self.get_keys(), set())
+
+    def test_concurrent_child(self):
+        """Children added while waiting for a lock are allowed for."""
+        self.run_import(PAGES.split('---')[0])
+        section = BasicPage.objects.get(url_path='/section/')
+        lock = SubtreeLocks.lock
+
+        def add_sibling(locks, path):
+            # As if another import added a child while this one waited
+            if path == section.path and path not in locks.held:
+                Page.objects.get(pk=section.pk).add_child(
+                    instance=BasicPage(title="Other", slug='other'))
+            return lock(locks, path)
+
+        with mock.patch.object(SubtreeLocks, 'lock', add_sibling):
+            self.run_import(PAGES, lock=True)
+
+        self.assertEqual(list(BasicPage.objects.get(url_path='/section/')
+                              .get_children().values_list('slug', flat=True)),
+                         ['other', 'a', 'b'])
+
+    def test_concurrent_same_page(self):
+        """A page added while waiting for a lock is updated, not added."""
+        self.run_import(PAGES.split('---')[0])
+        section = BasicPage.objects.get(url_path='/section/')
+        lock = SubtreeLocks.lock
+
+        def add_page(locks, path):
+            # As if another import added the same page while this one waited
+            if path == section.path and path not in locks.held:
+                Page.objects.get(pk=section.pk).add_child(
+                    instance=BasicPage(title="Theirs", slug='a'))
+            return lock(locks, path)
+
+        stdout = io.StringIO()
+        with mock.patch.object(SubtreeLocks, 'lock', add_page):
+            self.run_import(PAGES, lock=True, stdout=stdout)
+
+        self.assertEqual(list(BasicPage.objects.get(url_path='/section/')
+                              .get_children().values_list('title', flat=True)),
+                         ['A', 'B'])
+        self.assertIn("Updating existing page /section/a", stdout.getvalue())
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
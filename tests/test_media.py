@@ -0,0 +1,97 @@
+"""
+Test placing media files into storage.
+"""
+import errno
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage, Storage
+from django.test import SimpleTestCase
+
+from wagtailimporter import media
+
+SOURCE = Path(__file__).parent / 'import_data' / 'images' / 'floral.jpeg'
+
+
+def unsupported(*args):
+    """Fail like an unsupported system call."""
+    raise OSError(errno.EXDEV, "Unsupported")
+
+
+class TestStoreFile(SimpleTestCase):
+    """Test storing media files."""
+
+    def setUp(self):
+        super().setUp()
+        tempdir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(tempdir.cleanup)
+        self.storage = FileSystemStorage(location=tempdir.name + '/media')
+        self.local_source = Path(tempdir.name) / 'floral.jpeg'
+        self.local_source.write_bytes(SOURCE.read_bytes())
+        self.local_source.chmod(0o644)
+
+    def assertStored(self, name):  # pylint:disable=invalid-name
+        """Check the stored file matches the source."""
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), SOURCE.read_bytes())
+
+    def test_link(self):
+        """Files on the same device are linked into place."""
+        with mock.patch('fcntl.ioctl', side_effect=unsupported), \
+                mock.patch('wagtailimporter.media.copy_file') as copy_file:
+            name = media.store_file(self.storage, 'images/floral.jpeg',
+                                    str(self.local_source))
+
+        self.assertEqual(name, 'images/floral.jpeg')
+        self.assertFalse(copy_file.called)
+        self.assertTrue(os.path.samefile(self.storage.path(name),
+                                         self.local_source))
+
+    def test_copy_file_range(self):
+        """Files that can't be linked are copied in the kernel."""
+        with mock.patch('fcntl.ioctl', side_effect=unsupported), \
+                mock.patch('os.link', side_effect=unsupported), \
+                mock.patch('os.sendfile', side_effect=AssertionError):
+            name = media.store_file(self.storage, 'images/floral.jpeg',
+                                    str(self.local_source))
+
+        self.assertFalse(os.path.samefile(self.storage.path(name),
+                                          self.local_source))
+        self.assertEqual(os.stat(self.storage.path(name)).st_mode & 0o777,
+                         self.storage.file_permissions_mode)
+        self.assertStored(name)
+
+    def test_streamed_fallback(self):
+        """Files are copied through Python as a last resort."""
+        with mock.patch('fcntl.ioctl', side_effect=unsupported), \
+                mock.patch('os.link', side_effect=unsupported), \
+                mock.patch('os.copy_file_range', side_effect=unsupported), \
+                mock.patch('os.sendfile', side_effect=unsupported):
+            name = media.store_file(self.storage, 'images/floral.jpeg',
+                                    str(SOURCE))
+
+        self.assertStored(name)
+
+    def test_existing_name(self):
+        """Files aren't overwritten."""
+        self.storage.save('images/floral.jpeg', open(SOURCE, 'rb'))  # noqa: E501 pylint:disable=consider-using-with,unspecified-encoding
+
+        name = media.store_file(self.storage, 'images/floral.jpeg',
+                                str(SOURCE))
+
+        self.assertNotEqual(name, 'images/floral.jpeg')
+        self.assertStored(name)
+
+    def test_other_storage(self):
+        """Other storages are saved to as normal."""
+        storage = mock.Mock(spec=Storage)
+        storage.save.return_value = 'images/floral.jpeg'
+
+        name = media.store_file(storage, 'images/floral.jpeg', str(SOURCE))
+
+        self.assertEqual(name, 'images/floral.jpeg')
+        (saved_name, source), _ = storage.save.call_args
+        self.assertEqual(saved_name, 'images/floral.jpeg')
+        self.assertEqual(source.name, str(SOURCE))
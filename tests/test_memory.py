@@ -0,0 +1,96 @@
+"""
+Test keeping the memory used by imports bounded.
+"""
+import io
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from wagtailimporter.importer import CREATED, Importer
+from wagtailimporter.memory import LRUDict, peak_rss
+from wagtailimporter.pathindex import PathIndex
+
+from .app.models import BasicPage
+from .base import ImporterTestCaseMixin
+
+
+def make_pages():
+    """Make documents for a section and five pages in it."""
+    return [
+        {'url': '/section/', 'type': 'app.basicpage', 'title': "Section"},
+    ] + [
+        {'url': f'/section/page-{i}/', 'type': 'app.basicpage',
+         'title': f"Page {i}"}
+        for i in range(5)
+    ]
+
+
+class TestLRUDict(SimpleTestCase):
+    """Test the bounded caches."""
+
+    def test_evict(self):
+        """The least recently used items are removed."""
+        cache = LRUDict(2, [('a', 1), ('b', 2), ('c', 3)])
+        self.assertEqual(list(cache), ['b', 'c'])
+
+        self.assertEqual(cache['b'], 2)
+        cache['d'] = 4
+        self.assertEqual(list(cache), ['b', 'd'])
+
+        self.assertEqual(cache.get('b'), 2)
+        self.assertIsNone(cache.get('c'))
+        cache['e'] = 5
+        self.assertEqual(list(cache), ['b', 'e'])
+
+    def test_path_index(self):
+        """Path indexes stay bounded as they change."""
+        index = PathIndex(max_size=2)
+        index.pages.update({'/a/': 1, '/a/b/': 2, '/c/': 3})
+        self.assertEqual(len(index), 2)
+
+        index.move_tree('/a/', '/d/')
+        self.assertIsInstance(index.pages, LRUDict)
+        self.assertEqual(dict(index.pages), {'/d/b/': 2, '/c/': 3})
+
+    def test_peak_rss(self):
+        """The peak memory used is measured."""
+        self.assertGreater(peak_rss(), 1 << 20)
+
+
+class TestMaxMemory(ImporterTestCaseMixin, TestCase):
+    """Test importing with max_memory."""
+
+    def test_results(self):
+        """Imported pages aren't kept in the results."""
+        importer = Importer(max_memory=True)
+        importer.paths = PathIndex(max_size=3)
+        results = importer.import_documents(make_pages())
+
+        self.assertEqual([result.action for result in results],
+                         [CREATED] * 6)
+        self.assertEqual([result.object for result in results], [None] * 6)
+        self.assertEqual(results[1].url, '/section/page-0/')
+        self.assertEqual(BasicPage.objects.count(), 6)
+        self.assertEqual(len(importer.paths), 3)
+
+    @override_settings(DEBUG=True)
+    def test_query_log(self):
+        """Queries aren't logged while DEBUG is on."""
+        connection.queries_log.clear()
+        Importer(max_memory=True).import_documents(make_pages())
+        # Only the transaction's own savepoint
+        self.assertEqual([query['sql'].split()[0]
+                          for query in connection.queries_log],
+                         ['SAVEPOINT', 'RELEASE'])
+
+        Importer().import_documents(make_pages()[:1])
+        self.assertNotEqual(len(connection.queries_log), 0)
+
+    def test_command(self):
+        """The peak memory used is reported."""
+        stdout = io.StringIO()
+        self.run_import("url: /section/\ntype: app.basicpage\n"
+                        "title: Section\n",
+                        max_memory=True, stdout=stdout)
+
+        self.assertIn("Peak memory used: ", stdout.getvalue())
@@ -0,0 +1,181 @@
+"""
+Test mirroring a section of the page tree.
+"""
+import io
+import textwrap
+
+from django.core.management.base import CommandError
+from django.test import TestCase
+from wagtail.models import Page
+
+from wagtailimporter.importer import Importer
+
+from .app.models import BasicPage
+from .base import ImporterTestCaseMixin
+
+
+class TestMirror(ImporterTestCaseMixin, TestCase):
+    """Test removing pages absent from the import."""
+
+    doc = textwrap.dedent(
+        """
+        url: /section/
+        type: app.basicpage
+        title: Section
+
+        ---
+
+        url: /section/kept/
+        type: app.basicpage
+        title: Kept
+
+        ---
+
+        url: /section/parent/child/
+        type: app.basicpage
+        title: Child
+        """
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.run_import(textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: Section
+
+            ---
+
+            url: /section/kept/
+            type: app.basicpage
+            title: Kept
+
+            ---
+
+            url: /section/parent/
+            type: app.basicpage
+            title: Parent
+
+            ---
+
+            url: /section/parent/child/
+            type: app.basicpage
+            title: Child
+
+            ---
+
+            url: /section/parent/stale/
+            type: app.basicpage
+            title: Stale
+
+            ---
+
+            url: /section/old/
+            type: app.basicpage
+            title: Old
+
+            ---
+
+            url: /section/old/older/
+            type: app.basicpage
+            title: Older
+
+            ---
+
+            url: /elsewhere/
+            type: app.basicpage
+            title: Elsewhere
+            """
+        ))
+
+    def url_paths(self):
+        """The url paths of all imported pages."""
+        return set(BasicPage.objects.values_list('url_path', flat=True))
+
+    def test_delete(self):
+        """Stale pages are deleted, a subtree at a time."""
+        stdout = io.StringIO()
+        self.run_import(self.doc, mirror='/section/', stdout=stdout)
+
+        self.assertEqual(self.url_paths(), {
+            '/section/', '/section/kept/', '/section/parent/',
+            '/section/parent/child/', '/elsewhere/',
+        })
+        self.assertIn("Deleting /section/old/ (1 descendants)",
+                      stdout.getvalue())
+
+        # The tree is still consistent
+        self.assertEqual(
+            Page.objects.get(url_path='/section/parent/').numchild, 1)
+        self.assertEqual(Page.objects.get(url_path='/section/').numchild, 2)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+    def test_unpublish(self):
+        """Stale pages are unpublished."""
+        self.run_import(self.doc, mirror='/section/', unpublish=True)
+
+        self.assertEqual(
+            set(BasicPage.objects.live().values_list('url_path', flat=True)),
+            {'/section/', '/section/kept/', '/section/parent/',
+             '/section/parent/child/', '/elsewhere/'})
+        self.assertEqual(BasicPage.objects.count(), 8)
+
+    def test_dry_run(self):
+        """A dry run lists the pages but removes nothing."""
+        stdout = io.StringIO()
+        self.run_import(self.doc, mirror='/section/', dry_run=True,
+                        stdout=stdout)
+
+        self.assertEqual(BasicPage.objects.count(), 8)
+        self.assertIn("Deleting /section/parent/stale/ (0 descendants)",
+                      stdout.getvalue())
+
+    def test_max_delete(self):
+        """Removing too many pages aborts the import."""
+        with self.assertRaises(CommandError):
+            self.run_import(self.doc.replace('Kept', 'Renamed'),
+                            mirror='/section/', max_delete=2)
+
+        self.assertEqual(BasicPage.objects.count(), 8)
+        self.assertFalse(BasicPage.objects.filter(title='Renamed').exists())
+
+    def test_errors(self):
+        """Nothing is removed if any document failed to import."""
+        self.run_import(self.doc + '\n---\nurl: /section/bad/\n',
+                        mirror='/section/')
+
+        self.assertEqual(BasicPage.objects.count(), 8)
+
+
+class TestWideMirror(TestCase):
+    """Test mirroring sections with many children."""
+
+    def test_delete(self):
+        """Many stale subtrees are removed in batches of bounded queries."""
+        parent = Page.objects.get(depth=2).add_child(
+            instance=Page(title="Section", slug='section'))
+        Page.objects.bulk_create(
+            Page(title=f"Page {index}", slug=f'page-{index}',
+                 path=Page._get_path(parent.path, parent.depth + 1,
+                                     index + 1),
+                 depth=parent.depth + 1, numchild=0,
+                 url_path=f'{parent.url_path}page-{index}/',
+                 content_type_id=parent.content_type_id,
+                 locale_id=parent.locale_id)
+            for index in range(2200))
+        Page.objects.filter(pk=parent.pk).update(numchild=2200)
+        parent.refresh_from_db()
+
+        # More kept pages than SQLite allows query parameters
+        kept = list(parent.get_children()[:1001])
+        importer = Importer()
+        importer.touched_pages = {parent.pk} | {page.pk for page in kept}
+        importer.mirror(parent.url_path)
+
+        self.assertEqual(
+            set(parent.get_children().values_list('pk', flat=True)),
+            {page.pk for page in kept})
+        parent.refresh_from_db()
+        self.assertEqual(parent.numchild, 1001)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
@@ -0,0 +1,129 @@
+"""
+Test ordering pages like the import.
+"""
+import textwrap
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from wagtail.models import Page
+
+from wagtailimporter.importer import Importer
+
+from .app.models import BasicPage
+from .base import ImporterTestCaseMixin
+
+
+def make_docs(*urls):
+    """Make documents for pages at `urls'."""
+    return '\n---\n'.join(
+        f"url: {url}\ntype: app.basicpage\ntitle: {url}"
+        for url in urls
+    )
+
+
+class TestPreserveOrder(ImporterTestCaseMixin, TestCase):
+    """Test importing with --preserve-order."""
+
+    def setUp(self):
+        super().setUp()
+        self.run_import(make_docs(
+            '/section/', '/section/a/', '/section/b/', '/section/c/',
+            '/section/d/', '/section/d/child/',
+        ))
+
+    def get_order(self, url='/section/'):
+        """Get the slugs of the children of a page, in order."""
+        return list(BasicPage.objects.get(url_path=url).get_children()
+                    .values_list('slug', flat=True))
+
+    def test_reorder(self):
+        """Imported children come first, in the order they were imported."""
+        child = BasicPage.objects.get(url_path='/section/d/child/')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(
+                make_docs('/section/c/', '/section/a/', '/section/d/',
+                          '/section/d/child/'),
+                preserve_order=True)
+
+        self.assertEqual(self.get_order(), ['c', 'a', 'd', 'b'])
+
+        # The children are moved in bulk
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "wagtailcore_page" SET "path"')
+            and 'CASE' in query['sql']
+        ]), 2)
+
+        # Descendants move with their parents
+        moved = BasicPage.objects.get(pk=child.pk)
+        self.assertEqual(moved.get_parent().slug, 'd')
+        self.assertEqual(moved.url_path, '/section/d/child/')
+        self.assertEqual(Page.find_problems(),
+                         ([], [], [], [], []))
+
+        # The tree can still be added to
+        self.run_import(make_docs('/section/e/'))
+        self.assertEqual(self.get_order(), ['c', 'a', 'd', 'b', 'e'])
+
+    def test_unchanged(self):
+        """Children already in order aren't moved."""
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(make_docs('/section/a/', '/section/b/'),
+                            preserve_order=True)
+
+        self.assertEqual(self.get_order(), ['a', 'b', 'c', 'd'])
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "wagtailcore_page" SET "path"')
+            and 'CASE' in query['sql']
+        ])
+
+    def test_without_option(self):
+        """Pages are only reordered when asked."""
+        self.run_import(textwrap.dedent(
+            """
+            url: /section/d/
+            type: app.basicpage
+
+            ---
+
+            url: /section/a/
+            type: app.basicpage
+            """
+        ))
+
+        self.assertEqual(self.get_order(), ['a', 'b', 'c', 'd'])
+
+
+class TestWideSection(TestCase):
+    """Test reordering sections with many children."""
+
+    def test_reorder(self):
+        """Many children are moved in batches of bounded statements."""
+        parent = Page.objects.get(depth=2).add_child(
+            instance=Page(title="Section", slug='section'))
+        children = Page.objects.bulk_create(
+            Page(title=f"Page {index}", slug=f'page-{index}',
+                 path=Page._get_path(parent.path, parent.depth + 1,
+                                     index + 1),
+                 depth=parent.depth + 1, numchild=0,
+                 url_path=f'{parent.url_path}page-{index}/',
+                 content_type_id=parent.content_type_id,
+                 locale_id=parent.locale_id)
+            for index in range(1200))
+        Page.objects.filter(pk=parent.pk).update(numchild=len(children))
+        parent.refresh_from_db()
+        children = list(parent.get_children())
+        self.assertEqual(len(children), 1200)
+
+        importer = Importer()
+        importer.page_order = {child.pk: None
+                               for child in reversed(children)}
+        importer.reorder()
+
+        self.assertEqual(
+            list(parent.get_children().values_list('pk', flat=True)),
+            [child.pk for child in reversed(children)])
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
@@ -3,7 +3,12 @@ Test importing Wagtail pages.
 """
 import textwrap
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from wagtailimporter import serializer
+from wagtailimporter.importer import Importer
 
 from .app.models import BasicPage, ForeignKeyPage
 from .base import ImporterTestCaseMixin
@@ -147,3 +152,54 @@ class TestPageImport(ImporterTestCaseMixin, TestCase):
         page.refresh_from_db()
         self.assertEqual(page.title, "Basic page")
         self.assertTrue(BasicPage.objects.filter(pk=child.pk).exists())
+
+    def test_slug_change(self):
+        """Test changing a page's slug moves its descendants."""
+        docs = [{'url': '/section/', 'type': 'app.basicpage',
+                 'title': "Section"}]
+        for i in range(10):
+            docs.append({'url': f'/section/child-{i}/',
+                         'type': 'app.basicpage', 'title': f"Child {i}"})
+            docs.append({'url': f'/section/child-{i}/grandchild/',
+                         'type': 'app.basicpage', 'title': "Grandchild"})
+
+        importer = Importer()
+        importer.import_documents(docs)
+        grandchild = importer.paths.get('/section/child-3/grandchild/')
+
+        with CaptureQueriesContext(connection) as queries:
+            results = importer.import_documents([
+                {
+                    'url': '/section/',
+                    'type': 'app.basicpage',
+                    'slug': 'renamed',
+                },
+                {
+                    'url': '/referrer/',
+                    'type': 'app.foreignkeypage',
+                    'title': "Referrer",
+                    'other_page': serializer.Page(
+                        url='/renamed/child-3/grandchild/'),
+                },
+            ])
+
+        self.assertEqual(results[0].url, '/renamed/')
+        self.assertFalse(BasicPage.objects
+                         .filter(url_path__startswith='/section/').exists())
+        self.assertEqual(BasicPage.objects
+                         .filter(url_path__startswith='/renamed/').count(),
+                         21)
+        self.assertEqual(
+            ForeignKeyPage.objects.get().other_page.url_path,
+            '/renamed/child-3/grandchild/')
+
+        # The descendants are moved together
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "wagtailcore_page"')
+            and '"url_path"' in query['sql']
+        ]), 2)
+        # The path index is moved too
+        self.assertIsNone(importer.paths.get('/section/child-3/grandchild/'))
+        self.assertEqual(importer.paths.get('/renamed/child-3/grandchild/'),
+                         grandchild)
@@ -0,0 +1,95 @@
+"""
+Test importing in a pipeline.
+"""
+import io
+import textwrap
+import threading
+from unittest import mock
+
+import yaml
+from django.test import TestCase
+from wagtail.documents.models import Document
+from wagtail.images.models import Image
+
+from wagtailimporter import serializer
+
+from .app.models import BasicPage, ForeignKeyPage
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+
+class TestPipeline(ImporterTestCaseMixin, TestCase):
+    """Test importing with --pipeline."""
+
+    @fresh_media_root()
+    def test_import(self):
+        """Documents are imported in order and the stages reported."""
+        docs = [textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: Section
+            """
+        )]
+        docs.extend(textwrap.dedent(
+            f"""
+            url: /section/page-{i}/
+            type: app.foreignkeypage
+            title: Page {i}
+            other_page: !page {{ url: /section/ }}
+            image: !image {{ file: floral.jpeg }}
+            document: !document {{ file: hello-world.txt, title: Hello }}
+            """
+        ) for i in range(10))
+
+        stage = serializer.Image.stage
+        threads = []
+
+        def record_thread(ref):
+            threads.append(threading.current_thread().name)
+            return stage(ref)
+
+        stdout = io.StringIO()
+        with mock.patch.object(serializer.Image, 'stage', autospec=True,
+                               side_effect=record_thread):
+            self.run_import('---\n'.join(docs), pipeline=True,
+                            queue_size=2, stdout=stdout)
+
+        # The new image was staged once, outside the writer
+        self.assertEqual(threads, ['import-stage'])
+
+        self.assertEqual(BasicPage.objects.get().title, "Section")
+        self.assertEqual(ForeignKeyPage.objects.count(), 10)
+
+        image = Image.objects.get()
+        self.assertEqual((image.width, image.height), (600, 338))
+        self.assertTrue(image.file_hash)
+        self.assertEqual(Document.objects.get().title, "Hello")
+
+        for page in ForeignKeyPage.objects.all():
+            self.assertEqual(page.other_page.specific.title, "Section")
+            self.assertEqual(page.image, image)
+
+        output = stdout.getvalue()
+        self.assertIn("Stage parse: 11 documents", output)
+        self.assertIn("Stage write: 11 documents", output)
+        self.assertIn("Queue staged: average depth", output)
+        self.assertIn("maximum", output)
+
+    def test_parse_error(self):
+        """Parsing errors stop the import and nothing is imported."""
+        doc = textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: Section
+
+            ---
+
+            url: [
+            """
+        )
+
+        with self.assertRaises(yaml.YAMLError):
+            self.run_import(doc, pipeline=True)
+
+        self.assertFalse(BasicPage.objects.exists())
@@ -0,0 +1,151 @@
+"""
+Test reporting the progress of an import.
+"""
+import io
+import textwrap
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase, TestCase
+
+from wagtailimporter.importer import working_directory
+from wagtailimporter.progress import Progress, count_documents
+
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+PAGES = textwrap.dedent(
+    """
+    url: /section/
+    type: app.basicpage
+    title: Section
+
+    ---
+
+    url: /section/gallery/
+    type: app.foreignkeypage
+    title: Gallery
+    image: !image { file: lazors.jpg }
+    """
+)
+
+
+class TTY(io.StringIO):
+    """A terminal."""
+
+    def isatty(self):
+        return True
+
+
+def parse_metrics(text):
+    """Get the samples in Prometheus text format."""
+    return dict(line.rsplit(' ', 1) for line in text.splitlines()
+                if not line.startswith('#'))
+
+
+class TestCountDocuments(SimpleTestCase):
+    """Test estimating the documents in a file."""
+
+    def setUp(self):
+        super().setUp()
+        tempdir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(tempdir.cleanup)
+        self.directory = Path(tempdir.name)
+
+    def count(self, name, content):
+        """Count the documents in a file."""
+        path = self.directory / name
+        path.write_text(content)
+        return count_documents(str(path))
+
+    def test_yaml(self):
+        """YAML documents are counted by their separators."""
+        self.assertEqual(self.count('a.yaml', PAGES), 2)
+        self.assertEqual(self.count('b.yaml', "# Pages\n---\na: 1\n---\n"),
+                         2)
+        self.assertEqual(self.count('c.yaml', ""), 0)
+
+    def test_jsonl(self):
+        """JSON Lines documents are counted by their lines."""
+        self.assertEqual(self.count('a.jsonl', '{}\n\n{}\n{}\n'), 3)
+
+
+class TestProgress(ImporterTestCaseMixin, TestCase):
+    """Test reporting progress from import_pages."""
+
+    def setUp(self):
+        super().setUp()
+        tempdir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(tempdir.cleanup)
+        self.metrics_file = Path(tempdir.name) / 'import.prom'
+
+    @fresh_media_root()
+    def test_metrics(self):
+        """Metrics are written in Prometheus text format."""
+        self.run_import(PAGES, metrics_file=str(self.metrics_file))
+
+        metrics = parse_metrics(self.metrics_file.read_text())
+        self.assertEqual(metrics['wagtailimporter_documents_total'], '2')
+        self.assertEqual(metrics['wagtailimporter_documents_expected'], '2')
+        self.assertEqual(metrics['wagtailimporter_files_done'], '1')
+        self.assertEqual(metrics['wagtailimporter_errors_total'], '0')
+        self.assertEqual(
+            metrics['wagtailimporter_media_bytes_total'],
+            str((self.get_import_dir() / 'images' / 'lazors.jpg')
+                .stat().st_size))
+        self.assertGreater(int(metrics['wagtailimporter_queries_total']), 0)
+        self.assertEqual(metrics['wagtailimporter_eta_seconds'], '0.0')
+        self.assertGreater(int(metrics['wagtailimporter_peak_rss_bytes']), 0)
+
+    def test_relative_metrics_file(self):
+        """A relative metrics file is relative to where the import started."""
+        with working_directory(self.metrics_file.parent):
+            progress = Progress(metrics_file=self.metrics_file.name)
+
+        # As while importing a file elsewhere
+        with TemporaryDirectory() as elsewhere, working_directory(elsewhere):
+            progress.write_metrics()
+            self.assertFalse(Path(self.metrics_file.name).exists())
+
+        self.assertTrue(self.metrics_file.exists())
+
+    @fresh_media_root()
+    def test_pipeline(self):
+        """The depths of the pipeline's queues are included."""
+        self.run_import(PAGES, metrics_file=str(self.metrics_file),
+                        pipeline=True)
+
+        metrics = parse_metrics(self.metrics_file.read_text())
+        self.assertEqual(metrics['wagtailimporter_documents_total'], '2')
+        self.assertIn('wagtailimporter_queue_depth{queue="parsed"}', metrics)
+        self.assertNotEqual(metrics['wagtailimporter_media_bytes_total'],
+                            '0')
+
+    @fresh_media_root()
+    def test_status_line(self):
+        """The status line is redrawn on a terminal."""
+        stderr = TTY()
+        self.run_import(PAGES, progress=True, stderr=stderr)
+
+        output = stderr.getvalue()
+        self.assertIn('\r\033[K', output)
+        self.assertIn("2/2 documents", output)
+        self.assertTrue(output.endswith('\n'))
+
+    @fresh_media_root()
+    def test_log_lines(self):
+        """Progress is written a line at a time elsewhere."""
+        stderr = io.StringIO()
+        self.run_import(PAGES, progress=True, stderr=stderr)
+
+        self.assertNotIn('\r', stderr.getvalue())
+        self.assertIn("2/2 documents", stderr.getvalue().splitlines()[-1])
+
+    def test_eta(self):
+        """The time left is estimated from the rate so far."""
+        progress = Progress()
+        progress.expected = 30
+        progress.documents = 10
+        progress.started -= 5
+
+        self.assertAlmostEqual(progress.eta, 10, places=1)
+        self.assertIsNone(Progress().eta)
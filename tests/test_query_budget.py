@@ -0,0 +1,211 @@
+"""
+Test the number of queries an import costs.
+
+Each kind of document has a budget of queries per document, plus some per
+batch of documents (see `Importer.batch_size') and a fixed overhead per
+import. Imports of 10, 100 and 1,000 documents must all stay
+within budget, so any query whose count grows faster than the number of
+documents (an N+1) fails the test.
+
+These tests are slow, skip them with ``runtests.py --exclude-tag slow``.
+"""
+import shutil
+import textwrap
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.db import connection
+from django.test import TestCase, tag
+
+from wagtailimporter.importer import Importer
+
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+IMAGES = Path(__file__).parent / 'import_data' / 'images'
+
+
+class QueryCounter:
+    """
+    Count queries.
+
+    Unlike CaptureQueriesContext this doesn't rely on the query log, which
+    only keeps the last 9000 queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    """Count the queries run in the block."""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+@tag('slow')
+class TestQueryBudget(ImporterTestCaseMixin, TestCase):
+    """Test the number of queries an import costs."""
+
+    sizes = (10, 100, 1000)
+    # Directory to import from instead of the usual one
+    import_dir = None
+
+    # Document kind: (queries per document, per batch of documents, fixed
+    # queries per import), as measured plus a small fixed allowance
+    budgets = {
+        'new_page': (29, 0, 20),
+        'updated_page': (25, 0, 20),
+        'fast_updated_page': (4, 4, 20),
+        'page_reference': (31, 0, 20),
+        'image': (18, 7, 20),
+        'document': (15, 0, 20),
+        'site': (7, 0, 20),
+        'setting': (8, 0, 20),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.run_import(textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: Section
+
+            ---
+
+            url: /my-home/
+            type: app.basicpage
+            title: Home
+
+            ---
+
+            !site
+                hostname: localhost
+                root_page: !page { url: /my-home/ }
+            """
+        ))
+
+    def get_import_dir(self):
+        return self.import_dir or super().get_import_dir()
+
+    def make_docs(self, template, size, **kwargs):
+        """Make a file of `size' documents from `template'."""
+        template = textwrap.dedent(template)
+        return '\n---\n'.join(
+            template.format(i=i, size=size, **kwargs)
+            for i in range(size)
+        )
+
+    def assertWithinBudget(self, kind, template,  # noqa: E501 pylint:disable=invalid-name
+                           setup=None, **kwargs):
+        """
+        Import `template' at each size, with the import_pages options in
+        `kwargs', and check it stays within the budget for `kind'.
+        """
+        per_document, per_batch, fixed = self.budgets[kind]
+        counts = {}
+
+        for size in self.sizes:
+            docs = self.make_docs(template, size)
+            if setup:
+                setup(docs)
+
+            with count_queries() as counter:
+                self.run_import(docs, **kwargs)
+
+            counts[size] = counter.count
+
+        for size, count in counts.items():
+            batches = -(-size // Importer.batch_size)
+            with self.subTest(size=size):
+                self.assertLessEqual(
+                    count, fixed + per_document * size + per_batch * batches,
+                    f"{size} {kind} documents took {count} queries, "
+                    f"budget is {per_document} per document + {per_batch} "
+                    f"per batch + {fixed}")
+
+    def test_new_pages(self):
+        """Test creating new pages."""
+        self.assertWithinBudget('new_page', """
+            url: /section/new-{size}-{i}/
+            type: app.basicpage
+            title: Page {i}
+            """)
+
+    def test_updated_pages(self):
+        """Test updating existing pages."""
+        self.assertWithinBudget('updated_page', """
+            url: /section/updated-{size}-{i}/
+            type: app.basicpage
+            title: Page {i}
+            """, setup=self.run_import)
+
+    def test_fast_updated_pages(self):
+        """Test updating existing pages with --fast-updates."""
+        self.assertWithinBudget('fast_updated_page', """
+            url: /section/fast-{size}-{i}/
+            type: app.basicpage
+            title: Page {i}
+            body: New
+            """, setup=lambda docs: self.run_import(
+                docs.replace("body: New", "body: Old")), fast_updates=True)
+
+    def test_page_references(self):
+        """Test pages referencing other pages."""
+        self.assertWithinBudget('page_reference', """
+            url: /section/reference-{size}-{i}/
+            type: app.foreignkeypage
+            title: Page {i}
+            other_page: !page {{ url: /section/ }}
+            """)
+
+    @fresh_media_root()
+    def test_images(self):
+        """Test importing new images, each from a file of its own."""
+        with TemporaryDirectory() as directory:
+            self.import_dir = Path(directory)
+            (self.import_dir / 'images').mkdir()
+            for size in self.sizes:
+                for i in range(size):
+                    shutil.copyfile(
+                        IMAGES / 'floral.jpeg',
+                        self.import_dir / 'images' / f'image-{size}-{i}.jpeg')
+
+            self.assertWithinBudget('image', """
+                !image
+                    file: image-{size}-{i}.jpeg
+                    title: Image {i}
+                """)
+
+    @fresh_media_root()
+    def test_documents(self):
+        """Test importing documents."""
+        self.assertWithinBudget('document', """
+            !document
+                file: hello-world.txt
+                title: Document {i}
+            """)
+
+    def test_sites(self):
+        """Test importing sites."""
+        self.assertWithinBudget('site', """
+            !site
+                hostname: site-{size}-{i}.example.com
+                site_name: Site {i}
+                root_page: !page {{ url: /section/ }}
+            """)
+
+    def test_settings(self):
+        """Test importing settings."""
+        self.assertWithinBudget('setting', """
+            !app.basicsetting
+                site: !site {{ hostname: localhost }}
+                text: Setting {i}
+            """)
@@ -0,0 +1,98 @@
+"""
+Test importing pages as revisions.
+"""
+import textwrap
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from wagtail.models import Revision
+
+from .app.models import BasicPage
+from .base import ImporterTestCaseMixin
+
+
+def make_docs(title, count=5):
+    """Make documents for `count' pages under a section."""
+    docs = ["url: /section/\ntype: app.basicpage\ntitle: Section"]
+    docs.extend(
+        f"url: /section/page-{i}/\ntype: app.basicpage\ntitle: {title} {i}"
+        for i in range(count)
+    )
+    return '\n---\n'.join(docs)
+
+
+class TestRevisions(ImporterTestCaseMixin, TestCase):
+    """Test importing with --revisions and --draft."""
+
+    def test_publish(self):
+        """Revisions are created and published in bulk."""
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(make_docs("Page"), revisions='publish')
+
+        self.assertEqual(Revision.objects.count(), 6)
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "wagtailcore_revision"')
+        ]), 1)
+
+        page = BasicPage.objects.get(url_path='/section/page-2/')
+        self.assertTrue(page.live)
+        self.assertFalse(page.has_unpublished_changes)
+        self.assertEqual(page.live_revision, page.latest_revision)
+        self.assertIsNotNone(page.first_published_at)
+        self.assertEqual(page.latest_revision.as_object().title, "Page 2")
+
+        first_published_at = page.first_published_at
+        self.run_import(make_docs("New"), revisions='publish')
+
+        page.refresh_from_db()
+        self.assertEqual(page.title, "New 2")
+        self.assertEqual(page.live_revision.as_object().title, "New 2")
+        self.assertEqual(page.first_published_at, first_published_at)
+        self.assertEqual(Revision.objects.filter(
+            object_id=str(page.pk)).count(), 2)
+
+    def test_draft(self):
+        """Drafts leave the live pages alone."""
+        self.run_import(make_docs("Page"), revisions='publish')
+        self.run_import(make_docs("Draft"), revisions='draft')
+
+        page = BasicPage.objects.get(url_path='/section/page-2/')
+        self.assertEqual(page.title, "Page 2")
+        self.assertEqual(page.draft_title, "Draft 2")
+        self.assertTrue(page.live)
+        self.assertTrue(page.has_unpublished_changes)
+        self.assertEqual(page.latest_revision.as_object().title, "Draft 2")
+        self.assertEqual(page.live_revision.as_object().title, "Page 2")
+
+    def test_draft_new_pages(self):
+        """New pages are created unpublished as drafts."""
+        self.run_import(make_docs("Draft"), revisions='draft')
+
+        page = BasicPage.objects.get(url_path='/section/page-2/')
+        self.assertFalse(page.live)
+        self.assertTrue(page.has_unpublished_changes)
+        self.assertIsNone(page.live_revision)
+        self.assertIsNone(page.first_published_at)
+        self.assertEqual(page.latest_revision.as_object().title, "Draft 2")
+
+    def test_repeated(self):
+        """The last revision of a page imported twice is the latest."""
+        self.run_import(textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: First
+
+            ---
+
+            url: /section/
+            type: app.basicpage
+            title: Second
+            """
+        ), revisions='publish')
+
+        page = BasicPage.objects.get()
+        self.assertEqual(Revision.objects.count(), 2)
+        self.assertEqual(page.latest_revision.as_object().title, "Second")
@@ -0,0 +1,136 @@
+"""
+Test links by path in rich text.
+"""
+import io
+import textwrap
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from wagtail.documents.models import Document
+from wagtail.images.models import Image
+
+from wagtailimporter.validation import validate_document
+
+from .app.models import BasicPage, StreamPage
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+PAGES = textwrap.dedent(
+    """
+    url: /section/
+    type: app.basicpage
+    title: Section
+
+    ---
+
+    url: /section/a/
+    type: app.basicpage
+    title: A
+
+    ---
+
+    url: /section/b/
+    type: app.basicpage
+    title: B
+    """
+)
+
+
+class TestRichTextLinks(ImporterTestCaseMixin, TestCase):
+    """Test rewriting links in rich text."""
+
+    def test_page_links(self):
+        """Links to pages are rewritten, with one query for every page."""
+        self.run_import(PAGES)
+        doc = textwrap.dedent(
+            """
+            url: /section/links/
+            type: app.streampage
+            title: Links
+            body:
+                - type: paragraph
+                  value: >
+                      <p><a data-import-page-url="/section/a/">A</a>
+                      and <a data-import-page-url='/section/b'>B</a></p>
+                - type: paragraph
+                  value: <p><a data-import-page-url="/section/a/">A</a></p>
+            """
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(doc)
+
+        page_a = BasicPage.objects.get(url_path='/section/a/')
+        page_b = BasicPage.objects.get(url_path='/section/b/')
+        body = StreamPage.objects.get().body
+
+        self.assertEqual(body[0].value.source,
+                         f'<p><a linktype="page" id="{page_a.pk}">A</a> '
+                         f'and <a linktype="page" id="{page_b.pk}">B</a>'
+                         '</p>\n')
+        self.assertEqual(body[1].value.source,
+                         f'<p><a linktype="page" id="{page_a.pk}">A</a></p>')
+
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if '"wagtailcore_page"."url_path" IN' in query['sql']
+        ]), 1)
+
+    @fresh_media_root()
+    def test_media_links(self):
+        """Links to documents and images are rewritten."""
+        doc = textwrap.dedent(
+            """
+            url: /media/
+            type: app.basicpage
+            title: Media
+            body: >
+                <a data-import-document="hello-world.txt">Hello</a>
+                <embed data-import-image="suunn.jpg" format="fullwidth"
+                alt="Sunny"/>
+            """
+        )
+        self.run_import(doc)
+
+        document = Document.objects.get()
+        image = Image.objects.get()
+        self.assertEqual(
+            BasicPage.objects.get().body,
+            f'<a linktype="document" id="{document.pk}">Hello</a> '
+            f'<embed embedtype="image" id="{image.pk}" format="fullwidth" '
+            'alt="Sunny"/>\n')
+
+        # The same files are used again
+        self.run_import(doc)
+        self.assertEqual(Document.objects.count(), 1)
+        self.assertEqual(Image.objects.count(), 1)
+
+    def test_missing_page(self):
+        """Links to missing pages fail the document."""
+        stderr = io.StringIO()
+        self.run_import(textwrap.dedent(
+            """
+            url: /broken/
+            type: app.basicpage
+            title: Broken
+            body: <a data-import-page-url="/missing/">Missing</a>
+            """
+        ), stderr=stderr)
+
+        self.assertFalse(BasicPage.objects.exists())
+        self.assertIn("Can't find /missing/ for data-import-page-url",
+                      stderr.getvalue())
+
+    def test_validation(self):
+        """Links are validated like tags."""
+        errors = validate_document({
+            'url': '/broken/',
+            'type': 'app.basicpage',
+            'body': '<a data-import-page-url="missing/">Missing</a>'
+                    '<embed data-import-image="missing.jpg"/>',
+        }, self.get_import_dir())
+
+        self.assertEqual(errors, [
+            "!page url missing/ must be absolute",
+            "!image file images/missing.jpg doesn't exist",
+        ])
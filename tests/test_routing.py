@@ -0,0 +1,130 @@
+"""
+Test looking up existing objects in a read database.
+"""
+import textwrap
+
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from wagtail.documents.models import Document
+from wagtail.models import Collection
+
+from wagtailimporter import routing
+
+from .app.models import ForeignKeyPage, StreamPage
+from .base import ImporterTestCaseMixin
+
+
+class TestReadDatabase(ImporterTestCaseMixin, TestCase):
+    """Test importing with --read-database."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+
+        # The replica isn't migrated, so has no initial data
+        Collection.objects.using('replica').create(
+            pk=Collection.get_first_root_node().pk,
+            path='0001', depth=1, numchild=0, name="Root")
+
+        # The same document in both databases, as if replicated, with
+        # different titles to tell them apart
+        for alias, title in (('default', "Primary"), ('replica', "Replica")):
+            Document.objects.using(alias).create(
+                pk=100, title=title, file='documents/hello-world.txt')
+
+    def test_existing(self):
+        """Existing objects are read from the read database."""
+        doc = textwrap.dedent(
+            """
+            url: /section/
+            type: app.streampage
+            title: Section
+            body:
+                - type: download
+                  value: !document { file: hello-world.txt }
+
+            ---
+
+            !document
+                file: hello-world.txt
+                title: Updated
+            """
+        )
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.run_import(doc, read_database='replica')
+
+        self.assertTrue(any('wagtaildocs_document' in query['sql']
+                            for query in queries.captured_queries))
+
+        # Written to the primary
+        self.assertEqual(StreamPage.objects.get().body[0].value.pk, 100)
+        self.assertEqual(Document.objects.get().title, "Updated")
+        self.assertEqual(Document.objects.using('replica').get().title,
+                         "Replica")
+
+    def test_saved(self):
+        """Objects that will be saved are read from the primary."""
+        # Changed since the replica was last updated
+        Document.objects.filter(pk=100).update(file_size=42)
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.run_import(textwrap.dedent(
+                """
+                !document
+                    file: hello-world.txt
+                    title: Updated
+                """
+            ), read_database='replica')
+
+        self.assertFalse(any('wagtaildocs_document' in query['sql']
+                             for query in queries.captured_queries))
+        document = Document.objects.get()
+        self.assertEqual(document.title, "Updated")
+        self.assertEqual(document.file_size, 42)
+
+    def test_missing(self):
+        """Objects missing from the read database are read from the primary."""
+        doc = textwrap.dedent(
+            """
+            url: /section/
+            type: app.basicpage
+            title: Section
+
+            ---
+
+            url: /section/child/
+            type: app.foreignkeypage
+            title: Child
+            other_page: !page { url: /section/ }
+            """
+        )
+        self.run_import(doc, read_database='replica')
+
+        child = ForeignKeyPage.objects.get()
+        self.assertEqual(child.other_page.url_path, '/section/')
+
+    def test_written(self):
+        """Objects written during the import are read from the primary."""
+        read_database = routing.ReadDatabase('replica')
+
+        with routing.use(read_database):
+            document = routing.get_existing(Document.objects, pk=100)
+            self.assertEqual(document.title, "Replica")
+            self.assertEqual(document._state.db, 'default')  # noqa: E501 pylint:disable=protected-access
+
+            document.title = "Saved"
+            document.save()
+
+            self.assertIsNone(routing.get_existing(Document.objects, pk=100))
+
+        self.assertIsNone(routing.get_existing(Document.objects, pk=100))
+        self.assertEqual(Document.objects.get().title, "Saved")
+
+    def test_unknown_alias(self):
+        """The read database must be configured."""
+        with self.assertRaisesMessage(CommandError, "Unknown database"):
+            self.run_import('', read_database='nope')
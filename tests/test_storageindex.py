@@ -0,0 +1,107 @@
+"""
+Test remembering which media files exist in storage.
+"""
+import textwrap
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, TestCase
+from wagtail.images.models import Image
+
+from wagtailimporter.storageindex import StorageIndex
+
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+
+class BulkStorage(FileSystemStorage):
+    """A storage that checks many files at once."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked = []
+
+    def bulk_exists(self, names):
+        """Return the names that exist."""
+        self.checked.append(names)
+        return [name for name in names if self.exists(name)]
+
+
+class TestStorageIndex(SimpleTestCase):
+    """Test the index of stored files."""
+
+    def setUp(self):
+        super().setUp()
+        tempdir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(tempdir.cleanup)
+        self.location = tempdir.name
+        self.storage = FileSystemStorage(location=self.location)
+        self.storage.save('images/a.jpg', ContentFile(b'a'))
+        self.index = StorageIndex()
+
+    def test_listing(self):
+        """Each directory is listed once instead of checking each file."""
+        with mock.patch.object(self.storage, 'listdir',
+                               wraps=self.storage.listdir) as listdir, \
+                mock.patch.object(self.storage, 'exists') as exists:
+            self.assertTrue(self.index.exists(self.storage, 'images/a.jpg'))
+            self.assertFalse(self.index.exists(self.storage, 'images/b.jpg'))
+            self.assertFalse(self.index.exists(self.storage, 'other/c.jpg'))
+
+        self.assertEqual([call.args for call in listdir.call_args_list],
+                         [('images',), ('other',)])
+        exists.assert_not_called()
+
+    def test_writes(self):
+        """Files stored and deleted by the import are remembered."""
+        self.index.prefetch(self.storage, ['images/a.jpg', 'images/b.jpg'])
+        self.index.stored(self.storage, 'images/b.jpg')
+        self.index.deleted(self.storage, 'images/a.jpg')
+
+        self.assertTrue(self.index.exists(self.storage, 'images/b.jpg'))
+        self.assertFalse(self.index.exists(self.storage, 'images/a.jpg'))
+
+    def test_bulk_exists(self):
+        """Storages can check many files at once."""
+        storage = BulkStorage(location=self.location)
+
+        self.index.prefetch(storage, ['images/a.jpg', 'images/b.jpg'])
+        self.assertTrue(self.index.exists(storage, 'images/a.jpg'))
+        self.assertFalse(self.index.exists(storage, 'images/b.jpg'))
+        self.assertFalse(self.index.exists(storage, 'images/c.jpg'))
+
+        self.assertEqual(storage.checked,
+                         [['images/a.jpg', 'images/b.jpg'], ['images/c.jpg']])
+
+
+class TestStorageIndexImport(ImporterTestCaseMixin, TestCase):
+    """Test checking media files while importing."""
+
+    @fresh_media_root()
+    def test_import(self):
+        """New media files are found by listing their directories."""
+        with mock.patch.object(FileSystemStorage, 'exists', autospec=True,
+                               return_value=False) as exists, \
+                mock.patch.object(FileSystemStorage, 'listdir',
+                                  autospec=True,
+                                  side_effect=FileNotFoundError) as listdir:
+            self.run_import(textwrap.dedent(
+                """
+                url: /gallery/
+                type: app.streampage
+                title: Gallery
+                body:
+                    - type: gallery
+                      value:
+                          - !image { file: lazors.jpg }
+                          - !image { file: suunn.jpg }
+                          - !image { file: floral.jpeg }
+                """
+            ))
+
+        # Only by get_available_name() as each file is stored
+        self.assertEqual(exists.call_count, 3)
+        self.assertEqual([call.args[1] for call in listdir.call_args_list],
+                         ['original_images/images'])
+        self.assertEqual(Image.objects.count(), 3)
@@ -0,0 +1,127 @@
+"""
+Test stamping out pages from templates.
+"""
+import textwrap
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase, TestCase
+
+from wagtailimporter.serializer import Image, Page, Shared
+from wagtailimporter.templating import Template
+
+from .app.models import BasicPage, StreamPage
+from .base import ImporterTestCaseMixin
+
+SECTION = textwrap.dedent(
+    """
+    url: /locations/
+    type: app.basicpage
+    title: Locations
+
+    ---
+
+    """
+)
+
+
+class TestTemplate(SimpleTestCase):
+    """Test expanding templates."""
+
+    def test_shared(self):
+        """Fields that don't use the parameters are shared."""
+        template = Template(page={
+            'url': '/locations/{slug}/',
+            'type': 'app.streampage',
+            'title': '{name}',
+            'body': [{'type': 'heading', 'value': 'Opening hours'}],
+            'image': Image(file='{slug}.jpg'),
+            'parent': Page(url='/locations/'),
+        }, parameters=[
+            {'slug': 'sydney', 'name': 'Sydney'},
+            {'slug': 'perth', 'name': 'Perth'},
+        ])
+
+        first, second = template.expand()
+
+        self.assertEqual(first['url'], '/locations/sydney/')
+        self.assertEqual(second['title'], 'Perth')
+
+        self.assertIsInstance(first['body'], Shared)
+        self.assertIs(first['body'], second['body'])
+
+        # Tags are made for each page
+        self.assertEqual(first['image'].file, 'sydney.jpg')
+        self.assertEqual(second['image'].file, 'perth.jpg')
+        self.assertIsNot(first['parent'], second['parent'])
+
+    def test_escapes(self):
+        """Braces are escaped by doubling them."""
+        template = Template(page={
+            'url': '/{slug}/',
+            'body': '{{not a parameter}}',
+        }, parameters=[{'slug': 'a'}])
+
+        page, = template.expand()
+        self.assertEqual(page['body'], '{not a parameter}')
+
+    def test_missing_parameter(self):
+        """Rows without a parameter are reported."""
+        template = Template(page={'url': '/{slug}/'},
+                            parameters=[{'slug': 'a'}, {}])
+
+        with self.assertRaisesMessage(ValueError,
+                                      "!template row 2: no parameter 'slug'"):
+            list(template.expand())
+
+
+class TestTemplateImport(ImporterTestCaseMixin, TestCase):
+    """Test importing templates."""
+
+    def test_csv(self):
+        """Pages are made for each row of a CSV file."""
+        cache_dir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(cache_dir.cleanup)
+
+        self.run_import(SECTION + textwrap.dedent(
+            """
+            !template
+                parameters: locations.csv
+                page:
+                    url: /locations/{slug}/
+                    type: app.streampage
+                    title: "{name}"
+                    body:
+                        - type: heading
+                          value: Visit us
+            """
+        ), cache_dir=cache_dir.name)
+
+        self.assertEqual(
+            list(StreamPage.objects.order_by('title')
+                 .values_list('url_path', 'title')),
+            [('/locations/melbourne/', 'Melbourne'),
+             ('/locations/sydney/', 'Sydney')])
+
+        for page in StreamPage.objects.all():
+            self.assertEqual(page.body[0].value, "Visit us")
+
+    def test_jsonl(self):
+        """Whole fields can be parameters from a JSON Lines file."""
+        self.run_import(SECTION + textwrap.dedent(
+            """
+            !template
+                parameters: locations.jsonl
+                page:
+                    url: /locations/{slug}/
+                    type: app.basicpage
+                    title: "{name}"
+                    show_in_menus: "{menu}"
+            """
+        ))
+
+        self.assertTrue(
+            BasicPage.objects.get(url_path='/locations/perth/')
+            .show_in_menus)
+        self.assertFalse(
+            BasicPage.objects.get(url_path='/locations/hobart/')
+            .show_in_menus)
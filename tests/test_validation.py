@@ -0,0 +1,138 @@
+"""
+Test validating documents before importing them.
+"""
+import io
+import textwrap
+
+from django.core.management.base import CommandError
+from django.test import TestCase
+from wagtail.images.models import Image
+
+from .app.models import BasicPage, ForeignKeyPage, StreamPage
+from .base import ImporterTestCaseMixin, fresh_media_root
+
+
+class TestValidation(ImporterTestCaseMixin, TestCase):
+    """Test validating documents before importing them."""
+
+    invalid = textwrap.dedent(
+        """
+        url: /valid/
+        type: app.basicpage
+        title: Valid page
+
+        ---
+
+        url: /no-type/
+        title: No type
+
+        ---
+
+        url: /unknown-type/
+        type: app.nopage
+
+        ---
+
+        url: relative/
+        type: app.basicpage
+
+        ---
+
+        url: /bad-field/
+        type: app.basicpage
+        colour: blue
+
+        ---
+
+        url: /bad-stream/
+        type: app.streampage
+        body:
+            - type: heading
+              value: ""
+            - type: carousel
+              value: []
+            - type: link
+              value:
+                  page: /not-a-reference/
+                  text: Link
+
+        ---
+
+        url: /bad-reference/
+        type: app.foreignkeypage
+        other_page: !page { url: relative/ }
+        image: !image { file: missing.jpg }
+        """
+    )
+
+    def assertInvalid(self, **kwargs):  # pylint:disable=invalid-name
+        """
+        Import the invalid documents and return the errors, without the
+        filename.
+        """
+        stderr = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "8 errors found"):
+            self.run_import(self.invalid, validate=True, stderr=stderr,
+                            **kwargs)
+
+        self.assertFalse(BasicPage.objects.exists())
+        return [error.split(': ', 1)[1]
+                for error in stderr.getvalue().splitlines()]
+
+    def test_errors(self):
+        """All the errors are reported and nothing is imported."""
+        self.assertEqual(self.assertInvalid(), [
+            "document 2: Need `type' for page",
+            "document 3: Unknown page type `app.nopage'",
+            "document 4: Path relative must be absolute",
+            "document 5: Unknown field `colour' for BasicPage",
+            "document 6: body: [0].heading: This field is required.",
+            "document 6: body: [1]: unknown block type `carousel'",
+            "document 6: body: [2].link.page must be an id or a reference",
+            "document 7: !page url relative/ must be absolute",
+            "document 7: warning: !image file images/missing.jpg doesn't "
+            "exist",
+        ])
+
+    @fresh_media_root()
+    def test_imported_media(self):
+        """Media files imported before are only warned about."""
+        Image.objects.create(title="Gone", width=1, height=1,
+                             file='original_images/images/gone.jpg')
+
+        stderr = io.StringIO()
+        self.run_import(textwrap.dedent(
+            """
+            url: /page/
+            type: app.foreignkeypage
+            title: Page
+            image: !image { file: gone.jpg }
+            """
+        ), validate=True, stderr=stderr)
+
+        self.assertIn("warning: !image file images/gone.jpg doesn't exist",
+                      stderr.getvalue())
+        self.assertEqual(ForeignKeyPage.objects.get().image.title, "Gone")
+
+    def test_jobs(self):
+        """Documents can be validated in worker processes."""
+        self.assertEqual(self.assertInvalid(jobs=2), self.assertInvalid())
+
+    @fresh_media_root()
+    def test_valid(self):
+        """Valid documents are imported."""
+        self.run_import(textwrap.dedent(
+            """
+            url: /stream/
+            type: app.streampage
+            title: Stream page
+            body:
+                - type: heading
+                  value: Heading
+                - type: gallery
+                  value:
+                      - !image { file: floral.jpeg }
+            """
+        ), validate=True)
+
+        self.assertEqual(StreamPage.objects.get().body[0].value, "Heading")
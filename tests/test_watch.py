@@ -0,0 +1,203 @@
+"""
+Test watching a directory and re-importing changes.
+"""
+import io
+import shutil
+import textwrap
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from wagtail.images.models import Image
+
+from wagtailimporter.importer import CREATED, UPDATED, Importer
+from wagtailimporter.watch import Watch, Watcher
+
+from .app.models import BasicPage, ForeignKeyPage
+from .base import fresh_media_root
+
+IMAGES = Path(__file__).parent / 'import_data' / 'images'
+
+PAGES = textwrap.dedent(
+    """
+    url: /section/
+    type: app.basicpage
+    title: Section
+
+    ---
+
+    url: /section/gallery/
+    type: app.foreignkeypage
+    title: Gallery
+    other_page: !page { url: /section/ }
+    image: !image { file: photo.jpg }
+    """
+)
+
+
+class TemporaryDirectoryMixin:
+    """Run each test in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        tempdir = TemporaryDirectory()  # noqa: E501 pylint:disable=consider-using-with
+        self.addCleanup(tempdir.cleanup)
+        self.directory = Path(tempdir.name).resolve()
+
+
+class TestWatcher(TemporaryDirectoryMixin, SimpleTestCase):
+    """Test finding changed files."""
+
+    def assertChanges(self, use_inotify):  # pylint:disable=invalid-name
+        """Check changes are found."""
+        (self.directory / 'pages.yaml').write_text("a")
+        (self.directory / 'images').mkdir()
+
+        watcher = Watcher(self.directory, use_inotify=use_inotify)
+        watcher.interval = 0.05
+        self.addCleanup(watcher.close)
+
+        self.assertEqual(watcher.changes(timeout=0.1), set())
+
+        (self.directory / 'pages.yaml').write_text("ab")
+        (self.directory / 'images' / 'new.jpg').write_text("")
+        (self.directory / '.pages.yaml.swp').write_text("")
+
+        self.assertEqual(watcher.changes(timeout=5), {
+            self.directory / 'pages.yaml',
+            self.directory / 'images' / 'new.jpg',
+        })
+
+    def test_inotify(self):
+        """Changes are found with inotify."""
+        self.assertChanges(use_inotify=True)
+
+    def test_polling(self):
+        """Changes are found by polling."""
+        self.assertChanges(use_inotify=False)
+
+
+class TestWatch(TemporaryDirectoryMixin, TestCase):
+    """Test re-importing changes."""
+
+    def setUp(self):
+        super().setUp()
+        (self.directory / 'images').mkdir()
+        shutil.copy(IMAGES / 'lazors.jpg', self.directory / 'images' /
+                    'photo.jpg')
+        (self.directory / 'pages.yaml').write_text(PAGES)
+
+        self.stderr = io.StringIO()
+        self.importer = Importer(stderr=self.stderr)
+        self.watch = Watch(self.importer, self.directory, use_inotify=False)
+
+    @fresh_media_root()
+    def test_changed_documents(self):
+        """Only changed documents are imported again."""
+        results = self.watch.import_changes(self.watch.import_files)
+        self.assertEqual([result.action for result in results],
+                         [CREATED, CREATED])
+
+        # The caches are warm for the next run
+        self.assertIn('app.basicpage', self.importer.page_models)
+        self.assertEqual(self.importer.paths.get('/section/'),
+                         BasicPage.objects.get().pk)
+
+        (self.directory / 'pages.yaml').write_text(
+            PAGES.replace("title: Gallery", "title: Photos"))
+
+        results = self.watch.import_changes({self.directory / 'pages.yaml'})
+        self.assertEqual([(result.action, result.url) for result in results],
+                         [(UPDATED, '/section/gallery/')])
+        self.assertEqual(ForeignKeyPage.objects.get().title, "Photos")
+
+    @fresh_media_root()
+    def test_changed_media(self):
+        """Changed media are stored again with the documents using them."""
+        self.watch.import_changes(self.watch.import_files)
+        self.assertEqual(Image.objects.get().width, 359)
+
+        photo = self.directory / 'images' / 'photo.jpg'
+        shutil.copy(IMAGES / 'suunn.jpg', photo)
+
+        results = self.watch.import_changes({photo})
+        self.assertEqual([result.url for result in results],
+                         ['/section/gallery/'])
+
+        image = Image.objects.get()
+        self.assertEqual((image.width, image.height), (600, 359))
+        with image.file as stored:
+            self.assertEqual(stored.read(), photo.read_bytes())
+
+    @fresh_media_root()
+    def test_changed_fragments(self):
+        """Documents are imported again when fragments they include change."""
+        fragment = self.directory / 'titles.yml.inc'
+        fragment.write_text("gallery: Gallery\n")
+        (self.directory / 'pages.yaml').write_text(PAGES.replace(
+            "title: Gallery", "title: !include titles.yml.inc#gallery"))
+        self.watch.import_changes(self.watch.import_files)
+
+        fragment.write_text("gallery: Photos\n")
+        results = self.watch.import_changes({fragment})
+        self.assertEqual([result.url for result in results],
+                         ['/section/gallery/'])
+        self.assertEqual(ForeignKeyPage.objects.get().title, "Photos")
+
+    @fresh_media_root()
+    def test_moved_pages(self):
+        """Pages moved since the last run are forgotten."""
+        self.watch.import_changes(self.watch.import_files)
+        BasicPage.objects.update(url_path='/elsewhere/')
+
+        self.watch.import_changes(set())
+        self.assertIsNone(self.importer.paths.get('/section/'))
+
+    @fresh_media_root()
+    def test_errors(self):
+        """Errors are reported and the documents imported next time."""
+        (self.directory / 'pages.yaml').write_text(PAGES + "\n---\n[")
+
+        self.assertEqual(
+            self.watch.import_changes(self.watch.import_files), [])
+        self.assertIn("Error importing changes", self.stderr.getvalue())
+        self.assertFalse(BasicPage.objects.exists())
+
+        (self.directory / 'pages.yaml').write_text(PAGES)
+        results = self.watch.import_changes({self.directory / 'pages.yaml'})
+        self.assertEqual(len(results), 2)
+
+    @fresh_media_root()
+    def test_invalid_documents(self):
+        """Documents the database rejects are reported too."""
+        (self.directory / 'pages.yaml').write_text(
+            PAGES.replace("title: Gallery", "title: " + "Gallery" * 50))
+
+        self.assertEqual(
+            self.watch.import_changes(self.watch.import_files), [])
+        self.assertIn("Error importing changes", self.stderr.getvalue())
+        self.assertFalse(BasicPage.objects.exists())
+
+        with mock.patch.object(self.importer, 'import_document',
+                               side_effect=IntegrityError("Duplicate")):
+            self.assertEqual(
+                self.watch.import_changes(self.watch.import_files), [])
+        self.assertIn("Duplicate", self.stderr.getvalue())
+
+        (self.directory / 'pages.yaml').write_text(PAGES)
+        results = self.watch.import_changes({self.directory / 'pages.yaml'})
+        self.assertEqual(len(results), 2)
+
+    def test_options(self):
+        """Watching can't be combined with a one-off import."""
+        with self.assertRaisesMessage(CommandError,
+                                      "--watch can't be used with --mirror"):
+            call_command('import_pages', watch=str(self.directory),
+                         mirror='/')
+
+        with self.assertRaisesMessage(CommandError, "Give files to import"):
+            call_command('import_pages')
@@ -0,0 +1,14 @@
+"""
+URLs for the Wagtail admin views.
+"""
+from django.urls import path
+
+from . import views
+
+app_name = 'wagtailimporter_jobs'
+
+urlpatterns = [
+    path('', views.index, name='index'),
+    path('add/', views.create, name='add'),
+    path('<int:pk>/', views.detail, name='detail'),
+]
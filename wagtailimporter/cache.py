@@ -0,0 +1,144 @@
+"""
+On-disk cache of parsed import files.
+
+Parsed documents are stored in a compact pickled form, keyed by a hash of the
+file contents, the importer version and the registered YAML tags, so that a
+changed file, an upgraded importer or a new/renamed tag class all invalidate
+the cache automatically.
+
+Cache entries are unpickled when loaded, so only point the cache at a
+directory that is not writable by untrusted users.
+"""
+import hashlib
+import io
+import logging
+import os
+import pickle
+import tempfile
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import yaml
+
+# Bump when the layout of cache entries changes
+CACHE_FORMAT = 1
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_version():
+    """The installed version of wagtailimporter."""
+    try:
+        return version('wagtailimporter')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def get_tag_registry():
+    """
+    Map of YAML tag to the class constructed for it by the safe loader.
+    """
+    return {
+        tag: constructor.__self__
+        for tag, constructor in yaml.SafeLoader.yaml_constructors.items()
+        if tag and tag.startswith('!')
+        and isinstance(getattr(constructor, '__self__', None), type)
+        and issubclass(constructor.__self__, yaml.YAMLObject)
+    }
+
+
+class _Pickler(pickle.Pickler):
+    """Pickle tag objects by their YAML tag rather than their class."""
+
+    def persistent_id(self, obj):
+        if isinstance(obj, yaml.YAMLObject) and obj.yaml_tag:
+            return (obj.yaml_tag, obj.__dict__)
+
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    """Rebuild tag objects from the current tag registry."""
+
+    def __init__(self, file, registry):
+        super().__init__(file)
+        self.registry = registry
+
+    def persistent_load(self, pid):
+        tag, state = pid
+
+        try:
+            cls = self.registry[tag]
+        except KeyError as exc:
+            raise pickle.UnpicklingError(f"Unknown tag {tag}") from exc
+
+        # This is what yaml's construct_yaml_object() does
+        obj = cls.__new__(cls)
+        obj.__dict__.update(state)
+        return obj
+
+
+def dumps(docs):
+    """Serialize a list of parsed documents."""
+    buf = io.BytesIO()
+    _Pickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(docs)
+    return buf.getvalue()
+
+
+def loads(data, registry=None):
+    """Deserialize a list of parsed documents."""
+    if registry is None:
+        registry = get_tag_registry()
+
+    return _Unpickler(io.BytesIO(data), registry).load()
+
+
+class ParseCache:
+    """
+    Cache of parsed YAML files stored in `directory'.
+    """
+
+    def __init__(self, directory):
+        # Importing changes directory, so this mustn't be relative
+        self.directory = Path(directory).resolve()
+        self.registry = get_tag_registry()
+
+        fingerprint = hashlib.sha256()
+        fingerprint.update(f'{CACHE_FORMAT}:{get_version()}\n'.encode())
+        for tag, cls in sorted(self.registry.items()):
+            fingerprint.update(
+                f'{tag}={cls.__module__}.{cls.__qualname__}\n'.encode())
+        self.fingerprint = fingerprint.digest()
+
+    def key(self, content):
+        """Cache key for the raw file `content'."""
+        return hashlib.sha256(self.fingerprint + content).hexdigest()
+
+    def load(self, filename):
+        """
+        Return the list of documents in `filename', parsing it only if
+        there is no valid cache entry for it.
+        """
+        content = Path(filename).read_bytes()
+        entry = self.directory / f'{self.key(content)}.pickle'
+
+        try:
+            return loads(entry.read_bytes(), self.registry)
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, ValueError) as exc:
+            LOGGER.warning("Ignoring bad cache entry %s: %s", entry, exc)
+
+        docs = list(yaml.safe_load_all(content.decode('utf-8')))
+        self.store(entry, dumps(docs))
+        return docs
+
+    def store(self, entry, data):
+        """Atomically write a cache entry."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=str(self.directory),
+                                         delete=False) as temp:
+            temp.write(data)
+
+        os.replace(temp.name, str(entry))
@@ -0,0 +1,28 @@
+"""
+Forms for the Wagtail admin.
+"""
+import os
+
+from django import forms
+
+from .models import ImportJob
+from .watch import IMPORT_SUFFIXES
+
+BUNDLE_SUFFIXES = IMPORT_SUFFIXES + ('.zip',)
+
+
+class ImportJobForm(forms.ModelForm):
+    """Submit an ImportJob."""
+
+    class Meta:
+        model = ImportJob
+        fields = ['file', 'validate', 'dry_run']
+
+    def clean_file(self):
+        """Only take import files and zip files."""
+        file_ = self.cleaned_data['file']
+        _, suffix = os.path.splitext(file_.name)
+        if suffix.lower() not in BUNDLE_SUFFIXES:
+            raise forms.ValidationError(
+                "Upload a file ending in " + ', '.join(BUNDLE_SUFFIXES))
+        return file_
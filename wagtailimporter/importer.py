@@ -0,0 +1,968 @@
+"""
+Import pages into Wagtail
+"""
+import copy
+import json
+import operator
+import os
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import reduce
+from itertools import islice
+from pathlib import Path, PurePosixPath
+
+import yaml
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import CommandError
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Concat, Substr
+from django.db.models.signals import post_save
+from django.utils import timezone
+from modelcluster.fields import ParentalKey
+from wagtail.fields import StreamField
+from wagtail.models import Page, Revision
+from wagtail.search.backends import get_search_backends
+from wagtail.search.index import class_is_indexed
+
+from . import (jsonl, memory, pathindex, richtext, routing, serializer,
+               storageindex, templating)
+from .includes import Fragments
+from .pathindex import PathIndex
+from .pipeline import Pipeline
+from .serializer import normalise
+from .storageindex import StorageIndex
+from .validation import ValidationWarning, validate_files
+
+# ImportResult actions
+CREATED = 'created'
+UPDATED = 'updated'
+IMPORTED = 'imported'
+FAILED = 'failed'
+
+# Revision modes
+PUBLISH = 'publish'
+DRAFT = 'draft'
+
+
+# Fields that can only be changed on existing pages with save(), because
+# they affect the page tree or URLs
+SAVE_FIELDS = frozenset((
+    'path', 'depth', 'numchild', 'url_path', 'slug', 'content_type',
+    'locale', 'translation_key',
+))
+
+
+class ImporterError(CommandError):
+    """An error importing documents."""
+
+
+class ImportResult(namedtuple('ImportResult',
+                              ('action', 'object', 'url', 'error'))):
+    """
+    The result of importing a document.
+
+    `action' is one of CREATED or UPDATED for pages, IMPORTED for snippets
+    or FAILED if the document couldn't be imported, with the reason in
+    `error'.
+    """
+    __slots__ = ()
+
+
+def is_child_list(field, value):
+    """
+    Whether `value' is a list of references to the children of a
+    ClusterableModel, to import onto the child relation `field'.
+    """
+    return (field.one_to_many
+            and isinstance(getattr(field, 'field', None), ParentalKey)
+            and isinstance(value, list)
+            and all(isinstance(
+                ref, serializer.GetOrCreateClusterableForeignObject)
+                for ref in value))
+
+
+@contextmanager
+def working_directory(path):
+    """Change to `path', if given, for the duration of the block."""
+    if path is None:
+        yield
+        return
+
+    cwd = Path.cwd()
+    try:
+        os.chdir(str(path))
+        yield
+    finally:
+        os.chdir(str(cwd))
+
+
+def consume(docs):
+    """Generate the documents in a list, removing them from it."""
+    docs.reverse()
+    while docs:
+        yield docs.pop()
+
+
+def batched(iterable, size):
+    """Split an iterable into lists of `size'."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Importer:
+    """
+    Import pages and snippets into Wagtail.
+
+    Documents can be given as YAML files, or directly as Python objects:
+    dicts for pages and tag objects from `wagtailimporter.serializer' for
+    references and snippets.
+
+    Progress is written to `stdout' and errors to `stderr', if given. Parsed
+    files are cached in `cache', a ParseCache, if given. Objects that existed
+    before the import are looked up in the `read_database' alias, if given
+    (see `wagtailimporter.routing').
+
+    If `fast_updates' is set, existing pages whose documents only change
+    plain fields are updated with batched UPDATEs of the changed columns
+    instead of save(), skipping validation of unchanged fields and the save
+    signals.
+
+    If `revisions' is PUBLISH, a revision is created for every imported page
+    and published. If it is DRAFT, the imported content is only saved as a
+    revision, leaving existing pages' live content alone, and new pages are
+    created unpublished. Revisions are created and published a batch at a
+    time.
+
+    If `max_memory' is set, lookup caches are bounded (to `cache_size'
+    entries), the results don't keep the imported pages and Django doesn't
+    log queries (see `wagtailimporter.memory').
+
+    Fragment files included with `!include' must be under the directory of
+    the file including them, or under `include_root' if it is given (see
+    `wagtailimporter.includes').
+
+    If `locks', a SubtreeLocks, is given, the subtrees new pages are added to
+    are locked until the transaction ends, so other imports into the same
+    subtrees wait (see `wagtailimporter.locking').
+    """
+
+    # Number of documents to resolve images for at a time
+    batch_size = 100
+    # Number of documents held between each stage of a pipelined import
+    queue_size = 100
+    # Number of entries kept in each lookup cache with `max_memory'
+    cache_size = 10000
+    # Number of children moved by each UPDATE when reordering
+    move_batch_size = 500
+    # Number of subtrees removed by each query when mirroring, keeping under
+    # SQLite's limit on expression depth
+    subtree_batch_size = 500
+    # Number of pages looked up by id at a time, keeping under SQLite's
+    # limit on query parameters
+    lookup_batch_size = 900
+
+    def __init__(self, stdout=None, stderr=None, cache=None,
+                 read_database=None, fast_updates=False, revisions=None,
+                 progress=None, locks=None, max_memory=False,
+                 include_root=None):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.cache = cache
+        self.fast_updates = fast_updates
+        self.revisions = revisions
+        # A wagtailimporter.progress.Progress, to report progress to
+        self.progress = progress
+        # A wagtailimporter.locking.SubtreeLocks, to lock the parts of the
+        # page tree pages are added to
+        self.locks = locks
+        self.max_memory = max_memory
+
+        self.read_database = None
+        if read_database is not None:
+            if read_database not in connections:
+                raise ImporterError(f"Unknown database `{read_database}'")
+            self.read_database = routing.ReadDatabase(read_database)
+
+        self.touched_pages = set()
+        # Imported page ids in the order they were first imported
+        self.page_order = {}
+        self.errors = 0
+
+        # These are kept between calls, e.g. by `wagtailimporter.watch'
+        max_size = self.cache_size if max_memory else None
+        self.paths = PathIndex(max_size=max_size)
+        self.fragments = Fragments(cache, max_size=max_size,
+                                   root=include_root)
+        self.page_models = {}
+        self.plain_fields = {}
+
+        # url_path -> (page, changed field names) for update_page()
+        self.pending_updates = {}
+        # Pages to create revisions for
+        self.pending_revisions = []
+
+    def log(self, message):
+        """Report progress."""
+        if self.stdout is not None:
+            if self.progress is not None:
+                self.progress.clear()
+            self.stdout.write(message + '\n')
+
+    def error(self, message):
+        """Report an error."""
+        if self.stderr is not None:
+            if self.progress is not None:
+                self.progress.clear()
+            self.stderr.write(message + '\n')
+
+    def start_file(self, filename):
+        """Report starting to import a file."""
+        self.log(f"Reading {filename}")
+        if self.progress is not None:
+            self.progress.start_file(filename)
+
+    def import_files(self, filenames, validate=False, jobs=1,
+                     pipeline=False):
+        """
+        Import YAML or JSON Lines files, returning a list of ImportResult.
+
+        If `validate' is set, every document is validated (in `jobs'
+        processes) before any are imported.
+
+        If `pipeline' is set, files are parsed and media staged in
+        background threads while documents are written (see
+        `wagtailimporter.pipeline').
+        """
+        # Fragment files may have changed since the last call
+        self.fragments.revalidate()
+
+        # Files are read lazily, after changing to the directory of the file
+        # before, so find them first
+        paths = [(filename, os.path.abspath(filename))
+                 for filename in filenames]
+        files = (
+            (filename, self.load_file(path))
+            for filename, path in paths
+        )
+
+        with ExitStack() as stack:
+            # Media files stored are found once for the run
+            stack.enter_context(storageindex.use(StorageIndex()))
+            if self.progress is not None:
+                stack.enter_context(self.progress.tracking(filenames))
+
+            if validate:
+                files = [(filename, list(docs)) for filename, docs in files]
+                self.validate(files, jobs)
+                # Let documents go once they are imported
+                files = [(filename, consume(docs)) for filename, docs in files]
+
+            if pipeline:
+                return Pipeline(self, queue_size=self.queue_size).run(files)
+
+            results = []
+            for filename, docs in files:
+                self.start_file(filename)
+                results.extend(self.import_documents(
+                    docs, base_dir=Path(filename).parent))
+
+            return results
+
+    def load_file(self, filename):
+        """
+        Parse the documents in a file.
+
+        Uncached files are read lazily, a document at a time, and fragments
+        are included and templates expanded as they are reached.
+        """
+
+        if Path(filename).suffix in jsonl.SUFFIXES:
+            docs = jsonl.load_documents(filename)
+        elif self.cache:
+            docs = consume(self.cache.load(filename))
+        else:
+            docs = self.load_yaml(filename)
+
+        docs = self.fragments.splice_documents(docs, filename)
+        return templating.expand(docs, base_dir=Path(filename).parent)
+
+    @staticmethod
+    def load_yaml(filename):
+        """Generate the documents in a YAML file."""
+        with open(filename, encoding="utf-8") as file_:
+            yield from yaml.safe_load_all(file_)
+
+    def validate(self, files, jobs=1):
+        """
+        Validate all the documents in a list of (filename, docs), raising
+        ImporterError if there are any errors.
+        """
+        errors = 0
+        for filename, number, error in validate_files(files, jobs=jobs):
+            if isinstance(error, ValidationWarning):
+                self.error(f"{filename}: document {number}: "
+                           f"warning: {error}")
+                continue
+
+            errors += 1
+            self.error(f"{filename}: document {number}: {error}")
+
+        if errors:
+            raise ImporterError(f"{errors} errors found, nothing imported")
+
+    @transaction.atomic
+    def import_documents(self, docs, base_dir=None):
+        """
+        Import an iterable of documents, returning a list of ImportResult.
+
+        Each document is either a page, as a dict, or a tag object. The
+        documents aren't changed, so they can be imported again. Relative
+        media paths are found from `base_dir', or the current directory.
+        """
+        results = []
+        if self.locks is not None:
+            self.locks.begin()
+
+        with working_directory(base_dir), \
+                routing.use(self.read_database), \
+                pathindex.use(self.paths), \
+                storageindex.use(storageindex.current() or StorageIndex()), \
+                (memory.query_log_disabled() if self.max_memory
+                 else nullcontext()):
+            for batch in batched(docs, self.batch_size):
+                # Create all the new images in one go
+                serializer.Image.bulk_get_objects(
+                    ref for ref in serializer.iter_references(batch)
+                    if isinstance(ref, serializer.Image))
+
+                for doc in batch:
+                    result = self.import_document(doc)
+                    if self.progress is not None:
+                        self.progress.document(result)
+                    if self.max_memory:
+                        # The page is let go once it has been written
+                        result = result._replace(object=None)
+                    results.append(result)
+
+                self.flush_updates()
+                self.flush_revisions()
+
+        return results
+
+    def import_document(self, doc):
+        """Import a single document, returning an ImportResult."""
+
+        try:
+            # Every link in the document is resolved together
+            doc = richtext.rewrite_links(doc)
+
+            if isinstance(doc, serializer.GetForeignObject):
+                return self.import_snippet(doc)
+
+            result = self.import_page(doc)
+            # Only once the page's savepoint has been released
+            self.paths.add(result.object)
+            return result
+        except CommandError as exc:
+            self.errors += 1
+            self.error(f"Error importing page: {exc}")
+            return ImportResult(FAILED, None, None, str(exc))
+
+    @transaction.atomic
+    def import_snippet(self, data):
+        """Import a snippet (which is a GetForeignObject)."""
+
+        # Saved with every field, so not read from the read database
+        data = copy.copy(data)
+        data.read_database = False
+        obj = data.__to_value__()
+        self.log(f"Importing {obj._meta.verbose_name} {obj}")
+        obj.save()
+
+        return ImportResult(IMPORTED, obj, None, None)
+
+    @transaction.atomic
+    def import_page(self, data):
+        """Import a single wagtail page."""
+        # Fields are taken off as they are used, leaving the caller's alone
+        data = dict(data)
+        model = self.get_page_model_class(data)
+        page, created = self.find_page(model, data)
+        self.touched_pages.add(page.pk)
+        self.page_order.setdefault(page.pk, None)
+
+        return ImportResult(CREATED if created else UPDATED,
+                            page, page.url_path, None)
+
+    def get_page_model_class(self, data):
+        """
+        Get the page model class from the `type' parameter.
+
+        Models are cached in `page_models'.
+        """
+
+        try:
+            type_ = data.pop('type')
+        except KeyError as exc:
+            raise ImporterError("Need `type' for page") from exc
+
+        try:
+            return self.page_models[type_]
+        except (KeyError, TypeError):
+            pass
+
+        self.page_models[type_] = model = self.find_page_model_class(type_)
+        return model
+
+    def find_page_model_class(self, type_):
+        """Look up the page model class for a `type' parameter."""
+
+        try:
+            app_label, model = type_.split('.')
+            content_type = routing.get_existing(
+                ContentType.objects, app_label=app_label, model=model) \
+                or ContentType.objects.get(app_label=app_label, model=model)
+            return content_type.model_class()
+        except (ValueError, AttributeError) as exc:
+            raise ImporterError("`type' is of form `app.model'") from exc
+        except ContentType.DoesNotExist as exc:
+            raise ImporterError(f"Unknown page type `{type_}'") from exc
+
+    def find_page(self, model, data):
+        """
+        Find a page by its URL and import its data.
+
+        Data importing has to be done here because often the page can't
+        be saved until the data is imported (i.e. null fields)
+
+        Returns the page and whether it was created.
+        """
+        try:
+            url = PurePosixPath(data.pop('url'))
+            if not url.is_absolute():
+                raise ImporterError(f"Path {url} must be absolute")
+
+        except KeyError as exc:
+            raise ImporterError("Need `url' for page") from exc
+
+        if normalise(url) in self.pending_updates:
+            self.flush_updates()
+
+        page = model.objects.filter(url_path=normalise(url)).first()
+        if page is None:
+            try:
+                # pylint:disable=no-member
+                parent = Page.objects.get(url_path=normalise(url.parent))
+            except Page.DoesNotExist as exc:
+                raise ImporterError(f"Parent of {url} doesn't exist") \
+                    from exc
+
+            if self.locks is not None and self.locks.lock(parent.path):
+                # Another import may have added children while we waited,
+                # including this page
+                parent.refresh_from_db(fields=['numchild'])
+                page = model.objects.filter(url_path=normalise(url)).first()
+
+        if page is not None:
+            fields = self.get_plain_fields(model, data)
+            if self.revisions == DRAFT:
+                # The live page is left alone
+                self.import_data(page, data)
+            elif fields is not None:
+                self.update_page(page, data, fields)
+            elif data.get('slug', page.slug) != page.slug:
+                self.move_page(page, data)
+            else:
+                children = self.import_data(page, data)
+                with self.saving_children(page, children):
+                    page.save()
+            created = False
+            self.log(f"Updating existing page {url}")
+        else:
+            page = model(slug=url.name)
+            children = self.import_data(page, data)
+            if self.revisions == DRAFT:
+                page.live = False
+            with self.saving_children(page, children):
+                parent.add_child(instance=page)
+            created = True
+            self.log(f"Creating new page {url}")
+
+        if self.revisions:
+            self.pending_revisions.append(page)
+
+        return page, created
+
+    def move_page(self, page, data):
+        """
+        Import data onto an existing page that changes its slug, moving it
+        and its descendants to a new url_path.
+
+        Wagtail's Page.save() rewrites the descendants' url_paths with a
+        single UPDATE on their path prefix. The path index is moved to
+        match rather than forgotten.
+        """
+        # Queued updates are keyed by the old paths
+        self.flush_updates()
+
+        old_url_path = page.url_path
+        children = self.import_data(page, data)
+        with self.saving_children(page, children):
+            page.save()
+
+        self.paths.move_tree(old_url_path, page.url_path)
+        self.log(f"Moving {old_url_path} to {page.url_path}")
+
+    def get_plain_fields(self, model, data):
+        """
+        Get the fields set by `data' if they can all be updated without
+        save(), or None if they can't or `fast_updates' isn't set.
+
+        Only concrete fields that aren't StreamFields or in SAVE_FIELDS
+        are plain, and only on models without auto_now fields.
+        """
+        if not self.fast_updates:
+            return None
+
+        key = (model, tuple(data))
+        try:
+            return self.plain_fields[key]
+        except KeyError:
+            pass
+
+        fields = []
+        for name in data:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                fields = None
+                break
+
+            if not field.concrete or field.many_to_many \
+                    or field.primary_key or field.name in SAVE_FIELDS \
+                    or isinstance(field, StreamField):
+                fields = None
+                break
+
+            fields.append(field)
+
+        if any(getattr(field, 'auto_now', False)
+               for field in model._meta.concrete_fields):
+            fields = None
+
+        self.plain_fields[key] = fields
+        return fields
+
+    def update_page(self, page, data, fields):
+        """
+        Import the data onto an existing page, queueing the changed `fields'
+        to be written by flush_updates().
+        """
+        old = [getattr(page, field.attname) for field in fields]
+        self.import_data(page, data)
+
+        changed = [field.name for field, value in zip(fields, old)
+                   if getattr(page, field.attname) != value]
+        if not changed:
+            return
+
+        page.clean_fields(exclude=[field.name
+                                   for field in page._meta.fields
+                                   if field.name not in changed])
+        self.pending_updates[page.url_path] = (page, changed)
+
+    def flush_updates(self):
+        """
+        Write the changes queued by update_page(), with an UPDATE per
+        table for each set of changed fields, and update the search index.
+        """
+        groups = {}
+        for page, fields in self.pending_updates.values():
+            groups.setdefault((type(page), tuple(fields)), []).append(page)
+        self.pending_updates = {}
+
+        by_model = {}
+        for (model, fields), pages in groups.items():
+            model.objects.bulk_update(pages, fields)
+            by_model.setdefault(model, []).extend(pages)
+
+        for model, pages in by_model.items():
+            routing.mark_written(pages)
+
+            if class_is_indexed(model):
+                for backend in get_search_backends(with_auto_update=True):
+                    backend.add_bulk(model, pages)
+
+    def flush_revisions(self):
+        """
+        Create revisions for the pages imported since the last call in one
+        INSERT, and point the pages at them (publishing them unless
+        `revisions' is DRAFT) in one UPDATE.
+        """
+        pages = self.pending_revisions
+        if not pages:
+            return
+        self.pending_revisions = []
+
+        now = timezone.now()
+        revisions = Revision.objects.bulk_create([
+            Revision(content_type_id=page.content_type_id,
+                     base_content_type=page.get_base_content_type(),
+                     object_id=str(page.pk),
+                     created_at=now,
+                     content=page.serializable_data(),
+                     object_str=str(page))
+            for page in pages
+        ])
+
+        # Not every database returns the new primary keys
+        if any(revision.pk is None for revision in revisions):
+            saved = {
+                revision.object_id: revision
+                for revision in Revision.objects.filter(
+                    created_at=now,
+                    object_id__in=[str(page.pk) for page in pages])
+                .order_by('pk')
+            }
+            revisions = [saved[revision.object_id] for revision in revisions]
+
+        fields = ['latest_revision', 'latest_revision_created_at',
+                  'draft_title', 'has_unpublished_changes']
+        if self.revisions != DRAFT:
+            fields += ['live', 'live_revision', 'first_published_at',
+                       'last_published_at']
+
+        latest = {}
+        for page, revision in zip(pages, revisions):
+            page.latest_revision = revision
+            page.latest_revision_created_at = now
+            page.draft_title = page.title
+
+            if self.revisions == DRAFT:
+                page.has_unpublished_changes = True
+            else:
+                page.live = True
+                page.has_unpublished_changes = False
+                page.live_revision = revision
+                page.first_published_at = page.first_published_at or now
+                page.last_published_at = now
+
+            # The last revision of a page imported twice wins
+            latest[page.pk] = page
+
+        Page.objects.bulk_update(latest.values(), fields)
+        routing.mark_written(latest.values())
+
+    def import_data(self, page, data):
+        """
+        Import the data onto a page.
+
+        Returns the child relations that are written in bulk by
+        `saving_children', as a dict of the relation to the children that
+        were removed.
+        """
+        children = {}
+
+        for key, value in data.items():
+            try:
+                field = page._meta.get_field(key)
+
+                if isinstance(field, StreamField):
+                    if isinstance(value, serializer.Shared):
+                        value = value.dumps()
+                    else:
+                        value = json.dumps(value,
+                                           cls=serializer.JSONEncoder)
+                elif is_child_list(field, value):
+                    resolved = self.get_children(page, field, value)
+                    if resolved is not None:
+                        value, children[field] = resolved
+                else:
+                    # Assume we know how to serialise it
+                    pass
+
+            except FieldDoesNotExist:
+                # This might be a property, just try and set it anyway
+                pass
+
+            value = serializer.FieldStorable.to_objects(value)
+
+            setattr(page, key, value)
+
+        return children
+
+    @staticmethod
+    def get_children(page, relation, refs):
+        """
+        Resolve references to the children of `page' in a child relation,
+        with one query for its existing children.
+
+        Returns the children and the existing children that were removed, or
+        None if the references can't be resolved in bulk.
+        """
+        existing = []
+        if page.pk is not None:
+            existing = list(relation.related_model.objects.filter(
+                **{relation.field.name: page}))
+
+        resolved = serializer.GetOrCreateClusterableForeignObject\
+            .bulk_to_objects(refs, existing)
+
+        # Keep the order of the import, as the admin would
+        sort_order_field = getattr(relation.related_model,
+                                   'sort_order_field', None)
+        if resolved is not None and sort_order_field:
+            for index, obj in enumerate(resolved[0]):
+                setattr(obj, sort_order_field, index)
+
+        return resolved
+
+    @contextmanager
+    def saving_children(self, page, children):
+        """
+        Write the `children' of `page' returned by import_data in bulk once
+        the block has saved it, instead of modelcluster committing them one
+        at a time: one INSERT for the new children, one UPDATE for the
+        existing ones and one DELETE for those removed.
+        """
+        objects = {}
+
+        def take_children(instance, **kwargs):  # noqa: E501 pylint:disable=unused-argument
+            # Once the page's other post_save receivers (e.g. the reference
+            # index) have seen the children, but before they're committed
+            if instance is page:
+                cluster = instance._cluster_related_objects  # noqa: E501 pylint:disable=protected-access
+                for relation in children:
+                    objects[relation] = cluster.pop(
+                        relation.get_accessor_name(), [])
+
+        if not children:
+            yield
+            return
+
+        post_save.connect(take_children, sender=type(page), weak=False)
+        try:
+            yield
+        finally:
+            post_save.disconnect(take_children, sender=type(page))
+
+        written = []
+        for relation, removed in children.items():
+            model = relation.related_model
+            new = []
+            existing = []
+            for obj in objects.get(relation, ()):
+                setattr(obj, relation.field.name, page)
+                (existing if obj.pk is not None else new).append(obj)
+
+            if removed:
+                model.objects.filter(
+                    pk__in=[child.pk for child in removed]).delete()
+            if new:
+                written.extend(model.objects.bulk_create(new))
+            if existing:
+                model.objects.bulk_update(existing, [
+                    field.name for field in model._meta.concrete_fields
+                    if not field.primary_key
+                ])
+                written.extend(existing)
+
+        routing.mark_written(written)
+
+    def mirror(self, url, unpublish=False, max_delete=None):
+        """
+        Remove the pages under `url' that weren't part of this import.
+
+        Pages are removed a whole subtree at a time. Pages that are ancestors
+        of imported pages are kept.
+        """
+        try:
+            # pylint:disable=no-member
+            root = Page.objects.get(url_path=normalise(url))
+        except Page.DoesNotExist as exc:
+            raise ImporterError(f"Mirror root {url} doesn't exist") from exc
+
+        if self.errors:
+            self.error(f"Not mirroring {url} because of errors")
+            return
+
+        keep = set()
+        for path in self.page_paths(self.touched_pages).values():
+            keep.update(path[:end]
+                        for end in range(Page.steplen, len(path) + 1,
+                                         Page.steplen))
+
+        stale = {
+            path: url_path
+            for path, url_path in Page.objects
+            .descendant_of(root)
+            .values_list('path', 'url_path')
+            if path not in keep
+        }
+
+        # Every descendant of a stale page is stale, so only the topmost
+        # pages of each stale subtree need removing
+        ordered = sorted(stale)
+        subtrees = [path for path in ordered
+                    if path[:-Page.steplen] not in stale]
+
+        if max_delete is not None and len(stale) > max_delete:
+            raise ImporterError(
+                f"Mirroring {url} would remove {len(stale)} pages, "
+                f"more than the maximum of {max_delete}")
+
+        action = "Unpublishing" if unpublish else "Deleting"
+        for path in subtrees:
+            # Paths sort before any path they are a prefix of, and `~' sorts
+            # after every character in a path
+            descendants = bisect_left(ordered, path + '~') \
+                - bisect_left(ordered, path) - 1
+            self.log(f"{action} {stale[path]} ({descendants} descendants)")
+
+        if not subtrees:
+            return
+
+        if unpublish:
+            for pages in self.subtree_pages(subtrees):
+                pages.filter(live=True).update(live=False,
+                                               has_unpublished_changes=True)
+            return
+
+        parents = {}
+        for path in subtrees:
+            parent = path[:-Page.steplen]
+            parents[parent] = parents.get(parent, 0) + 1
+
+        if self.locks is not None:
+            self.locks.begin()
+            self.locks.lock_all(parents)
+
+        for path in subtrees:
+            self.paths.discard_tree(stale[path])
+
+        for parent, count in parents.items():
+            Page.objects.filter(path=parent)\
+                .update(numchild=F('numchild') - count)
+
+        # Bypass treebeard's delete(), which updates parents one at a time
+        for pages in self.subtree_pages(subtrees):
+            models.QuerySet.delete(pages)
+
+    @classmethod
+    def subtree_pages(cls, subtrees):
+        """
+        The pages in the subtrees at the tree paths `subtrees', as a QuerySet
+        for each `subtree_batch_size' subtrees.
+        """
+        for batch in batched(subtrees, cls.subtree_batch_size):
+            yield Page.objects.filter(reduce(operator.or_, (
+                Q(path__startswith=path) for path in batch
+            )))
+
+    def reorder(self):
+        """
+        Order the children of each parent of an imported page to match the
+        order their pages were imported in, with any other children after
+        them in their existing order.
+
+        The children's tree paths are reassigned with two UPDATEs per
+        parent (one to move the children out of the way and one to put them
+        in place), which also move their descendants. URL paths don't
+        change.
+        """
+        steplen = Page.steplen
+
+        children = {}
+        paths = self.page_paths(self.page_order)
+        for pk in self.page_order:
+            path = paths.get(pk)
+            if path and len(path) > steplen:
+                children.setdefault(path[:-steplen], []).append(path)
+
+        if self.locks is not None:
+            self.locks.begin()
+            self.locks.lock_all(children)
+
+        # Deeper parents first, as moving a page moves its descendants
+        for parent_path, imported in sorted(children.items(),
+                                            key=lambda item: -len(item[0])):
+            current = list(
+                Page.objects.filter(path__startswith=parent_path,
+                                    depth=len(parent_path) // steplen + 1)
+                .order_by('path')
+                .values_list('path', flat=True))
+
+            seen = set(imported)
+            target = imported + [path for path in current
+                                 if path not in seen]
+            if target == current:
+                continue
+
+            # The children keep the same set of paths, in the new order
+            moves = {old: new for old, new in zip(target, current)
+                     if old != new}
+
+            last = Page._str2int(current[-1][-steplen:])
+            if last + len(moves) >= len(Page.alphabet) ** steplen:
+                raise ImporterError(
+                    f"Can't reorder the children of {parent_path}, there "
+                    "are no free paths")
+
+            depth = len(parent_path) // steplen + 1
+            temporary = {
+                old: Page._get_path(parent_path, depth, last + index)
+                for index, old in enumerate(moves, start=1)
+            }
+
+            url_path = Page.objects.filter(path=parent_path)\
+                .values_list('url_path', flat=True).first()
+            self.log(f"Reordering children of {url_path}")
+
+            self.move_paths(parent_path, temporary)
+            self.move_paths(parent_path, {
+                temporary[old]: new for old, new in moves.items()
+            })
+
+    def page_paths(self, pks):
+        """Get a dict of page id -> tree path for the pages `pks'."""
+        paths = {}
+        for batch in batched(pks, self.lookup_batch_size):
+            paths.update(Page.objects.filter(pk__in=batch)
+                         .values_list('pk', 'path'))
+        return paths
+
+    @classmethod
+    def move_paths(cls, parent_path, moves):
+        """
+        Move children of the page at `parent_path', and their descendants,
+        from old to new tree paths in `moves', with an UPDATE per
+        `move_batch_size' children.
+
+        The pages to move are found by the step of their path below the
+        parent, so the statements don't grow a condition per child.
+        """
+        start = len(parent_path) + 1
+        steplen = Page.steplen
+        depth = len(parent_path) // steplen
+
+        for batch in batched(moves.items(), cls.move_batch_size):
+            Page.objects\
+                .filter(path__startswith=parent_path, depth__gt=depth)\
+                .annotate(step=Substr('path', start, steplen))\
+                .filter(step__in=[old[-steplen:] for old, _ in batch])\
+                .update(path=Concat(
+                    Value(parent_path),
+                    Case(*(When(path__startswith=old,
+                                then=Value(new[-steplen:]))
+                           for old, new in batch),
+                         output_field=models.CharField()),
+                    Substr('path', start + steplen),
+                    output_field=models.CharField(),
+                ))
@@ -0,0 +1,249 @@
+"""
+Fragments of documents shared between import files.
+
+`!include path#name' is replaced by the fragment `name' of the YAML file at
+`path', found relative to the file it is in, or by the whole file without
+`#name'. A fragment file is a single document, usually a mapping of names to
+fragments:
+
+    # blocks.yml.inc
+    header:
+        type: heading
+        value: Welcome
+    footer:
+        type: paragraph
+        value: <p>Call us on <a href="tel:1234">1234</a></p>
+
+    # pages.yaml
+    url: /about/
+    type: app.basicpage
+    body:
+        - !include blocks.yml.inc#header
+        - type: paragraph
+          value: <p>About us</p>
+        - !include blocks.yml.inc#footer
+
+An include in a list whose fragment is also a list is spliced into it.
+Fragment files can include other fragment files. Fragment files must be
+under the directory of the file including them, or the Importer's
+`include_root', so an import can't read other files on the server.
+
+Each fragment file is parsed once per run (through the ParseCache, if there
+is one), keyed by a hash of its contents so changed files are parsed again.
+Every include of a fragment in a run is spliced in as the same object, so
+its references and links are resolved and rewritten in place once. Whole
+fields of pages that are tag-free fragments are shared (see
+`serializer.Shared') so are only serialized once.
+"""
+import copy
+import hashlib
+from pathlib import Path
+
+import yaml
+
+from . import richtext, sandbox, serializer
+from .memory import LRUDict
+
+
+class Include(yaml.YAMLObject):
+    """A reference to a fragment, `path#name'."""
+
+    yaml_tag = '!include'
+    yaml_loader = yaml.SafeLoader
+    yaml_dumper = yaml.SafeDumper
+
+    def __init__(self, ref=None):
+        # Not called when loaded from YAML
+        super().__init__()
+        self.ref = ref
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        if isinstance(node, yaml.ScalarNode):
+            return cls(loader.construct_scalar(node))
+
+        return super().from_yaml(loader, node)
+
+    @classmethod
+    def to_yaml(cls, dumper, data):
+        return dumper.represent_scalar(cls.yaml_tag, data.ref)
+
+
+def is_shareable(value):
+    """Whether a fragment can be shared as a whole field."""
+    return isinstance(value, (dict, list)) and bool(value) \
+        and not any(serializer.iter_references(value)) \
+        and not any(richtext.iter_links(value))
+
+
+class Fragments:
+    """
+    The fragment files included by an import, parsed once each.
+
+    Parsed files are cached in `cache', a ParseCache, if given, and at most
+    `max_size' recently used parsed files are kept in memory, if given.
+
+    Fragment files must be under `root', if given, or the directory files
+    are confined to by `wagtailimporter.sandbox', or else under the
+    directory of the file including them, so imports can't read files
+    elsewhere on the server.
+    """
+
+    def __init__(self, cache=None, max_size=None, root=None):
+        self.cache = cache
+        # Importing changes directory, so this mustn't be relative
+        self.root = None if root is None else Path(root).resolve()
+
+        # Hash of the contents of a file -> the file parsed, never handed out
+        self.parsed = {} if max_size is None else LRUDict(max_size)
+        # Path -> the file with its includes spliced in, and the paths of
+        # the files it included, this run
+        self.loaded = {}
+        # (path, name) -> a Shared fragment, this run
+        self.shared = {}
+        # Import file -> paths of the fragment files it included
+        self.used = {}
+
+    def revalidate(self):
+        """
+        Start a new run, reading the files again. Files that haven't changed
+        aren't parsed again.
+        """
+        self.loaded = {}
+        self.shared = {}
+
+    def splice_documents(self, docs, filename):
+        """Generate the documents in a file, splicing in fragments."""
+        used = self.used[str(filename)] = set()
+        base_dir = Path(filename).parent
+
+        for doc in docs:
+            if isinstance(doc, dict):
+                doc = {
+                    key: self.get_field(value, base_dir, used)
+                    if isinstance(value, Include)
+                    else self.splice(value, base_dir, used)
+                    for key, value in doc.items()
+                }
+            else:
+                doc = self.splice(doc, base_dir, used)
+
+            yield doc
+
+    def get_field(self, include, base_dir, used):
+        """Get a fragment that is a whole field, shared if it can be."""
+        path, name = self.locate(include, base_dir)
+        value = self.get(path, name, used)
+
+        if (path, name) not in self.shared:
+            self.shared[(path, name)] = serializer.Shared(value) \
+                if is_shareable(value) else None
+
+        return self.shared[(path, name)] or value
+
+    def splice(self, value, base_dir, used, including=()):
+        """
+        Splice fragments into a value in place of the includes in it, for a
+        file in `base_dir'.
+        """
+        if isinstance(value, Include):
+            return self.get(*self.locate(value, base_dir), used, including)
+
+        if isinstance(value, yaml.YAMLObject):
+            value.__dict__.update(
+                self.splice(vars(value), base_dir, used, including))
+            return value
+
+        if isinstance(value, dict):
+            return {key: self.splice(elem, base_dir, used, including)
+                    for key, elem in value.items()}
+
+        if isinstance(value, list):
+            spliced = []
+            for elem in value:
+                if isinstance(elem, Include):
+                    elem = self.splice(elem, base_dir, used, including)
+                    if isinstance(elem, list):
+                        spliced.extend(elem)
+                        continue
+                else:
+                    elem = self.splice(elem, base_dir, used, including)
+                spliced.append(elem)
+            return spliced
+
+        return value
+
+    def locate(self, include, base_dir):
+        """
+        The absolute path and name of the fragment an include is for, which
+        must be under `root', or `base_dir' if there is no root.
+        """
+        ref = getattr(include, 'ref', None)
+        if not isinstance(ref, str) or not ref.partition('#')[0]:
+            raise ValueError(f"!include needs a path, not {ref!r}")
+
+        path, _, name = ref.partition('#')
+        if Path(path).is_absolute():
+            raise ValueError(f"!include {path}: must be a relative path")
+
+        base_dir = Path(base_dir or '').resolve()
+        root = self.root or sandbox.current() or base_dir
+        resolved = base_dir.joinpath(path).resolve()
+        if not sandbox.is_under(resolved, root):
+            raise ValueError(f"!include {path}: must be under {root}")
+
+        return resolved, name
+
+    def get(self, path, name, used, including=()):
+        """Get the fragment `name' of the file at `path'."""
+        value = self.load(path, used, including)
+        if not name:
+            return value
+
+        if not isinstance(value, dict) or name not in value:
+            raise ValueError(f"!include {path}#{name}: no fragment `{name}'")
+        return value[name]
+
+    def load(self, path, used, including=()):
+        """Load a fragment file, with its includes spliced in."""
+        used.add(path)
+        try:
+            value, nested = self.loaded[path]
+        except KeyError:
+            pass
+        else:
+            used.update(nested)
+            return value
+
+        if path in including:
+            raise ValueError(f"!include {path} includes itself")
+
+        try:
+            content = path.read_bytes()
+        except OSError as exc:
+            raise ValueError(
+                f"!include {path}: can't read it: {exc.strerror}") from exc
+
+        key = hashlib.sha256(content).hexdigest()
+        parsed = self.parsed.get(key)
+        if parsed is None:
+            parsed = self.parsed[key] = self.parse(path, content)
+
+        nested = set()
+        value = self.splice(copy.deepcopy(parsed), path.parent,
+                            nested, including + (path,))
+        self.loaded[path] = value, nested
+        used.update(nested)
+        return value
+
+    def parse(self, path, content):
+        """Parse a fragment file."""
+        if self.cache is not None:
+            docs = self.cache.load(str(path))
+        else:
+            docs = list(yaml.safe_load_all(content.decode('utf-8')))
+
+        if len(docs) != 1:
+            raise ValueError(f"!include {path}: must have one document, "
+                             f"not {len(docs)}")
+        return docs[0]
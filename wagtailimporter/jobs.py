@@ -0,0 +1,277 @@
+"""
+Run imports queued from the Wagtail admin in the background.
+
+Editors upload a bundle (an import file, or a zip file of import files and
+the media files they use) as an ImportJob, and `import_worker' processes
+claim the oldest queued job, import it and record its results. A job is
+claimed with SELECT ... FOR UPDATE SKIP LOCKED and a conditional UPDATE of
+its status, so any number of workers can drain the queue without taking the
+same job twice (on SQLite, which can't skip locked rows, they take turns).
+
+The files in a bundle are imported in order of their paths in one
+transaction, like `import_pages --lock'. Fragment files (see
+`wagtailimporter.includes') are only imported where they are included.
+
+Bundles are unpacked into a temporary directory, and the files the import
+files name (fragments, media and template parameters) must be in it (see
+`wagtailimporter.sandbox'). The uploaded bundle is deleted once the job has
+been imported.
+
+A job's progress is written on a connection of its own by a Reporter thread,
+so the admin can show it while the import's transaction is still open, along
+with a heartbeat every `HEARTBEAT_INTERVAL' seconds. A running job whose
+heartbeat stops, because its worker was killed, can be claimed again by
+another worker. On SQLite, which can't be written to while another
+transaction is writing, progress is only written when the job finishes, and
+there are no heartbeats.
+"""
+import io
+import os
+import shutil
+import socket
+import threading
+import traceback
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import yaml
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import sandbox
+from .importer import CREATED, UPDATED, Importer, working_directory
+from .locking import SubtreeLocks
+from .models import ImportJob
+from .progress import Progress
+from .watch import IMPORT_SUFFIXES
+
+# Seconds between a running job's heartbeats
+HEARTBEAT_INTERVAL = 10.0
+
+
+def heartbeats():
+    """
+    Whether running jobs' progress and heartbeats can be written while they
+    are being imported.
+    """
+    return connection.vendor != 'sqlite'
+
+
+def worker_name():
+    """The name of this worker, as host:pid."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker=None, stale_after=None):
+    """
+    Claim the oldest queued ImportJob for `worker', or return None.
+
+    If `stale_after' is given, running jobs that haven't had a heartbeat for
+    that many seconds are claimed again, where there are heartbeats.
+    """
+    worker = worker or worker_name()
+
+    claimable = Q(status=ImportJob.QUEUED)
+    if stale_after is not None and heartbeats():
+        claimable |= Q(status=ImportJob.RUNNING, heartbeat_at__lt=(
+            timezone.now() - timedelta(seconds=stale_after)))
+
+    while True:
+        with transaction.atomic():
+            job = (ImportJob.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(claimable)
+                   .order_by('submitted_at', 'pk')
+                   .first())
+            if job is None:
+                return None
+
+            # Another worker may have taken it, where rows can't be locked
+            now = timezone.now()
+            if not ImportJob.objects \
+                    .filter(pk=job.pk, status=job.status,
+                            heartbeat_at=job.heartbeat_at) \
+                    .update(status=ImportJob.RUNNING, worker=worker,
+                            started_at=now, heartbeat_at=now):
+                continue
+
+            if job.status == ImportJob.RUNNING:
+                job.log = f"Worker {job.worker} stopped, claimed again\n"
+                ImportJob.objects.filter(pk=job.pk).update(log=job.log)
+
+            job.status = ImportJob.RUNNING
+            job.worker = worker
+            job.started_at = job.heartbeat_at = now
+            return job
+
+
+def bundle_files(directory):
+    """The import files in an unpacked bundle, in order, relative to it."""
+    directory = Path(directory)
+    return sorted(
+        str(path.relative_to(directory))
+        for path in directory.rglob('*')
+        if path.suffix in IMPORT_SUFFIXES and path.is_file()
+        # Hidden files and macOS's resource forks
+        and not any(part.startswith(('.', '__MACOSX'))
+                    for part in path.relative_to(directory).parts))
+
+
+def unpack(file_, directory):
+    """
+    Copy a bundle's `file_' into `directory', extracting it if it is a zip
+    file, and return its import files.
+    """
+    path = Path(directory) / os.path.basename(file_.name)
+    with file_.open('rb') as source, open(path, 'wb') as dest:
+        shutil.copyfileobj(source, dest)
+
+    if path.suffix == '.zip':
+        with zipfile.ZipFile(path) as archive:
+            archive.extractall(directory)
+        path.unlink()
+
+    return bundle_files(directory)
+
+
+class Reporter(threading.Thread):
+    """
+    Write a job's progress to the database as it changes, and its heartbeat
+    every `HEARTBEAT_INTERVAL' seconds.
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f'import-job-{job.pk}', daemon=True)
+        self.job_pk = job.pk
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.latest = None
+        self.stopped = False
+
+    def update(self, fields):
+        """Write `fields' of the job, replacing any not yet written."""
+        with self.lock:
+            self.latest = fields
+        self.changed.set()
+
+    def run(self):
+        try:
+            while True:
+                self.changed.wait(HEARTBEAT_INTERVAL)
+                with self.lock:
+                    fields, self.latest = self.latest, None
+                    self.changed.clear()
+
+                try:
+                    ImportJob.objects.filter(pk=self.job_pk).update(
+                        heartbeat_at=timezone.now(), **(fields or {}))
+                except DatabaseError:
+                    # Progress is only a guide, so carry on importing
+                    pass
+
+                if self.stopped:
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        """Write the last progress and stop."""
+        self.stopped = True
+        self.changed.set()
+        self.join()
+
+
+class JobProgress(Progress):
+    """Track the progress of an ImportJob, writing it to the job."""
+
+    log_interval = 1.0
+
+    def __init__(self, job, reporter=None):
+        super().__init__()
+        self.job = job
+        # The Reporter writing the progress as it goes, if there is one
+        self.reporter = reporter
+
+    def refresh(self, force=False):
+        refreshed = self.refreshed
+        super().refresh(force=force)
+        if self.refreshed != refreshed:
+            self.report()
+
+    def report(self):
+        """Record the progress on the job."""
+        fields = {
+            'expected': self.expected,
+            'documents': self.documents,
+            'errors': self.errors,
+        }
+        for field, value in fields.items():
+            setattr(self.job, field, value)
+
+        if self.reporter is not None:
+            self.reporter.update(fields)
+
+
+def run(job, lock_depth=None):
+    """
+    Import a claimed ImportJob, recording its results and status.
+
+    The subtrees pages are added to are locked, so jobs being imported by
+    other workers into the same subtrees wait (see `wagtailimporter.locking',
+    which `lock_depth' is passed to).
+
+    Errors are recorded on the job rather than raised, so the worker can
+    carry on with the next one.
+    """
+    output = io.StringIO(job.log)
+    output.seek(0, io.SEEK_END)
+    reporter = Reporter(job) if heartbeats() else None
+    progress = JobProgress(job, reporter)
+    importer = Importer(stdout=output, stderr=output, progress=progress,
+                        locks=SubtreeLocks(depth=lock_depth))
+
+    job.status = ImportJob.FAILED
+    if reporter is not None:
+        reporter.start()
+    try:
+        with TemporaryDirectory() as directory:
+            files = unpack(job.file, directory)
+            if not files:
+                raise ValueError("No import files in the bundle")
+
+            with working_directory(directory), sandbox.use(directory), \
+                    transaction.atomic():
+                results = importer.import_files(files, validate=job.validate)
+                output.write(f"Waited {importer.locks.waited:.2f}s for "
+                             f"{importer.locks.locked} subtree locks\n")
+                if job.dry_run:
+                    output.write("Dry run, rolling back\n")
+                    transaction.set_rollback(True)
+    except (CommandError, ValueError, OSError, yaml.YAMLError,
+            zipfile.BadZipFile) as exc:
+        output.write(f"Error importing: {exc}\n")
+    except Exception:  # pylint:disable=broad-except
+        output.write(traceback.format_exc())
+    except KeyboardInterrupt:
+        # Don't leave the job running when the worker is stopped
+        output.write("Interrupted\n")
+        raise
+    else:
+        job.status = ImportJob.DONE
+        job.created = sum(1 for result in results if result.action == CREATED)
+        job.updated = sum(1 for result in results if result.action == UPDATED)
+    finally:
+        if reporter is not None:
+            reporter.stop()
+        progress.report()
+        job.log = output.getvalue()
+        job.finished_at = timezone.now()
+        job.save()
+        # The bundle may hold content that isn't meant to be kept around
+        job.file.storage.delete(job.file.name)
+
+    return job
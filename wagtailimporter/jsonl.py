@@ -0,0 +1,66 @@
+"""
+JSON Lines input.
+
+Each line of a `.jsonl' or `.ndjson' file is one document. Tags are written
+as an object with a single key, the tag name prefixed with `$' instead of
+`!', e.g.
+
+    {"url": "/a", "type": "app.page", "image": {"$image": {"file": "a.jpg"}}}
+
+The fastest available JSON parser is used (orjson, then ujson, then the
+standard library) and files are read a line at a time.
+"""
+try:
+    from orjson import loads
+except ImportError:  # pragma: no cover
+    try:
+        from ujson import loads
+    except ImportError:
+        from json import loads
+
+from .cache import get_tag_registry
+
+SUFFIXES = ('.jsonl', '.ndjson')
+
+
+def untag(value, registry):
+    """Convert tagged objects in a decoded JSON value into tag objects."""
+
+    if isinstance(value, dict):
+        if len(value) == 1:
+            (key, state), = value.items()
+            if key.startswith('$'):
+                try:
+                    cls = registry['!' + key[1:]]
+                except KeyError as exc:
+                    raise ValueError(f"Unknown tag {key}") from exc
+
+                if not isinstance(state, dict):
+                    raise ValueError(f"Tag {key} must be an object")
+
+                # This is what yaml's construct_yaml_object() does
+                obj = cls.__new__(cls)
+                obj.__dict__.update(untag(state, registry))
+                return obj
+
+        return {key: untag(elem, registry) for key, elem in value.items()}
+
+    if isinstance(value, list):
+        return [untag(elem, registry) for elem in value]
+
+    return value
+
+
+def load_documents(filename):
+    """Generate the documents in a JSON Lines file."""
+    registry = get_tag_registry()
+
+    with open(filename, 'rb') as file_:
+        for lineno, line in enumerate(file_, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                yield untag(loads(line), registry)
+            except ValueError as exc:
+                raise ValueError(f"{filename}:{lineno}: {exc}") from exc
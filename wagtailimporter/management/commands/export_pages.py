@@ -0,0 +1,233 @@
+"""
+Export pages from Wagtail
+"""
+import datetime
+from itertools import islice
+
+import yaml
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.blocks import (
+    ChooserBlock, ListBlock, StreamBlock, StructBlock)
+from wagtail.documents.models import Document as WagtailDocument
+from wagtail.fields import StreamField
+from wagtail.images.models import Image as WagtailImage
+from wagtail.models import Page, Site
+
+from ... import serializer
+from ...serializer import normalise
+
+# Fields inherited from Page that are worth exporting
+PAGE_FIELDS = ('title', 'seo_title', 'show_in_menus', 'search_description',
+               'live')
+
+# Values the YAML safe dumper can represent natively
+YAML_TYPES = (str, int, float, bool, datetime.date, type(None))
+
+# Foreign keys that can be represented as references
+REFERENCES = (
+    (Page, serializer.Page),
+    (WagtailImage, serializer.Image),
+    (WagtailDocument, serializer.Document),
+    (Site, serializer.Site),
+)
+REFERENCE_MODELS = {reference: model for model, reference in REFERENCES}
+
+
+def get_reference_class(model):
+    """The reference class for foreign keys to `model', if any."""
+    for base, reference in REFERENCES:
+        if issubclass(model, base):
+            return reference
+
+    return None
+
+
+class _Writer:
+    """Write to an OutputWrapper without it appending newlines."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, data):
+        """Write some data."""
+        self.out.write(data, ending='')
+
+
+class Command(BaseCommand):
+    """
+    Export pages from Wagtail in the format read by import_pages.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', type=str,
+                            help="URL of the root of the subtree to export.")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of pages to load at a time.")
+
+    def handle(self, *args, **options):
+        try:
+            # pylint:disable=no-member
+            root = Page.objects.get(url_path=normalise(options['url']))
+        except Page.DoesNotExist as exc:
+            raise CommandError(f"No page at {options['url']}") from exc
+
+        yaml.dump_all(self.export_pages(root, options['batch_size']),
+                      _Writer(self.stdout),
+                      Dumper=yaml.SafeDumper,
+                      allow_unicode=True,
+                      default_flow_style=False,
+                      sort_keys=False)
+
+    def export_pages(self, root, batch_size):
+        """
+        Generate a document for each page under `root', in tree order.
+
+        Pages are read `batch_size' at a time, loading the specific pages
+        with one query per page type and resolving references with one
+        query per referenced model.
+        """
+        pages = Page.objects\
+            .descendant_of(root, inclusive=True)\
+            .order_by('path')\
+            .values_list('pk', 'content_type_id')\
+            .iterator(chunk_size=batch_size)
+
+        while True:
+            batch = list(islice(pages, batch_size))
+            if not batch:
+                break
+
+            yield from self.export_batch(batch)
+
+    def export_batch(self, batch):
+        """Export a batch of (pk, content_type_id) pairs."""
+
+        by_type = {}
+        for pk, content_type_id in batch:
+            by_type.setdefault(content_type_id, []).append(pk)
+
+        specific = {}
+        for content_type_id, pks in by_type.items():
+            model = ContentType.objects.get_for_id(content_type_id)\
+                .model_class()
+            specific.update(model.objects.in_bulk(pks))
+
+        pages = [specific[pk] for pk, _ in batch]
+
+        # Collect all the referenced objects, then look them up together
+        references = {}
+        for page in pages:
+            self.walk_page(page, lambda model, pk: references
+                           .setdefault(model, set()).add(pk))
+
+        for reference, pks in list(references.items()):
+            references[reference] = {
+                pk: reference.from_instance(obj)
+                for pk, obj in REFERENCE_MODELS[reference]
+                .objects.in_bulk(pks).items()
+            }
+
+        for page in pages:
+            # References to deleted objects are exported as null
+            yield self.export_page(
+                page, lambda model, pk: references[model].get(pk))
+
+    def get_fields(self, page):
+        """The fields of a page that should be exported."""
+
+        for field in page._meta.concrete_fields:
+            if field.model is Page:
+                if field.name in PAGE_FIELDS:
+                    yield field
+            elif not (field.is_relation and field.remote_field.parent_link):
+                yield field
+
+    def walk_page(self, page, visit):
+        """
+        Visit the references of a page, replacing them with the result of
+        `visit(reference_class, pk)'.
+
+        Returns the exported fields.
+        """
+        data = {}
+
+        for field in self.get_fields(page):
+            if isinstance(field, StreamField):
+                value = self.walk_block(
+                    field.stream_block,
+                    field.stream_block.get_prep_value(
+                        getattr(page, field.name)),
+                    visit)
+
+            elif field.is_relation:
+                reference = get_reference_class(field.related_model)
+                if reference is None:
+                    continue
+
+                value = field.value_from_object(page)
+                if value is not None:
+                    value = visit(reference, value)
+
+            else:
+                value = field.value_from_object(page)
+
+                if field.model is Page and value == field.get_default():
+                    continue
+
+                if not isinstance(value, YAML_TYPES):
+                    value = field.value_to_string(page)
+
+            data[field.name] = value
+
+        return data
+
+    def walk_block(self, block, value, visit):
+        """
+        Visit the references in the prep value of a StreamField block.
+        """
+        if value is None:
+            return None
+
+        if isinstance(block, StreamBlock):
+            return [
+                dict(child, value=self.walk_block(
+                    block.child_blocks[child['type']], child['value'], visit))
+                for child in value
+                if child['type'] in block.child_blocks
+            ]
+
+        if isinstance(block, StructBlock):
+            return {
+                name: self.walk_block(block.child_blocks[name], child, visit)
+                for name, child in value.items()
+                if name in block.child_blocks
+            }
+
+        if isinstance(block, ListBlock):
+            return [
+                dict(child, value=self.walk_block(
+                    block.child_block, child['value'], visit))
+                if isinstance(child, dict) and child.get('type') == 'item'
+                else self.walk_block(block.child_block, child, visit)
+                for child in value
+            ]
+
+        if isinstance(block, ChooserBlock):
+            reference = get_reference_class(block.model_class)
+            if reference is not None:
+                return visit(reference, value)
+
+        return value
+
+    def export_page(self, page, visit):
+        """Export a single page as a document."""
+
+        content_type = ContentType.objects.get_for_id(page.content_type_id)
+        doc = {
+            'url': page.url_path,
+            'type': f'{content_type.app_label}.{content_type.model}',
+        }
+        doc.update(self.walk_page(page, visit))
+
+        return doc
@@ -1,20 +1,17 @@
 """
 Import pages into Wagtail
 """
-import json
-import os
-from pathlib import Path, PurePosixPath
+import sys
 
-import yaml
-from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import FieldDoesNotExist
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from wagtail.fields import StreamField
-from wagtail.models import Page
 
-from ... import serializer
-from ...serializer import normalise
+from ...cache import ParseCache
+from ...importer import DRAFT, PUBLISH, Importer
+from ...locking import SubtreeLocks
+from ...memory import peak_rss
+from ...progress import Progress, format_bytes
+from ...watch import Watch
 
 
 class Command(BaseCommand):
@@ -23,120 +20,172 @@ class Command(BaseCommand):
     """
 
     def add_arguments(self, parser):
-        parser.add_argument('file', nargs='+', type=str)
+        parser.add_argument('file', nargs='*', type=str)
+        parser.add_argument(
+            '--cache-dir',
+            help="Cache parsed files in this directory, keyed by their "
+                 "contents, and reuse them on later runs.")
+        parser.add_argument(
+            '--include-root', metavar='DIR',
+            help="Let !include read fragment files anywhere under DIR, "
+                 "rather than only under the including file's "
+                 "directory.")
+        parser.add_argument(
+            '--mirror', metavar='URL',
+            help="Remove pages under URL that are not in the import.")
+        parser.add_argument(
+            '--unpublish', action='store_true',
+            help="Unpublish pages removed by --mirror instead of deleting "
+                 "them.")
+        parser.add_argument(
+            '--max-delete', type=int, metavar='N',
+            help="Abort the import if --mirror would remove more than N "
+                 "pages.")
+        parser.add_argument(
+            '--preserve-order', action='store_true',
+            help="Order the children of each parent like the pages in the "
+                 "import, ahead of any other children.")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Roll back the import when done.")
+        parser.add_argument(
+            '--validate', action='store_true',
+            help="Check every document before importing any, and don't "
+                 "import anything if there are errors.")
+        parser.add_argument(
+            '--jobs', type=int, default=1, metavar='N',
+            help="Number of processes to validate documents with.")
+        parser.add_argument(
+            '--watch', metavar='DIR',
+            help="Import every file in DIR, then keep running and re-import "
+                 "documents as their files or media change.")
+        parser.add_argument(
+            '--fast-updates', action='store_true',
+            help="Update existing pages that only change plain fields with "
+                 "batched UPDATEs instead of saving them, skipping the save "
+                 "signals.")
+        parser.add_argument(
+            '--revisions', action='store_const', const=PUBLISH,
+            help="Create a revision for every imported page and publish "
+                 "it.")
+        parser.add_argument(
+            '--draft', action='store_const', const=DRAFT, dest='revisions',
+            help="Save imported pages as draft revisions only, leaving the "
+                 "live pages alone. New pages are created unpublished.")
+        parser.add_argument(
+            '--read-database', metavar='ALIAS',
+            help="Look up pages, media and snippets that existed before the "
+                 "import in the database ALIAS, e.g. a read replica.")
+        parser.add_argument(
+            '--pipeline', action='store_true',
+            help="Parse files and store media in the background while "
+                 "writing pages, and report how busy each stage was.")
+        parser.add_argument(
+            '--progress', action='store_true',
+            help="Show a status line with the import's rates and estimated "
+                 "time left.")
+        parser.add_argument(
+            '--metrics-file', metavar='PATH',
+            help="Keep the import's progress in PATH in Prometheus text "
+                 "format, e.g. for the node exporter to scrape.")
+        parser.add_argument(
+            '--max-memory', action='store_true',
+            help="Keep memory use bounded for very large imports: bound the "
+                 "lookup caches, let imported pages go and don't log "
+                 "queries. The peak memory used is reported.")
+        parser.add_argument(
+            '--lock', action='store_true',
+            help="Lock the parts of the page tree pages are added to, so "
+                 "imports into the same section run one at a time.")
+        parser.add_argument(
+            '--lock-depth', type=int, metavar='N',
+            help="With --lock, lock whole sections at depth N of the page "
+                 "tree instead of each parent page.")
+        parser.add_argument(
+            '--queue-size', type=int, default=Importer.queue_size,
+            metavar='N',
+            help="Number of documents to hold between each stage of "
+                 "--pipeline.")
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        for filename in options['file']:
-            with open(filename, encoding="utf-8") as file_:
-                docs = yaml.safe_load_all(file_)
-                self.stdout.write(f"Reading {filename}")
-
-                cwd = Path.cwd()
-                try:
-                    os.chdir(str(Path(filename).parent))
-                    self.import_documents(docs)
-                finally:
-                    os.chdir(str(cwd))
-
-    @transaction.atomic
-    def import_documents(self, docs):
-        """Import a Yaml file of documents."""
-
-        for doc in docs:
-            try:
-                if isinstance(doc, serializer.GetForeignObject):
-                    self.import_snippet(doc)
-                else:
-                    self.import_page(doc)
-            except CommandError as exc:
-                self.stderr.write(f"Error importing page: {exc}")
+        cache = None
+        if options['cache_dir']:
+            cache = ParseCache(options['cache_dir'])
+
+        tracker = None
+        if options['progress'] or options['metrics_file']:
+            # The status line is redrawn, so is written without line endings
+            stream = options.get('stderr') or sys.stderr
+            tracker = Progress(stream=stream if options['progress'] else None,
+                               metrics_file=options['metrics_file'])
+
+        locks = None
+        if options['lock'] or options['lock_depth'] is not None:
+            if options['lock_depth'] is not None and options['lock_depth'] < 1:
+                raise CommandError("--lock-depth must be at least 1")
+            locks = SubtreeLocks(depth=options['lock_depth'])
+
+        importer = Importer(stdout=self.stdout, stderr=self.stderr,
+                            cache=cache,
+                            read_database=options['read_database'],
+                            fast_updates=options['fast_updates'],
+                            revisions=options['revisions'],
+                            progress=tracker, locks=locks,
+                            max_memory=options['max_memory'],
+                            include_root=options['include_root'])
+        importer.queue_size = options['queue_size']
+
+        if options['watch']:
+            self.watch(importer, options)
+        elif options['file']:
+            self.import_files(importer, options)
+        else:
+            raise CommandError("Give files to import, or --watch")
 
     @transaction.atomic
-    def import_snippet(self, data):
-        """Import a snippet (which is a GetForeignObject)."""
-
-        obj = data.__to_value__()
-        self.stdout.write(f"Importing {obj._meta.verbose_name} {obj}")
-        obj.save()
-
-    @transaction.atomic
-    def import_page(self, data):
-        """Import a single wagtail page."""
-        model = self.get_page_model_class(data)
-        self.find_page(model, data)
-
-    def get_page_model_class(self, data):
-        """
-        Get the page model class from the `type' parameter.
-        """
-
-        try:
-            type_ = data.pop('type')
-        except KeyError as exc:
-            raise CommandError("Need `type' for page") from exc
-
-        try:
-            app_label, model = type_.split('.')
-            return ContentType.objects.get(app_label=app_label,
-                                           model=model)\
-                .model_class()
-        except (ValueError, AttributeError) as exc:
-            raise CommandError("`type' is of form `app.model'") from exc
-        except ContentType.DoesNotExist as exc:
-            raise CommandError(f"Unknown page type `{type_}'") from exc
-
-    def find_page(self, model, data):
-        """
-        Find a page by its URL and import its data.
-
-        Data importing has to be done here because often the page can't
-        be saved until the data is imported (i.e. null fields)
-        """
-        try:
-            url = PurePosixPath(data.pop('url'))
-            if not url.is_absolute():
-                raise CommandError(f"Path {url} must be absolute")
-
-        except KeyError as exc:
-            raise CommandError("Need `url' for page") from exc
-
+    def import_files(self, importer, options):
+        """Import the files once."""
+        importer.import_files(options['file'],
+                              validate=options['validate'],
+                              jobs=options['jobs'],
+                              pipeline=options['pipeline'])
+
+        if options['preserve_order']:
+            importer.reorder()
+
+        if options['mirror']:
+            importer.mirror(options['mirror'],
+                            unpublish=options['unpublish'],
+                            max_delete=options['max_delete'])
+
+        if importer.max_memory and peak_rss() is not None:
+            self.stdout.write(
+                f"Peak memory used: {format_bytes(peak_rss())}")
+
+        if importer.locks is not None:
+            self.stdout.write(f"Waited {importer.locks.waited:.2f}s for "
+                              f"{importer.locks.locked} subtree locks")
+
+        if options['dry_run']:
+            self.stdout.write("Dry run, rolling back")
+            transaction.set_rollback(True)
+
+    def watch(self, importer, options):
+        """Import the files in a directory until interrupted."""
+        for option, name in (('file', "files"),
+                             ('mirror', "--mirror"),
+                             ('dry_run', "--dry-run"),
+                             ('validate', "--validate"),
+                             ('preserve_order', "--preserve-order"),
+                             ('pipeline', "--pipeline"),
+                             ('progress', "--progress"),
+                             ('metrics_file', "--metrics-file")):
+            if options[option]:
+                raise CommandError(f"--watch can't be used with {name}")
+
+        self.stdout.write(f"Watching {options['watch']}, "
+                          "press Ctrl-C to stop")
         try:
-            page = model.objects.get(url_path=normalise(url))
-            self.import_data(page, data)
-            page.save()
-            self.stdout.write(f"Updating existing page {url}")
-        except model.DoesNotExist:
-            try:
-                # pylint:disable=no-member
-                parent = Page.objects.get(url_path=normalise(url.parent))
-            except Page.DoesNotExist as exc:
-                raise CommandError(f"Parent of {url} doesn't exist") from exc
-
-            page = model(slug=url.name)
-            self.import_data(page, data)
-            parent.add_child(instance=page)
-            self.stdout.write(f"Creating new page {url}")
-
-        return page
-
-    def import_data(self, page, data):
-        """Import the data onto a page."""
-
-        for key, value in data.items():
-            try:
-                field = page._meta.get_field(key)
-
-                if isinstance(field, StreamField):
-                    value = json.dumps(value, cls=serializer.JSONEncoder)
-                else:
-                    # Assume we know how to serialise it
-                    pass
-
-            except FieldDoesNotExist:
-                # This might be a property, just try and set it anyway
-                pass
-
-            value = serializer.FieldStorable.to_objects(value)
-
-            setattr(page, key, value)
+            Watch(importer, options['watch']).run()
+        except KeyboardInterrupt:
+            pass
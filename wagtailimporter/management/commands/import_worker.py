@@ -0,0 +1,82 @@
+"""
+Import the jobs queued from the Wagtail admin
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import jobs
+
+
+class Command(BaseCommand):
+    """
+    Import the jobs queued from the Wagtail admin, one at a time.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0, metavar='SECONDS',
+            help="Seconds to wait before looking for new jobs when the "
+                 "queue is empty.")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty instead of waiting for new "
+                 "jobs.")
+        parser.add_argument(
+            '--max-jobs', type=int, metavar='N',
+            help="Exit after importing N jobs.")
+        parser.add_argument(
+            '--stale-after', type=float, default=300.0, metavar='SECONDS',
+            help="Claim running jobs again once their worker hasn't sent a "
+                 "heartbeat for this long (not on SQLite).")
+        parser.add_argument(
+            '--lock-depth', type=int, metavar='N',
+            help="Lock whole sections at depth N of the page tree while "
+                 "importing instead of each parent page.")
+
+    def handle(self, *args, **options):
+        if options['poll_interval'] <= 0:
+            raise CommandError("--poll-interval must be positive")
+        if options['lock_depth'] is not None and options['lock_depth'] < 1:
+            raise CommandError("--lock-depth must be at least 1")
+        if options['stale_after'] <= jobs.HEARTBEAT_INTERVAL:
+            raise CommandError("--stale-after must be longer than the "
+                               f"{jobs.HEARTBEAT_INTERVAL:.0f}s between "
+                               "heartbeats")
+
+        # Stop like on Ctrl-C, so the job being imported is marked failed
+        handler = signal.signal(signal.SIGTERM, self.interrupt)
+        try:
+            self.work(options)
+        finally:
+            signal.signal(signal.SIGTERM, handler)
+
+    @staticmethod
+    def interrupt(signum, frame):  # noqa: E501 pylint:disable=unused-argument
+        """Stop on SIGTERM."""
+        raise KeyboardInterrupt
+
+    def work(self, options):
+        """Import jobs until told to stop."""
+        worker = jobs.worker_name()
+        done = 0
+
+        try:
+            while options['max_jobs'] is None or done < options['max_jobs']:
+                job = jobs.claim(worker, stale_after=options['stale_after'])
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f"Importing job {job.pk}: {job}")
+                jobs.run(job, lock_depth=options['lock_depth'])
+                done += 1
+                self.stdout.write(
+                    f"Job {job.pk} {job.status}: {job.documents} documents, "
+                    f"{job.created} created, {job.updated} updated, "
+                    f"{job.errors} errors")
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,175 @@
+"""
+Placing imported media files into storage.
+
+Files imported into a FileSystemStorage are reflinked or hardlinked into
+place when the storage is on the same filesystem as the import, and otherwise
+copied inside the kernel, rather than being streamed through Python.
+"""
+import errno
+import logging
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+from . import progress, storageindex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+LOGGER = logging.getLogger(__name__)
+
+# ioctl to clone a file on filesystems with copy-on-write support (Linux)
+FICLONE = 0x40049409
+
+# Errors meaning an operation isn't supported here, so try the next one
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EPERM,
+               errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EACCES,
+               errno.EMLINK}
+
+COPY_CHUNK_SIZE = 2 ** 30
+
+
+def store_file(storage, name, path):
+    """
+    Store the file at `path' as `name' in `storage', returning the name it
+    was stored under.
+    """
+    progress.media_stored(os.path.getsize(path))
+    name = save_file(storage, name, path)
+    storageindex.stored(storage, name)
+    return name
+
+
+def save_file(storage, name, path):
+    """Save the file at `path' as `name' in `storage'."""
+    if isinstance(storage, FileSystemStorage):
+        try:
+            return place_file(storage, name, path)
+        except FileExistsError:
+            # Lost a race, let the storage pick another name
+            pass
+
+    with open(path, 'rb') as source:
+        return storage.save(name, source)
+
+
+def place_file(storage, name, path):
+    """
+    Place the file at `path' into a FileSystemStorage as `name' without
+    reading it into Python.
+    """
+    name = storage.get_available_name(name)
+    dest = storage.path(name)
+    make_directory(storage, os.path.dirname(dest))
+
+    source_stat = os.stat(path)
+    same_device = source_stat.st_dev == os.stat(os.path.dirname(dest)).st_dev
+    mode = storage.file_permissions_mode
+
+    if not (same_device and link_file(path, dest, source_stat, mode)):
+        copy_file(path, dest)
+
+    if mode is not None:
+        os.chmod(dest, mode)
+
+    return name.replace('\\', '/')
+
+
+def make_directory(storage, directory):
+    """Create a directory the way FileSystemStorage does."""
+    mode = storage.directory_permissions_mode
+
+    if mode is None:
+        os.makedirs(directory, exist_ok=True)
+        return
+
+    old_umask = os.umask(0o777 & ~mode)
+    try:
+        os.makedirs(directory, mode, exist_ok=True)
+    finally:
+        os.umask(old_umask)
+
+
+def link_file(path, dest, source_stat, mode):
+    """
+    Try to reflink, then hardlink, `path' to `dest'.
+
+    Returns whether it succeeded.
+    """
+    if fcntl is not None:
+        with open(path, 'rb') as source, open(dest, 'xb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+                LOGGER.debug("Reflinked %s to %s", path, dest)
+                return True
+            except OSError as exc:
+                if exc.errno not in UNSUPPORTED:
+                    raise
+
+        os.unlink(dest)
+
+    # A hardlink shares permissions with the source, so only use one if we
+    # wouldn't change them
+    if mode is not None and mode != source_stat.st_mode & 0o777:
+        return False
+
+    try:
+        os.link(path, dest)
+        LOGGER.debug("Hardlinked %s to %s", path, dest)
+        return True
+    except OSError as exc:
+        if exc.errno not in UNSUPPORTED:
+            raise
+
+    return False
+
+
+def copy_file(path, dest):
+    """
+    Copy `path' to a new file `dest', in the kernel if possible.
+    """
+    with open(path, 'rb') as source, open(dest, 'xb') as target:
+        src, dst = source.fileno(), target.fileno()
+
+        for copy in (copy_file_range, sendfile):
+            try:
+                copy(src, dst)
+                return
+            except OSError as exc:
+                if exc.errno not in UNSUPPORTED:
+                    raise
+
+            # Start again with the next method
+            os.lseek(src, 0, os.SEEK_SET)
+            os.lseek(dst, 0, os.SEEK_SET)
+            os.ftruncate(dst, 0)
+
+        while True:
+            chunk = source.read(COPY_CHUNK_SIZE // 1024)
+            if not chunk:
+                break
+            target.write(chunk)
+
+
+def copy_file_range(src, dst):
+    """Copy between file descriptors with copy_file_range(2)."""
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "copy_file_range not available")
+
+    while os.copy_file_range(src, dst, COPY_CHUNK_SIZE):
+        pass
+
+
+def sendfile(src, dst):
+    """Copy between file descriptors with sendfile(2)."""
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, "sendfile not available")
+
+    offset = 0
+    while True:
+        sent = os.sendfile(dst, src, offset, COPY_CHUNK_SIZE)
+        if not sent:
+            break
+        offset += sent
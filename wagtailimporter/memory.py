@@ -0,0 +1,77 @@
+"""
+Keep the memory used by very large imports bounded.
+
+An import's lookup caches (e.g. the PathIndex) grow with every page they
+see. With `max_memory', the Importer keeps them as LRUDicts, keeping the
+most recently used entries and finding the rest again when they are needed,
+doesn't keep the pages it imported in its results, and stops Django logging
+every query in `connection.queries' (which it does while DEBUG is on).
+"""
+import sys
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from django.db import connections
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not on Windows
+    resource = None
+
+
+class LRUDict(OrderedDict):
+    """A dict that keeps the `max_size' most recently used items."""
+
+    def __init__(self, max_size, *args, **kwargs):
+        self.max_size = max_size
+        super().__init__(*args, **kwargs)
+        self.evict()
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used items over `max_size'."""
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+@contextmanager
+def query_log_disabled():
+    """Stop Django keeping the queries run on each connection."""
+    logs = {}
+    for connection in connections.all():
+        logs[connection.alias] = connection.queries_log
+        # Appending to it does nothing
+        connection.queries_log = deque(maxlen=0)
+
+    try:
+        yield
+    finally:
+        for connection in connections.all():
+            if connection.alias in logs:
+                connection.queries_log = logs[connection.alias]
+
+
+def peak_rss():
+    """The peak resident set size of the process in bytes, or None."""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes everywhere else
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-19 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportLock',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('locked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.14 on 2026-10-19 03:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+import wagtailimporter.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailimporter', '0001_importlock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(help_text='A YAML or JSON Lines file, or a zip file of them and the media files they use.', storage=wagtailimporter.models.job_storage, upload_to='wagtailimporter/jobs/')),
+                ('validate', models.BooleanField(default=True, help_text="Check every document before importing any, and don't import anything if there are errors. Every missing media file is warned about, even if it was imported before, as the check doesn't look in the database.")),
+                ('dry_run', models.BooleanField(default=False, help_text='Roll back the import when done.')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('submitted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, max_length=255)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('expected', models.PositiveIntegerField(default=0)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('log', models.TextField(blank=True)),
+                ('submitted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-submitted_at', '-pk'],
+            },
+        ),
+    ]
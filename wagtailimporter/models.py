@@ -0,0 +1,111 @@
+"""
+Models for wagtailimporter.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils import timezone
+
+try:
+    from django.core.files.storage import storages
+except ImportError:  # pragma: no cover
+    # Django < 4.2
+    storages = None
+
+
+def job_storage():
+    """
+    The storage bundles uploaded for ImportJobs are kept in until they are
+    imported, which mustn't be served like MEDIA_ROOT is.
+
+    This is the `wagtailimporter_jobs' storage in STORAGES, if there is one,
+    or else the directory WAGTAILIMPORTER_JOBS_ROOT (by default in the
+    system's temporary directory, which only works if the site and the
+    workers run on the same host).
+    """
+    if storages is not None and \
+            'wagtailimporter_jobs' in getattr(settings, 'STORAGES', {}):
+        return storages['wagtailimporter_jobs']
+
+    return FileSystemStorage(location=getattr(
+        settings, 'WAGTAILIMPORTER_JOBS_ROOT',
+        os.path.join(tempfile.gettempdir(), 'wagtailimporter-jobs')))
+
+
+class ImportLock(models.Model):
+    """
+    A lock on a subtree of the page tree, for databases without advisory
+    locks (see `wagtailimporter.locking').
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    locked_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
+
+
+class ImportJob(models.Model):
+    """
+    A bundle of import files queued to be imported by an `import_worker'
+    (see `wagtailimporter.jobs').
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    # Deleted once the job has been imported
+    file = models.FileField(
+        storage=job_storage, upload_to='wagtailimporter/jobs/',
+        help_text="A YAML or JSON Lines file, or a zip file of them and "
+                  "the media files they use.")
+    validate = models.BooleanField(
+        default=True,
+        help_text="Check every document before importing any, and don't "
+                  "import anything if there are errors. Every missing media "
+                  "file is warned about, even if it was imported before, "
+                  "as the check doesn't look in the database.")
+    dry_run = models.BooleanField(
+        default=False,
+        help_text="Roll back the import when done.")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=QUEUED, db_index=True)
+    submitted_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True,
+                                     blank=True, on_delete=models.SET_NULL,
+                                     related_name='+')
+    submitted_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # The worker that claimed the job, as host:pid
+    worker = models.CharField(max_length=255, blank=True)
+    # When the worker last showed it was still importing the job
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    # Progress, and the results when done
+    expected = models.PositiveIntegerField(default=0)
+    documents = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    log = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-submitted_at', '-pk']
+
+    def __str__(self):
+        return os.path.basename(self.file.name)
+
+    @property
+    def finished(self):
+        """Whether the job has finished, one way or another."""
+        return self.status in (self.DONE, self.FAILED)
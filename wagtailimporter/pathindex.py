@@ -0,0 +1,114 @@
+"""
+Remember the pages found by URL path during an import.
+
+`!page' references are resolved from the index without a query once the
+page has been seen, which saves a query for every repeated reference (e.g.
+to a section page). The index is kept up to date with the importer's own
+writes and can be checked against the database in a single query, so it can
+be kept between runs of a long-running import.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.db import router
+from wagtail.models import Page
+
+from .memory import LRUDict
+
+# The PathIndex in use in this context
+_current = ContextVar('wagtailimporter_path_index', default=None)
+
+
+class PathIndex:
+    """
+    A map of url_path to page id, of at most `max_size' recently used pages
+    if given.
+    """
+
+    # Number of ids to check at a time in revalidate()
+    chunk_size = 1000
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.pages = self.make_pages()
+
+    def make_pages(self, items=()):
+        """Make the map of url_path to page id."""
+        if self.max_size is None:
+            return dict(items)
+        return LRUDict(self.max_size, items)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def get(self, url_path):
+        """The id of the page at `url_path', or None if not known."""
+        return self.pages.get(url_path)
+
+    def add(self, page):
+        """Remember a page."""
+        self.pages[page.url_path] = page.pk
+
+    def discard_tree(self, url_path):
+        """Forget the page at `url_path' and its descendants."""
+        self.pages = self.make_pages(
+            (path, pk) for path, pk in self.pages.items()
+            if not path.startswith(url_path))
+
+    def move_tree(self, old, new):
+        """
+        Move the page at url_path `old' and its descendants to `new', e.g.
+        after a slug change.
+        """
+        self.pages = self.make_pages(
+            (new + path[len(old):] if path.startswith(old) else path, pk)
+            for path, pk in self.pages.items())
+
+    def revalidate(self):
+        """
+        Forget the pages that have been moved or deleted since they were
+        seen.
+        """
+        current = {}
+        ids = iter(set(self.pages.values()))
+        for chunk in iter(lambda: list(islice(ids, self.chunk_size)), []):
+            current.update(Page.objects.filter(pk__in=chunk)
+                           .values_list('pk', 'url_path'))
+
+        self.pages = self.make_pages(
+            (path, pk) for path, pk in self.pages.items()
+            if current.get(pk) == path)
+
+
+@contextmanager
+def use(index):
+    """Use `index', a PathIndex, in this context."""
+    token = _current.set(index)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def get_page(url_path):
+    """
+    Get the page at `url_path' from the index in use, with only its id
+    loaded, or None if it isn't known.
+    """
+    index = _current.get()
+    if index is None:
+        return None
+
+    pk = index.get(url_path)
+    if pk is None:
+        return None
+
+    return Page.from_db(router.db_for_read(Page), ['id'], [pk])
+
+
+def add(page):
+    """Remember a page in the index in use, if any."""
+    index = _current.get()
+    if index is not None:
+        index.add(page)
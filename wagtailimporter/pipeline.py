@@ -0,0 +1,266 @@
+"""
+Import documents in a pipeline.
+
+Files are parsed in one thread and media files staged in another, while the
+calling thread writes to the database. The stages are connected by bounded
+queues, so parsing and staging can run ahead of the writes by at most a
+queue's worth of documents.
+
+Documents are still written in order, a file at a time, by
+Importer.import_documents(), so the transactions and results are the same
+as importing without a pipeline.
+"""
+import contextvars
+import queue
+import threading
+import time
+from pathlib import Path
+
+from . import progress, serializer
+
+# Marks the end of the documents on a queue
+END = object()
+
+
+class Stopped(Exception):
+    """The pipeline was stopped, because a later stage failed."""
+
+
+class Failed:
+    """An exception raised in an earlier stage, passed down the pipeline."""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class StageStats:
+    """
+    How busy a stage of the pipeline was.
+
+    A stage is busy when it isn't waiting on a queue, for either a document
+    from the stage before or for room for a document for the stage after.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.documents = 0
+        self.waiting = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def utilisation(self):
+        """The fraction of the time the stage was busy."""
+        if not self.elapsed:
+            return 0.0
+        return max(0.0, 1 - self.waiting / self.elapsed)
+
+    def __str__(self):
+        return (f"Stage {self.name}: {self.documents} documents, "
+                f"{self.utilisation:.0%} busy")
+
+
+class QueueStats:
+    """The depth of a queue, sampled whenever a document is taken off it."""
+
+    def __init__(self, name, queue_):
+        self.name = name
+        self.queue = queue_
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+
+    def sample(self):
+        """Record the current depth of the queue."""
+        depth = self.queue.qsize()
+        self.samples += 1
+        self.total += depth
+        self.max = max(self.max, depth)
+
+    @property
+    def mean(self):
+        """Average depth of the queue."""
+        if not self.samples:
+            return 0.0
+        return self.total / self.samples
+
+    def __str__(self):
+        return (f"Queue {self.name}: average depth {self.mean:.1f}, "
+                f"maximum {self.max}/{self.queue.maxsize}")
+
+
+class Pipeline:
+    """
+    Import parsed files for `importer', overlapping parsing, staging media
+    and writing to the database.
+
+    Up to `queue_size' documents are held between each stage.
+    """
+
+    def __init__(self, importer, queue_size=100):
+        self.importer = importer
+
+        self.parsed = queue.Queue(maxsize=queue_size)
+        self.staged = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+
+        self.stages = [StageStats(name)
+                       for name in ('parse', 'stage', 'write')]
+        self.queues = [QueueStats('parsed', self.parsed),
+                       QueueStats('staged', self.staged)]
+
+    def put(self, queue_, item, stats):
+        """Put an item on a queue, waiting for room unless stopped."""
+        start = time.monotonic()
+        try:
+            while True:
+                if self.stopped.is_set():
+                    raise Stopped()
+                try:
+                    queue_.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            stats.waiting += time.monotonic() - start
+
+    def get(self, queue_stats, stats):
+        """
+        Take the next item off a queue, waiting for one unless stopped.
+
+        Errors passed along the queue are raised.
+        """
+        queue_stats.sample()
+
+        start = time.monotonic()
+        try:
+            while True:
+                if self.stopped.is_set():
+                    raise Stopped()
+                try:
+                    item = queue_stats.queue.get(timeout=0.1)
+                    break
+                except queue.Empty:
+                    continue
+        finally:
+            stats.waiting += time.monotonic() - start
+
+        if isinstance(item, Failed):
+            raise item.exc
+
+        return item
+
+    def run_stage(self, stats, target, *args):
+        """
+        Run a stage in a thread, passing any error on to the next stage.
+        """
+        start = time.monotonic()
+        try:
+            target(*args)
+        except Stopped:
+            pass
+        except Exception as exc:  # pylint:disable=broad-except
+            output = self.parsed if stats is self.stages[0] else self.staged
+            try:
+                self.put(output, Failed(exc), stats)
+            except Stopped:
+                pass
+        finally:
+            stats.elapsed = time.monotonic() - start
+
+    def parse(self, files):
+        """Parse files onto the `parsed' queue."""
+        stats = self.stages[0]
+
+        for filename, docs in files:
+            base_dir = Path(filename).parent.resolve()
+            self.put(self.parsed, ('file', filename, base_dir), stats)
+
+            for doc in docs:
+                serializer.locate_media(doc, base_dir)
+                stats.documents += 1
+                self.put(self.parsed, ('doc', doc), stats)
+
+        self.put(self.parsed, END, stats)
+
+    def stage(self):
+        """Stage the media for documents from the `parsed' queue."""
+        stats = self.stages[1]
+
+        while True:
+            item = self.get(self.queues[0], stats)
+
+            if item is not END and item[0] == 'doc':
+                stats.documents += 1
+                for ref in serializer.iter_references(item[1]):
+                    if isinstance(ref, serializer.MediaFile):
+                        ref.prepare()
+
+            self.put(self.staged, item, stats)
+
+            if item is END:
+                return
+
+    def write(self):
+        """
+        Import the documents from the `staged' queue, a file at a time.
+        """
+        stats = self.stages[2]
+        results = []
+
+        item = self.get(self.queues[1], stats)
+
+        while item is not END:
+            _, filename, base_dir = item
+
+            def docs():
+                nonlocal item
+                item = self.get(self.queues[1], stats)
+                while item is not END and item[0] == 'doc':
+                    stats.documents += 1
+                    yield item[1]
+                    item = self.get(self.queues[1], stats)
+
+            self.importer.start_file(filename)
+            results.extend(self.importer.import_documents(
+                docs(), base_dir=base_dir))
+
+        return results
+
+    def run(self, files):
+        """
+        Import an iterable of (filename, docs) pairs, returning a list of
+        ImportResult.
+
+        Files are parsed as they are iterated, in the parsing thread.
+        """
+        tracker = progress.current()
+        if tracker is not None:
+            tracker.queues = self.queues
+
+        # The stages run in a copy of this context, e.g. to count the media
+        # files they store
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(self.run_stage, self.stages[0],
+                                   self.parse, files),
+                             name='import-parse', daemon=True),
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(self.run_stage, self.stages[1],
+                                   self.stage),
+                             name='import-stage', daemon=True),
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        start = time.monotonic()
+        try:
+            return self.write()
+        finally:
+            self.stages[2].elapsed = time.monotonic() - start
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+            for stats in self.stages + self.queues:
+                self.importer.log(str(stats))
@@ -0,0 +1,339 @@
+"""
+Report the progress of an import as it runs.
+
+A Progress counts the documents imported, media bytes stored and database
+queries run, and every `interval' seconds shows them as rates, with an
+estimate of the time left for the current file and the whole import and the
+peak memory used. The estimate comes from counting the documents in each
+file before the import starts (templates count as one document, so it is
+only a guide).
+
+Progress is shown as a status line that is redrawn in place when the stream
+is a terminal, or as a line at a time every `log_interval' seconds when it
+isn't. It can also be written as a Prometheus text format file, e.g. for the
+node exporter's textfile collector to scrape.
+"""
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.db import connections
+
+from . import jsonl
+from .memory import peak_rss
+
+_current = ContextVar('progress', default=None)
+
+METRICS = (
+    # Name, type, help, attribute
+    ('documents_total', 'counter', "Documents imported.", 'documents'),
+    ('documents_expected', 'gauge', "Documents expected to be imported.",
+     'expected'),
+    ('errors_total', 'counter', "Documents that failed to import.",
+     'errors'),
+    ('media_bytes_total', 'counter', "Bytes of media files stored.",
+     'media_bytes'),
+    ('queries_total', 'counter', "Database queries run.", 'queries'),
+    ('files_total', 'gauge', "Files to import.", 'files'),
+    ('files_done', 'gauge', "Files imported.", 'files_done'),
+    ('documents_per_second', 'gauge', "Documents imported per second.",
+     'document_rate'),
+    ('media_bytes_per_second', 'gauge', "Media bytes stored per second.",
+     'media_rate'),
+    ('queries_per_second', 'gauge', "Database queries run per second.",
+     'query_rate'),
+    ('eta_seconds', 'gauge', "Estimated seconds left for the import.",
+     'eta'),
+    ('file_eta_seconds', 'gauge',
+     "Estimated seconds left for the current file.", 'file_eta'),
+    ('peak_rss_bytes', 'gauge', "Peak resident set size of the import.",
+     'peak_rss'),
+)
+
+
+def count_documents(filename):
+    """Estimate the number of documents in a file, without parsing it."""
+    documents = 0
+    started = False
+
+    with open(filename, 'rb') as file_:
+        if Path(filename).suffix in jsonl.SUFFIXES:
+            return sum(1 for line in file_ if line.strip())
+
+        for line in file_:
+            if line.startswith(b'---'):
+                documents += 1
+                started = True
+            elif not started and line.strip() \
+                    and not line.startswith((b'#', b'%')):
+                # The first document doesn't need a `---'
+                documents += 1
+                started = True
+
+    return documents
+
+
+def format_duration(seconds):
+    """Format a number of seconds as h:mm:ss."""
+    if seconds is None:
+        return '?'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02}:{seconds:02}'
+
+
+def format_bytes(nbytes):
+    """Format a number of bytes with a binary prefix."""
+    for unit in ('B', 'KiB', 'MiB'):
+        if nbytes < 1024:
+            return f'{nbytes:.1f} {unit}'
+        nbytes /= 1024
+    return f'{nbytes:.1f} GiB'
+
+
+class Progress:
+    """
+    Track and report the progress of importing files.
+
+    The status line is written to `stream', if given, and the metrics to
+    `metrics_file', if given.
+    """
+
+    # Seconds between refreshes
+    interval = 0.5
+    # Seconds between lines when `stream' isn't a terminal
+    log_interval = 10.0
+
+    def __init__(self, stream=None, metrics_file=None):
+        self.stream = stream
+        # Importing changes directory, so this mustn't be relative
+        self.metrics_file = None if metrics_file is None \
+            else os.path.abspath(metrics_file)
+        isatty = getattr(stream, 'isatty', None)
+        self.tty = bool(isatty and isatty())
+
+        self.totals = {}
+        self.expected = 0
+        self.filename = None
+        self.file_documents = 0
+        self.files_done = 0
+
+        self.documents = 0
+        self.errors = 0
+        self.media_bytes = 0
+        self.queries = 0
+        # QueueStats of a pipeline, if one is running
+        self.queues = []
+
+        self.started = self.file_started = time.monotonic()
+        self.refreshed = 0.0
+        self.shown = False
+
+    @property
+    def files(self):
+        """Number of files to import."""
+        return len(self.totals)
+
+    @property
+    def elapsed(self):
+        """Seconds since the import started."""
+        return max(time.monotonic() - self.started, 1e-9)
+
+    @property
+    def document_rate(self):
+        """Documents imported per second."""
+        return self.documents / self.elapsed
+
+    @property
+    def media_rate(self):
+        """Media bytes stored per second."""
+        return self.media_bytes / self.elapsed
+
+    @property
+    def query_rate(self):
+        """Database queries run per second."""
+        return self.queries / self.elapsed
+
+    @property
+    def peak_rss(self):
+        """Peak resident set size of the process in bytes, or None."""
+        return peak_rss()
+
+    def remaining_time(self, remaining, documents, elapsed):
+        """Estimate the seconds to import `remaining' more documents."""
+        if not documents:
+            return None
+        return max(remaining, 0) * elapsed / documents
+
+    @property
+    def eta(self):
+        """Estimated seconds left for the import, or None."""
+        return self.remaining_time(self.expected - self.documents,
+                                   self.documents, self.elapsed)
+
+    @property
+    def file_eta(self):
+        """Estimated seconds left for the current file, or None."""
+        return self.remaining_time(
+            self.totals.get(self.filename, 0) - self.file_documents,
+            self.file_documents,
+            max(time.monotonic() - self.file_started, 1e-9))
+
+    @contextmanager
+    def tracking(self, filenames):
+        """
+        Track an import of `filenames' in this context, counting their
+        documents first.
+        """
+        self.totals = {filename: count_documents(filename)
+                       for filename in filenames}
+        self.expected = sum(self.totals.values())
+        self.started = time.monotonic()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(self.count_query))
+
+            token = _current.set(self)
+            try:
+                yield self
+            finally:
+                _current.reset(token)
+                self.finish()
+
+    def count_query(self, execute, sql, params, many, context):  # noqa: E501 pylint:disable=too-many-arguments
+        """Count a database query, as a connection execute wrapper."""
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def start_file(self, filename):
+        """Start importing a file."""
+        if self.filename is not None:
+            self.files_done += 1
+        self.filename = filename
+        self.file_documents = 0
+        self.file_started = time.monotonic()
+        self.refresh()
+
+    def document(self, result):
+        """Count an imported document's ImportResult."""
+        self.documents += 1
+        self.file_documents += 1
+        if result.error is not None:
+            self.errors += 1
+        self.refresh()
+
+    def media_stored(self, nbytes):
+        """Count the bytes of a stored media file."""
+        self.media_bytes += nbytes
+
+    def status(self):
+        """The status line."""
+        parts = []
+        if self.filename is not None:
+            parts.append(f"File {self.files_done + 1}/{self.files} "
+                         f"{os.path.basename(self.filename)}:")
+
+        parts.append(f"{self.documents}/{self.expected} documents,")
+        parts.append(f"{self.document_rate:.1f} documents/s,")
+        parts.append(f"{format_bytes(self.media_rate)}/s media,")
+        parts.append(f"{self.query_rate:.0f} queries/s,")
+        if self.peak_rss is not None:
+            parts.append(f"{format_bytes(self.peak_rss)} peak RSS,")
+
+        if self.queues:
+            parts.append("queues " + ' '.join(
+                f"{stats.queue.qsize()}/{stats.queue.maxsize}"
+                for stats in self.queues) + ',')
+
+        parts.append(f"ETA {format_duration(self.file_eta)} file, "
+                     f"{format_duration(self.eta)} total")
+        return ' '.join(parts)
+
+    def refresh(self, force=False):
+        """Show the progress, if it hasn't been shown too recently."""
+        now = time.monotonic()
+        interval = self.interval if self.tty else self.log_interval
+        if not force and now - self.refreshed < interval:
+            return
+        self.refreshed = now
+
+        if self.stream is not None:
+            if self.tty:
+                self.stream.write('\r\033[K' + self.status())
+                self.shown = True
+            else:
+                self.stream.write(self.status() + '\n')
+            self.stream.flush()
+
+        if self.metrics_file is not None:
+            self.write_metrics()
+
+    def clear(self):
+        """Clear the status line, e.g. to write a log line."""
+        if self.shown:
+            self.stream.write('\r\033[K')
+            self.stream.flush()
+            self.shown = False
+            # Redraw it at the next chance
+            self.refreshed = 0.0
+
+    def finish(self):
+        """Show the final progress."""
+        if self.filename is not None:
+            self.files_done += 1
+            self.filename = None
+
+        self.refresh(force=True)
+        if self.shown:
+            self.stream.write('\n')
+            self.stream.flush()
+            self.shown = False
+
+    def metrics(self):
+        """The metrics in Prometheus text format."""
+        lines = []
+
+        for name, type_, help_, attribute in METRICS:
+            value = getattr(self, attribute)
+            if value is None:
+                continue
+            lines.append(f"# HELP wagtailimporter_{name} {help_}")
+            lines.append(f"# TYPE wagtailimporter_{name} {type_}")
+            lines.append(f"wagtailimporter_{name} {value}")
+
+        if self.queues:
+            lines.append("# HELP wagtailimporter_queue_depth Documents "
+                         "waiting between stages of the pipeline.")
+            lines.append("# TYPE wagtailimporter_queue_depth gauge")
+            lines.extend(
+                f'wagtailimporter_queue_depth{{queue="{stats.name}"}} '
+                f'{stats.queue.qsize()}'
+                for stats in self.queues)
+
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self):
+        """
+        Write the metrics file, replacing it in one go so it is never read
+        half written.
+        """
+        temp = f'{self.metrics_file}.{os.getpid()}.tmp'
+        with open(temp, 'w', encoding='utf-8') as file_:
+            file_.write(self.metrics())
+        os.replace(temp, self.metrics_file)
+
+
+def current():
+    """The Progress tracking the import in this context, or None."""
+    return _current.get()
+
+
+def media_stored(nbytes):
+    """Count the bytes of a stored media file, if progress is tracked."""
+    progress = _current.get()
+    if progress is not None:
+        progress.media_stored(nbytes)
@@ -0,0 +1,157 @@
+"""
+Links by URL path and file name in rich text.
+
+Rich text can link to pages, documents and images with attributes naming
+them the same way as the `!page', `!document' and `!image' tags:
+
+    <a data-import-page-url="/about-us/">About us</a>
+    <a data-import-document="report.pdf">Our report</a>
+    <embed data-import-image="photo.jpg" format="fullwidth" alt="A photo"/>
+
+These are rewritten to the database ids Wagtail stores rich text with:
+
+    <a linktype="page" id="3">About us</a>
+    <a linktype="document" id="7">Our report</a>
+    <embed embedtype="image" id="12" format="fullwidth" alt="A photo"/>
+
+Links are found in every string of a document, so they work in rich text
+fields and in RichTextBlocks alike. All the links in a document are
+resolved together, with one query per model.
+"""
+import copy
+import html
+import re
+from collections import namedtuple
+
+import yaml
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import CommandError
+
+from . import serializer
+
+PREFIX = 'data-import-'
+
+FIND_ATTRIBUTE = re.compile(
+    r'\b(data-import-[a-z-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+class Link(namedtuple('Link', ('attribute', 'value'))):
+    """A link in rich text, as an attribute and its (unescaped) value."""
+    __slots__ = ()
+
+    @classmethod
+    def from_match(cls, match):
+        """Make a link from a FIND_ATTRIBUTE match."""
+        value = match.group(2) if match.group(2) is not None \
+            else match.group(3)
+        return cls(match.group(1), html.unescape(value))
+
+    def reference(self):
+        """A YAML object referring to the link's target."""
+        tag, key, _ = ATTRIBUTES[self.attribute]
+        return tag(**{key: self.value})
+
+
+# Attribute -> (tag, tag parameter, Wagtail attribute)
+ATTRIBUTES = {
+    'data-import-page-url': (serializer.Page, 'url', 'linktype="page"'),
+    'data-import-document': (serializer.Document, 'file',
+                             'linktype="document"'),
+    'data-import-image': (serializer.Image, 'file', 'embedtype="image"'),
+}
+
+
+def iter_links(value):
+    """Generate every link in the strings of a parsed document."""
+    if isinstance(value, str):
+        if PREFIX in value:
+            for match in FIND_ATTRIBUTE.finditer(value):
+                if match.group(1) in ATTRIBUTES:
+                    yield Link.from_match(match)
+        return
+
+    if isinstance(value, yaml.YAMLObject):
+        value = vars(value)
+
+    if isinstance(value, dict):
+        for elem in value.values():
+            yield from iter_links(elem)
+
+    elif isinstance(value, list):
+        for elem in value:
+            yield from iter_links(elem)
+
+
+def iter_references(value):
+    """
+    Generate a YAML object for each link in the strings of a parsed
+    document, e.g. to validate them.
+    """
+    for link in iter_links(value):
+        yield link.reference()
+
+
+def rewrite_links(doc):
+    """
+    Rewrite the links in the strings of a parsed document, returning the
+    rewritten document. The document itself isn't changed.
+
+    Raises CommandError if a link's target can't be found.
+    """
+    references = {link: link.reference() for link in iter_links(doc)}
+    if not references:
+        return doc
+
+    by_tag = {}
+    for ref in references.values():
+        by_tag.setdefault(type(ref), []).append(ref)
+    for tag, refs in by_tag.items():
+        tag.bulk_get_objects(refs)
+
+    ids = {}
+    for link, ref in references.items():
+        try:
+            ids[link] = ref.get_object().pk
+        except (ObjectDoesNotExist, ValueError) as exc:
+            raise CommandError(
+                f"Can't find {link.value} for {link.attribute}: {exc}") \
+                from exc
+
+    return rewrite(doc, ids)
+
+
+def rewrite(value, ids):
+    """
+    Rewrite the links in `value' to the ids in `ids', returning the new
+    value. Containers with links in are copied rather than changed.
+    """
+    if isinstance(value, str):
+        if PREFIX not in value:
+            return value
+
+        def replace(match):
+            link = Link.from_match(match)
+            if link not in ids:
+                return match.group(0)
+            _, _, markup = ATTRIBUTES[link.attribute]
+            return f'{markup} id="{ids[link]}"'
+
+        return FIND_ATTRIBUTE.sub(replace, value)
+
+    if isinstance(value, yaml.YAMLObject):
+        attrs = rewrite(vars(value), ids)
+        if attrs is not vars(value):
+            value = copy.copy(value)
+            value.__dict__ = attrs
+
+    elif isinstance(value, dict):
+        new = {key: rewrite(elem, ids) for key, elem in value.items()}
+        if any(new[key] is not elem for key, elem in value.items()):
+            value = new
+
+    elif isinstance(value, list):
+        new = [rewrite(elem, ids) for elem in value]
+        if any(a is not b for a, b in zip(new, value)):
+            value = new
+
+    return value
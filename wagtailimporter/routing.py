@@ -0,0 +1,119 @@
+"""
+Read objects that existed before an import from a read database.
+
+Lookups of existing objects (referenced pages, images, snippets, content
+types) can be sent to a read replica, to take load off the database being
+written to. An object is only used from the read database if it hasn't been
+written during the import; otherwise, or if it isn't found there (perhaps
+because the replica is behind), it is looked up in the database it would be
+written to, as usual.
+
+Objects read from the read database are moved to the database they would be
+written to, so following their relations doesn't touch the replica. Objects
+that are going to be saved shouldn't be read from it, though: every field
+would be written back, overwriting anything changed since the replica was
+last updated.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+
+# The ReadDatabase in use in this context
+_current = ContextVar('wagtailimporter_read_database', default=None)
+
+
+def root_model(model):
+    """
+    The model at the top of a model's inheritance chain, which shares its
+    primary keys.
+    """
+    parents = model._meta.get_parent_list()
+    return parents[-1] if parents else model._meta.concrete_model
+
+
+class ReadDatabase:
+    """
+    Read existing objects from the database `alias', while remembering the
+    objects written during the import.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        # Root model -> ids of its objects written, which is smaller than a
+        # set of (model, id) pairs
+        self.written = {}
+
+    def mark_written(self, objs):
+        """Remember objects written to the database."""
+        for obj in objs:
+            self.written.setdefault(root_model(type(obj)), set()).add(obj.pk)
+
+    def get(self, queryset, **kwargs):
+        """
+        Get an object that existed before the import from the read
+        database, or None.
+        """
+        model = queryset.model
+
+        try:
+            obj = queryset.using(self.alias).get(**kwargs)
+        except model.DoesNotExist:
+            return None
+
+        if obj.pk in self.written.get(root_model(model), ()):
+            return None
+
+        obj._state.db = router.db_for_write(model)
+        return obj
+
+
+@contextmanager
+def use(read_database):
+    """
+    Use `read_database', a ReadDatabase, for get_existing() in this
+    context. Does nothing if it is None.
+    """
+    if read_database is None:
+        yield
+        return
+
+    token = _current.set(read_database)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def get_existing(queryset, **kwargs):
+    """
+    Get an object that existed before the import from the read database, if
+    one is in use.
+
+    Returns None if there is no read database, or the object has to be looked
+    up as usual.
+    """
+    read_database = _current.get()
+    if read_database is None:
+        return None
+
+    return read_database.get(queryset, **kwargs)
+
+
+def mark_written(objs):
+    """
+    Remember objects written without sending signals, e.g. with
+    bulk_create().
+    """
+    read_database = _current.get()
+    if read_database is not None:
+        read_database.mark_written(objs)
+
+
+def _record_write(instance, **kwargs):  # pylint:disable=unused-argument
+    mark_written([instance])
+
+
+post_save.connect(_record_write, dispatch_uid='wagtailimporter.routing')
+post_delete.connect(_record_write, dispatch_uid='wagtailimporter.routing')
@@ -0,0 +1,49 @@
+"""
+Keep the files an import reads under one directory.
+
+Import files name other files to read: fragment files (`!include'), media
+files (`!image' and `!document') and template parameters (`!template').
+Within `use(root)', any of these that resolve (following symlinks) outside
+`root' are refused, so an import from an untrusted source, like a bundle
+uploaded through the admin (see `wagtailimporter.jobs'), can't read other
+files on the server.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+# The directory files must be under in this context
+_root = ContextVar('wagtailimporter_sandbox_root', default=None)
+
+
+@contextmanager
+def use(root):
+    """Only read files under the directory `root' in this context."""
+    token = _root.set(None if root is None else Path(root).resolve())
+    try:
+        yield
+    finally:
+        _root.reset(token)
+
+
+def current():
+    """The directory files must be under in this context, or None."""
+    return _root.get()
+
+
+def is_under(path, root):
+    """Whether `path' resolves to somewhere under the directory `root'."""
+    path = Path(path).resolve()
+    root = Path(root).resolve()
+    return path == root or root in path.parents
+
+
+def check(path, error=PermissionError):
+    """
+    Check that a file to be read is under the directory files must be under
+    in this context, if there is one, raising `error' if it isn't.
+    """
+    root = _root.get()
+    if root is not None and not is_under(path, root):
+        raise error(f"{path} is outside {root}")
+    return path
@@ -1,12 +1,18 @@
 """
 Objects for YAML serializer/deserializer
 """
+import contextvars
+import hashlib
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import PurePosixPath
 
 import yaml
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.images import get_image_dimensions
+from django.db import models
 from wagtail.contrib.settings.registry import registry
 from wagtail.coreutils import string_to_ascii
 from wagtail.fields import StreamField
@@ -14,6 +20,10 @@ from wagtail.models import Page as WagtailPage
 from wagtail.models import Site as WagtailSite
 from wagtail.documents.models import Document as WagtailDocument
 from wagtail.images.models import Image as WagtailImage
+from wagtail.search.backends import get_search_backends
+
+from . import pathindex, routing, sandbox, storageindex
+from .media import store_file
 
 LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +38,34 @@ def normalise(url):
     return url
 
 
+def iter_references(value):
+    """
+    Generate every YAML object in a parsed document, including those nested
+    inside other YAML objects.
+    """
+    if isinstance(value, yaml.YAMLObject):
+        yield value
+        value = vars(value)
+
+    if isinstance(value, dict):
+        for elem in value.values():
+            yield from iter_references(elem)
+
+    elif isinstance(value, list):
+        for elem in value:
+            yield from iter_references(elem)
+
+
+def locate_media(value, base_dir):
+    """
+    Find the files for media references in a parsed document relative to
+    `base_dir', rather than the current directory.
+    """
+    for ref in iter_references(value):
+        if isinstance(ref, MediaFile):
+            ref._base_dir = base_dir  # noqa: E501 pylint:disable=protected-access
+
+
 class JSONSerializable:
     """Interface to objects which are serializable into JSON."""
 
@@ -76,12 +114,46 @@ class JSONEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+class Shared(FieldStorable, JSONSerializable):
+    """
+    A tag-free field value shared by many documents, e.g. the pages made
+    from one template, so it is only converted and serialized once.
+    """
+
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+        self._json = None
+
+    def __to_value__(self):
+        return self.value
+
+    def __to_json__(self):
+        return self.value
+
+    def __getstate__(self):
+        # Pickled the same whether or not it has been serialized
+        return {'value': self.value, '_json': None}
+
+    def dumps(self):
+        """The value serialized as JSON, e.g. for a StreamField."""
+        if self._json is None:
+            self._json = json.dumps(self.value, cls=JSONEncoder)
+        return self._json
+
+
 class GetForeignObject(FieldStorable, yaml.YAMLObject):
     """
     Get a foreign key reference for the provided parameters
     """
 
     yaml_loader = yaml.SafeLoader
+    yaml_dumper = yaml.SafeDumper
+
+    def __init__(self, **kwargs):
+        # Not called when loaded from YAML
+        super().__init__()
+        self.__dict__.update(kwargs)
 
     @property
     def model(self):
@@ -110,17 +182,46 @@ class GetForeignObject(FieldStorable, yaml.YAMLObject):
             if hasattr(self, field)
         }
 
+    # Whether the object may be read from the read database (see
+    # `wagtailimporter.routing'). Objects that will be saved are read from
+    # the primary, so a lagging replica can't overwrite newer data.
+    read_database = True
+
+    def get_existing(self, lookup):
+        """
+        Get the object from the read database, if it may be read from there,
+        or None.
+        """
+        if not self.read_database:
+            return None
+        return routing.get_existing(self.model.objects, **lookup)
+
     def get_object(self):
         """
         Get the object from the database.
         """
-        return self.model.objects.get(**self.lookup())
+        lookup = self.lookup()
+        return self.get_existing(lookup) or self.model.objects.get(**lookup)
+
+    @classmethod
+    def from_instance(cls, obj):
+        """
+        Make a reference to an existing object, using its lookup keys.
+        """
+        return cls(**{
+            field: getattr(obj, field)
+            for field in cls.lookup_keys
+        })
 
     def __to_value__(self):
         obj = self.get_object()
-        lookup = self.lookup()
+        self.update_object(obj, self.lookup())
+        return obj
 
-        # update the object with any remaining keys
+    def update_object(self, obj, lookup):
+        """
+        Update an object with the fields that weren't used to find it.
+        """
         for field in self.model._meta.get_fields():
 
             # Skip fields used to find the instance
@@ -137,8 +238,6 @@ class GetForeignObject(FieldStorable, yaml.YAMLObject):
 
                 setattr(obj, field.name, value)
 
-        return obj
-
 
 # pylint:disable=abstract-method
 class GetOrCreateForeignObject(GetForeignObject):
@@ -166,8 +265,11 @@ class GetOrCreateForeignObject(GetForeignObject):
         return defaults
 
     def get_object(self):
-        obj, _ = self.model.objects.get_or_create(**self.lookup(),
-                                                  defaults=self.get_defaults())
+        lookup = self.lookup()
+        obj = self.get_existing(lookup)
+        if obj is None:
+            obj, _ = self.model.objects.get_or_create(
+                **lookup, defaults=self.get_defaults())
         return obj
 
 
@@ -177,14 +279,84 @@ class GetOrCreateClusterableForeignObject(GetForeignObject):
     assuming the parent of this object is a ClusterableModel.
     """
 
+    # Saved along with the parent
+    read_database = False
+
     def get_object(self):
         try:
             return super().get_object()
         except self.model.DoesNotExist:
             return self.model(**self.lookup())
+
+    @staticmethod
+    def bulk_to_objects(refs, children):
+        """
+        Convert a list of references to the children of one object, matching
+        them against its existing `children' in memory instead of querying
+        for each. Unmatched references become new, unsaved objects.
+
+        Returns the objects and the children that weren't matched, or None
+        if a reference can't be matched in memory (its lookup isn't on the
+        model's own fields).
+        """
+        index = {}
+        objects = []
+
+        for ref in refs:
+            lookup = ref.lookup()
+            key = lookup_key(ref.model, lookup)
+            if key is None:
+                return None
+
+            # Index the children by each set of fields that is looked up
+            attnames = tuple(attname for attname, _ in key)
+            if (ref.model, attnames) not in index:
+                index[ref.model, attnames] = matches = {}
+                for child in children:
+                    if isinstance(child, ref.model):
+                        matches.setdefault(tuple(
+                            (attname, getattr(child, attname))
+                            for attname in attnames
+                        ), []).append(child)
+
+            matched = index[ref.model, attnames].get(key)
+            obj = matched.pop(0) if matched else ref.model(**lookup)
+            ref.update_object(obj, lookup)
+            objects.append(obj)
+
+        remaining = {id(obj) for obj in objects}
+        return objects, [child for child in children
+                         if id(child) not in remaining]
 # pylint:enable=abstract-method
 
 
+def lookup_key(model, lookup):
+    """
+    The values of a lookup as a hashable key of (attname, value) pairs,
+    with related objects as their primary keys, or None if the lookup isn't
+    on concrete fields of `model'.
+    """
+    key = []
+
+    for name, value in sorted(lookup.items()):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+        if not field.concrete or field.many_to_many:
+            return None
+
+        if isinstance(value, models.Model):
+            value = value.pk
+        elif not field.is_relation:
+            # Compare values as they'd come back from the database
+            value = field.to_python(value)
+        key.append((field.attname, value))
+
+    return tuple(key)
+
+
 class Page(FieldStorable, JSONSerializable, yaml.YAMLObject):
     """
     A reference to a page
@@ -192,18 +364,75 @@ class Page(FieldStorable, JSONSerializable, yaml.YAMLObject):
 
     yaml_tag = '!page'
     yaml_loader = yaml.SafeLoader
+    yaml_dumper = yaml.SafeDumper
+
+    def __init__(self, url=None):
+        # Not called when loaded from YAML
+        super().__init__()
+        self.url = url
+
+    @classmethod
+    def from_instance(cls, page):
+        """
+        Make a reference to an existing page.
+        """
+        return cls(url=page.url_path)
+
+    # Page resolved ahead of time by bulk_get_objects()
+    _object = None
 
     def get_object(self):
         """
         Retrieve the page object.
         """
+        if self._object is not None:
+            return self._object
+
         # pylint:disable=no-member
         url = PurePosixPath(self.url)
 
         if not url.is_absolute():
             raise ValueError("URL must be absolute")
 
-        return WagtailPage.objects.only('id').get(url_path=normalise(url))
+        page = pathindex.get_page(normalise(url))
+        if page is None:
+            pages = WagtailPage.objects.only('id', 'url_path')
+            page = routing.get_existing(pages, url_path=normalise(url)) \
+                or pages.get(url_path=normalise(url))
+            pathindex.add(page)
+
+        return page
+
+    @classmethod
+    def bulk_get_objects(cls, refs):
+        """
+        Resolve many page references at once.
+
+        Pages that aren't in the URL path index are found with a single
+        query. References to pages that aren't found are left to fail when
+        they are resolved.
+        """
+        by_url = {}
+        for ref in refs:
+            by_url.setdefault(normalise(ref.url), []).append(ref)
+
+        pages = {}
+        for url in by_url:
+            page = pathindex.get_page(url)
+            if page is not None:
+                pages[url] = page
+
+        missing = [url for url in by_url if url not in pages]
+        if missing:
+            # pylint:disable=no-member
+            for page in WagtailPage.objects.only('id', 'url_path')\
+                    .filter(url_path__in=missing):
+                pathindex.add(page)
+                pages[page.url_path] = page
+
+        for url, url_refs in by_url.items():
+            for ref in url_refs:
+                ref._object = pages.get(url)  # noqa: E501 pylint:disable=protected-access
 
     def __to_value__(self):
         return self.get_object()
@@ -212,7 +441,59 @@ class Page(FieldStorable, JSONSerializable, yaml.YAMLObject):
         return self.get_object().id
 
 
-class Image(JSONSerializable, GetOrCreateForeignObject):
+class MediaFile:
+    """
+    Mixin for references to media files, which are imported from `folder'.
+    """
+
+    folder = None
+    file = None  # expected parameter
+
+    # Directory the import file is in, set by locate_media()
+    _base_dir = None
+
+    @property
+    def source_path(self):
+        """
+        Path of the file to import, which must be in the directory files are
+        confined to, if any (see `wagtailimporter.sandbox').
+        """
+        return sandbox.check(
+            os.path.join(self._base_dir or '', self.folder, self.file))
+
+    @property
+    def storage(self):
+        """Storage for the model's files."""
+        return self.model._meta.get_field('file').storage
+
+    def store(self):
+        """Store the file, if it isn't already, returning its name."""
+        # Refuse files outside the sandbox even if they are stored already
+        source_path = self.source_path
+        filename = self.db_filename
+        if not storageindex.exists(self.storage, filename):
+            LOGGER.info("Creating file %s...", filename)
+            filename = store_file(self.storage, filename, source_path)
+        return filename
+
+    def replace(self):
+        """Store the file again after it has changed, returning its name."""
+        if storageindex.exists(self.storage, self.db_filename):
+            self.storage.delete(self.db_filename)
+            storageindex.deleted(self.storage, self.db_filename)
+        return self.store()
+
+    def prepare(self):
+        """
+        Get ready to resolve this reference, without touching the database.
+
+        This is run ahead of the database writes when importing in a
+        pipeline.
+        """
+        self.store()
+
+
+class Image(MediaFile, JSONSerializable, GetOrCreateForeignObject):
     """
     A reference to an image
     """
@@ -220,12 +501,29 @@ class Image(JSONSerializable, GetOrCreateForeignObject):
     yaml_tag = '!image'
     yaml_loader = yaml.SafeLoader
     model = WagtailImage
+    folder = 'images'
 
-    file = None  # expected parameter
+    # The name an existing image's file is stored under, to refer to images
+    # that weren't imported (e.g. uploaded in the admin) instead of `file'
+    stored_file = None
 
     def lookup(self):
         return {'file': self.db_filename}
 
+    @classmethod
+    def from_instance(cls, obj):
+        ref = cls(file=os.path.basename(obj.file.name), title=obj.title)
+        if ref.db_filename != obj.file.name:
+            # Not imported, so `file' wouldn't find it again
+            ref = cls(stored_file=obj.file.name, title=obj.title)
+        return ref
+
+    @property
+    def source_path(self):
+        if self.stored_file is not None:
+            raise OSError(f"No image is stored as {self.stored_file}")
+        return super().source_path
+
     @property
     def db_filename(self):
         """
@@ -234,6 +532,9 @@ class Image(JSONSerializable, GetOrCreateForeignObject):
         This code is taken from Wagtail. We can't call into the Wagtail code
         because it will create unique filenames.
         """
+        if self.stored_file is not None:
+            return self.stored_file
+
         folder_name = "original_images"
         filename = f"images/{self.file.replace('/', '-')}"
         filename = "".join(
@@ -249,27 +550,166 @@ class Image(JSONSerializable, GetOrCreateForeignObject):
 
         return full_path
 
+    # Object resolved ahead of time by bulk_get_objects()
+    _object = None
+    # Unsaved image staged ahead of time by prepare()
+    _staged = None
+
     def get_object(self):
+        if self._object is not None:
+            return self._object
+
         try:
-            return self.model.objects.get(**self.lookup())
+            return GetForeignObject.get_object(self)
         except self.model.DoesNotExist:
-            LOGGER.info("Creating file %s...", self.db_filename)
-
-            storage = self.model._meta.get_field('file').storage
-            filename = self.db_filename
-            if not storage.exists(filename):
-                with open(f"images/{self.file}", 'rb') as source:
-                    filename = storage.save(filename, source)
-
-            image = self.model(file=filename)
+            image = self.model(file=self.store())
             image.save()  # pylint:disable=no-member
             return image
 
+    def stage(self):
+        """
+        Store the image file and read its metadata, returning an unsaved
+        image.
+
+        This doesn't touch the database, so it can be run in a worker thread.
+        """
+        source_path = self.source_path
+        filename = self.db_filename
+
+        if storageindex.exists(self.storage, filename):
+            source = self.storage.open(filename)
+        else:
+            LOGGER.info("Creating file %s...", filename)
+            filename = store_file(self.storage, filename, source_path)
+            source = open(source_path, 'rb')  # noqa: E501 pylint:disable=consider-using-with
+
+        with source:
+            source.seek(0)
+            width, height = get_image_dimensions(source)
+
+            source.seek(0)
+            hasher = hashlib.sha1()
+            for chunk in iter(lambda: source.read(65536), b''):
+                hasher.update(chunk)
+
+            file_size = source.tell()
+
+        return self.model(file=filename,
+                          width=width, height=height,
+                          file_size=file_size,
+                          file_hash=hasher.hexdigest())
+
+    def replace(self):
+        """
+        Store the image file again after it has changed, and update the
+        image's metadata and renditions.
+        """
+        filename = super().replace()
+
+        image = self.model.objects.filter(file=self.db_filename).first()
+        if image is not None:
+            staged = self.stage()
+            image.file = filename
+            image.width, image.height = staged.width, staged.height
+            image.file_size = staged.file_size
+            image.file_hash = staged.file_hash
+            image.save()
+            image.renditions.all().delete()
+
+        return filename
+
+    def prepare(self):
+        """
+        Stage a new image for bulk_get_objects().
+
+        Images whose file is already stored are assumed to exist already, so
+        their files aren't read.
+        """
+        if storageindex.exists(self.storage, self.db_filename):
+            return
+
+        try:
+            self._staged = self.stage()
+        except OSError as exc:
+            # Leave this reference to fail when it is resolved
+            LOGGER.warning("Can't stage %s: %s", self.db_filename, exc)
+
+    @classmethod
+    def bulk_get_objects(cls, refs, max_workers=None):
+        """
+        Resolve many image references at once.
+
+        Existing images are found with a single query. The files for new
+        images are stored and measured in a pool of worker threads and the
+        new images inserted together, rather than one at a time. Each
+        reference then resolves to its image without touching the database.
+        """
+        by_name = {}
+        for ref in refs:
+            by_name.setdefault(ref.db_filename, []).append(ref)
+
+        if not by_name:
+            return
+
+        images = {
+            image.file.name: image
+            for image in cls.model.objects.filter(file__in=list(by_name))
+        }
+
+        missing = [name for name in by_name if name not in images]
+        # Find out which files are stored before the threads check each
+        storageindex.prefetch(cls.model._meta.get_field('file').storage,
+                              missing)
+
+        def stage(name):
+            for ref in by_name[name]:
+                if ref._staged is not None:  # noqa: E501 pylint:disable=protected-access
+                    return name, ref._staged  # noqa: E501 pylint:disable=protected-access
+
+            try:
+                return name, by_name[name][0].stage()
+            except OSError as exc:
+                # Leave this reference to fail when it is resolved
+                LOGGER.warning("Can't stage %s: %s", name, exc)
+                return name, None
+
+        # Files are stored in copies of this context, e.g. to count them
+        contexts = [contextvars.copy_context() for _ in missing]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            staged = {name: image
+                      for name, image in executor.map(
+                          lambda context, name: context.run(stage, name),
+                          contexts, missing)
+                      if image is not None}
+
+        if staged:
+            created = cls.model.objects.bulk_create(staged.values())
+            routing.mark_written(created)
+
+            # Not every database returns the new primary keys
+            if any(image.pk is None for image in created):
+                saved = {
+                    image.file.name: image
+                    for image in cls.model.objects.filter(file__in=[
+                        image.file.name for image in staged.values()])
+                }
+                staged = {name: saved[image.file.name]
+                          for name, image in staged.items()}
+
+            for backend in get_search_backends(with_auto_update=True):
+                backend.add_bulk(cls.model, list(staged.values()))
+
+            images.update(staged)
+
+        for name, name_refs in by_name.items():
+            for ref in name_refs:
+                ref._object = images.get(name)  # noqa: E501 pylint:disable=protected-access
+
     def __to_json__(self):
         return self.__to_value__().id
 
 
-class Document(JSONSerializable, GetOrCreateForeignObject):
+class Document(MediaFile, JSONSerializable, GetOrCreateForeignObject):
     """
     A reference to a document
     """
@@ -277,14 +717,18 @@ class Document(JSONSerializable, GetOrCreateForeignObject):
     yaml_tag = '!document'
     yaml_loader = yaml.SafeLoader
     model = WagtailDocument
+    folder = 'documents'
 
-    # expected parameters
-    file = None
-    title = ''
+    title = ''  # expected parameter
 
     def lookup(self):
         return {'file': self.db_filename}
 
+    @classmethod
+    def from_instance(cls, obj):
+        return cls(file=os.path.relpath(obj.file.name, 'documents'),
+                   title=obj.title)
+
     @property
     def db_filename(self):
         """Generate a filename to store in the database for this Document."""
@@ -294,22 +738,49 @@ class Document(JSONSerializable, GetOrCreateForeignObject):
         path = os.path.join(folder_name, self.file)
         return path
 
+    # Object resolved ahead of time by bulk_get_objects()
+    _object = None
+
     def get_object(self):
+        if self._object is not None:
+            return self._object
+
         try:
-            return self.model.objects.get(**self.lookup())
+            return GetForeignObject.get_object(self)
         except self.model.DoesNotExist:
-            LOGGER.info("Creating file %s...", self.db_filename)
-
-            storage = self.model._meta.get_field('file').storage
-            filename = self.db_filename
-            if not storage.exists(filename):
-                with open(f"documents/{self.file}", 'rb') as source:
-                    filename = storage.save(filename, source)
-
-            doc = self.model(file=filename, title=self.title)
+            doc = self.model(file=self.store(), title=self.title)
             doc.save()  # pylint:disable=no-member
             return doc
 
+    @classmethod
+    def bulk_get_objects(cls, refs):
+        """
+        Resolve many document references at once.
+
+        Existing documents are found with a single query. New documents are
+        created when their references are resolved.
+        """
+        by_name = {}
+        for ref in refs:
+            by_name.setdefault(ref.db_filename, []).append(ref)
+
+        if not by_name:
+            return
+
+        documents = {
+            doc.file.name: doc
+            for doc in cls.model.objects.filter(file__in=list(by_name))
+        }
+
+        # New documents' files are checked when they are resolved
+        storageindex.prefetch(
+            cls.model._meta.get_field('file').storage,
+            [name for name in by_name if name not in documents])
+
+        for name, name_refs in by_name.items():
+            for ref in name_refs:
+                ref._object = documents.get(name)  # noqa: E501 pylint:disable=protected-access
+
     def __to_json__(self):
         return self.__to_value__().id
 
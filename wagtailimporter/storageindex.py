@@ -0,0 +1,151 @@
+"""
+Remember which media files exist in storage during an import.
+
+Resolving a new image or document checks whether its file is already stored,
+which is a round trip per file on a remote storage. A StorageIndex answers
+from a listing of each directory instead (e.g. `original_images/images/'),
+made the first time a file in it is checked. Storages that can check many
+files at once can implement a `bulk_exists' hook instead:
+
+    class MyStorage(Storage):
+        def bulk_exists(self, names):
+            '''Return the names in `names' that exist.'''
+
+which is used for the new images and documents in each batch, and on its own
+for any other file.
+
+The index is kept up to date with the files the importer stores and deletes,
+but not with files stored by anything else during the import, so a new index
+is used for each run.
+"""
+import posixpath
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# The StorageIndex in use in this context
+_current = ContextVar('wagtailimporter_storage_index', default=None)
+
+
+class StorageIndex:
+    """The files known to exist, or not, in storages."""
+
+    def __init__(self):
+        # (storage, name) -> whether the file exists
+        self.known = {}
+        # (storage, directory) -> names of the files in it, or None if it
+        # can't be listed
+        self.listed = {}
+        # Files are checked from the threads staging images
+        self.lock = threading.Lock()
+
+    def exists(self, storage, name):
+        """Whether the file `name' exists in `storage'."""
+        with self.lock:
+            known = self.known.get((storage, name))
+        if known is not None:
+            return known
+
+        if hasattr(storage, 'bulk_exists'):
+            self.prefetch(storage, [name])
+            return self.known[(storage, name)]
+
+        directory, filename = posixpath.split(name)
+        files = self.list_directory(storage, directory)
+        if files is None:
+            return storage.exists(name)
+
+        return filename in files
+
+    def list_directory(self, storage, directory):
+        """
+        Get the names of the files in a directory of `storage', listing it
+        the first time.
+        """
+        with self.lock:
+            if (storage, directory) in self.listed:
+                return self.listed[(storage, directory)]
+
+            try:
+                _, files = storage.listdir(directory)
+                files = set(files)
+            except FileNotFoundError:
+                files = set()
+            except (NotImplementedError, OSError):
+                files = None
+
+            self.listed[(storage, directory)] = files
+            return files
+
+    def prefetch(self, storage, names):
+        """Find out whether the files `names' exist, in one go if we can."""
+        names = list(names)
+        if not names:
+            return
+
+        if hasattr(storage, 'bulk_exists'):
+            existing = set(storage.bulk_exists(names))
+            with self.lock:
+                self.known.update(((storage, name), name in existing)
+                                  for name in names)
+            return
+
+        for directory in {posixpath.dirname(name) for name in names}:
+            self.list_directory(storage, directory)
+
+    def stored(self, storage, name):
+        """Remember a file stored in `storage'."""
+        with self.lock:
+            self.known[(storage, name)] = True
+
+    def deleted(self, storage, name):
+        """Remember a file deleted from `storage'."""
+        with self.lock:
+            self.known[(storage, name)] = False
+
+
+@contextmanager
+def use(index):
+    """Use `index', a StorageIndex, in this context."""
+    token = _current.set(index)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """The StorageIndex in use in this context, or None."""
+    return _current.get()
+
+
+def exists(storage, name):
+    """
+    Whether the file `name' exists in `storage', from the index in use if
+    there is one.
+    """
+    index = _current.get()
+    if index is None:
+        return storage.exists(name)
+    return index.exists(storage, name)
+
+
+def prefetch(storage, names):
+    """Find out whether many files exist, if an index is in use."""
+    index = _current.get()
+    if index is not None:
+        index.prefetch(storage, names)
+
+
+def stored(storage, name):
+    """Remember a file stored in `storage', if an index is in use."""
+    index = _current.get()
+    if index is not None:
+        index.stored(storage, name)
+
+
+def deleted(storage, name):
+    """Remember a file deleted from `storage', if an index is in use."""
+    index = _current.get()
+    if index is not None:
+        index.deleted(storage, name)
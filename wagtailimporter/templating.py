@@ -0,0 +1,161 @@
+"""
+Templates that stamp out many pages from one document.
+
+A `!template' document has a `page' to make for every row of its
+`parameters', with `{name}' in any string replaced by the row's `name':
+
+    !template
+        parameters: locations.csv
+        page:
+            url: /locations/{slug}/
+            type: app.locationpage
+            title: "{name}"
+            hero: !image { file: "{slug}.jpg" }
+            body: [...]
+
+The parameters are a CSV file with a header row, a JSON Lines file of
+objects (found relative to the import file), or a list of mappings. A string
+that is just `{name}' is replaced by the parameter itself, so JSON Lines
+parameters can be numbers, lists and so on. Strings are Python format
+strings, so literal braces are written `{{' and `}}'.
+
+Templates are expanded lazily, a row at a time. The template is compiled
+once: fields that don't depend on the parameters and don't contain tags are
+shared by every page (see `serializer.Shared'), so they are only converted
+and serialized once.
+"""
+import csv
+import string
+from pathlib import Path
+
+import yaml
+
+from . import jsonl, richtext, sandbox, serializer
+
+
+class Template(yaml.YAMLObject):
+    """A template for many pages."""
+
+    yaml_tag = '!template'
+    yaml_loader = yaml.SafeLoader
+    yaml_dumper = yaml.SafeDumper
+
+    def __init__(self, page=None, parameters=None):
+        # Not called when loaded from YAML
+        super().__init__()
+        self.page = page
+        self.parameters = parameters
+
+    def expand(self, base_dir=None):
+        """
+        Generate the pages for the template, finding a parameters file
+        relative to `base_dir'.
+        """
+        page = getattr(self, 'page', None)
+        if not isinstance(page, dict):
+            raise ValueError("!template needs a `page' mapping")
+
+        parts = {key: compile_value(value) for key, value in page.items()}
+        for key, part in parts.items():
+            # Share whole fields, so import_data() can tell they're shared
+            if isinstance(part, Constant) and \
+                    isinstance(part.value, (dict, list)) and part.value:
+                parts[key] = Constant(serializer.Shared(part.value))
+
+        for number, row in enumerate(
+                load_parameters(getattr(self, 'parameters', None), base_dir),
+                start=1):
+            try:
+                yield {key: part(row) for key, part in parts.items()}
+            except KeyError as exc:
+                raise ValueError(
+                    f"!template row {number}: no parameter {exc}") from exc
+
+
+def load_parameters(parameters, base_dir=None):
+    """Generate the rows of a template's parameters."""
+    if isinstance(parameters, list):
+        yield from parameters
+        return
+
+    if not isinstance(parameters, str):
+        raise ValueError("!template `parameters' must be a file or a list")
+
+    path = sandbox.check(Path(base_dir or '') / parameters, ValueError)
+    if path.suffix in jsonl.SUFFIXES:
+        # Parameters are plain values, so no tags are looked up
+        yield from jsonl.load_documents(str(path))
+    elif path.suffix == '.csv':
+        with open(path, encoding='utf-8', newline='') as file_:
+            yield from csv.DictReader(file_)
+    else:
+        raise ValueError(f"Unknown parameters file type {parameters}")
+
+
+def expand(docs, base_dir=None):
+    """Generate documents, expanding any templates among them."""
+    for doc in docs:
+        if isinstance(doc, Template):
+            yield from doc.expand(base_dir)
+        else:
+            yield doc
+
+
+class Constant:
+    """A compiled part of a template that doesn't use the parameters."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, row):
+        return self.value
+
+
+def compile_value(value):
+    """
+    Compile part of a template into a function of a row of parameters.
+    """
+    if isinstance(value, str):
+        parsed = list(string.Formatter().parse(value))
+        names = [name for _, name, _, _ in parsed if name is not None]
+
+        if not names:
+            # Without any `{{' and `}}' escapes
+            value = ''.join(text for text, _, _, _ in parsed)
+            if richtext.PREFIX in value:
+                # Links are rewritten on each page, so can't be shared
+                return lambda row: value
+            return Constant(value)
+
+        if len(names) == 1 and value == '{' + names[0] + '}':
+            return lambda row: row[names[0]]
+
+        return value.format_map
+
+    if isinstance(value, yaml.YAMLObject):
+        # Tags are made for each page, as they're resolved separately
+        cls = type(value)
+        state = compile_value(vars(value))
+
+        def make_tag(row):
+            obj = cls.__new__(cls)
+            obj.__dict__.update(state(row))
+            return obj
+
+        return make_tag
+
+    if isinstance(value, dict):
+        parts = {key: compile_value(elem) for key, elem in value.items()}
+        if all(isinstance(part, Constant) for part in parts.values()):
+            return Constant(value)
+
+        return lambda row: {key: part(row) for key, part in parts.items()}
+
+    if isinstance(value, list):
+        parts = [compile_value(elem) for elem in value]
+        if all(isinstance(part, Constant) for part in parts):
+            return Constant(value)
+
+        return lambda row: [part(row) for part in parts]
+
+    return Constant(value)
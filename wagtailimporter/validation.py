@@ -0,0 +1,268 @@
+"""
+Validate parsed documents before importing them.
+
+Validation doesn't touch the database, so documents can be checked in a pool
+of worker processes before the import transaction is opened.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from pathlib import PurePosixPath
+
+import django
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from wagtail.blocks import (
+    ChooserBlock, FieldBlock, ListBlock, StreamBlock, StructBlock)
+from wagtail.fields import StreamField
+from wagtail.models import Page
+
+from . import cache, richtext, sandbox, serializer
+
+
+class ValidationWarning(str):
+    """
+    A problem with a document that doesn't stop it being imported, as it
+    may not matter once the database is looked at.
+    """
+
+
+def validate_document(doc, base_dir):
+    """
+    Validate a single document, returning a list of error messages.
+
+    Media files are looked for relative to `base_dir'.
+    """
+    errors = []
+
+    for ref in chain(serializer.iter_references(doc),
+                     richtext.iter_references(doc)):
+        errors.extend(validate_reference(ref, base_dir))
+
+    if isinstance(doc, serializer.GetForeignObject):
+        return errors
+
+    if not isinstance(doc, dict):
+        return errors + ["Document must be a page or a tag"]
+
+    try:
+        model = get_page_model(doc)
+    except ValueError as exc:
+        return errors + [str(exc)]
+
+    try:
+        url = PurePosixPath(doc['url'])
+        if not url.is_absolute():
+            errors.append(f"Path {url} must be absolute")
+    except KeyError:
+        errors.append("Need `url' for page")
+    except TypeError:
+        errors.append("`url' must be a string")
+
+    for key, value in doc.items():
+        if key in ('type', 'url'):
+            continue
+
+        try:
+            field = model._meta.get_field(key)
+        except FieldDoesNotExist:
+            # import_data() will also set properties
+            if not hasattr(model, key):
+                errors.append(f"Unknown field `{key}' for {model.__name__}")
+            continue
+
+        if isinstance(value, serializer.Shared):
+            value = value.value
+
+        if isinstance(field, StreamField):
+            errors.extend(f"{key}: {error}" for error in validate_block(
+                field.stream_block, value))
+
+    return errors
+
+
+def get_page_model(doc):
+    """
+    Get the page model class from the `type' of a document, without using
+    the database.
+    """
+    try:
+        type_ = doc['type']
+    except KeyError as exc:
+        raise ValueError("Need `type' for page") from exc
+
+    try:
+        app_label, model_name = type_.split('.')
+        model = apps.get_model(app_label, model_name)
+    except (ValueError, AttributeError) as exc:
+        raise ValueError("`type' is of form `app.model'") from exc
+    except LookupError as exc:
+        raise ValueError(f"Unknown page type `{type_}'") from exc
+
+    if not issubclass(model, Page):
+        raise ValueError(f"`{type_}' is not a page type")
+
+    return model
+
+
+def validate_reference(ref, base_dir):
+    """Validate a YAML object."""
+
+    if isinstance(ref, serializer.Page):
+        url = getattr(ref, 'url', None)
+        if not isinstance(url, str) or not PurePosixPath(url).is_absolute():
+            return [f"!page url {url} must be absolute"]
+        return []
+
+    if not isinstance(ref, serializer.GetForeignObject):
+        return []
+
+    errors = [
+        f"Unknown field `{key}' for {ref.yaml_tag}"
+        for key in vars(ref)
+        if not key.startswith('_') and not has_field(ref.model, key)
+        and not hasattr(ref.model, key)
+        and not (key == 'stored_file' and isinstance(ref, serializer.Image))
+    ]
+
+    if isinstance(ref, serializer.Image) and ref.stored_file is not None:
+        # An existing image, which can only be looked for in the database
+        if not isinstance(ref.stored_file, str):
+            errors.append(f"{ref.yaml_tag} `stored_file' must be a string")
+
+    elif isinstance(ref, (serializer.Image, serializer.Document)):
+        folder = 'images' if isinstance(ref, serializer.Image) \
+            else 'documents'
+
+        if not isinstance(ref.file, str):
+            errors.append(f"{ref.yaml_tag} needs a `file'")
+        elif sandbox.current() is not None and not sandbox.is_under(
+                os.path.join(base_dir, folder, ref.file), sandbox.current()):
+            errors.append(f"{ref.yaml_tag} file {folder}/{ref.file} "
+                          f"is outside {sandbox.current()}")
+        elif not os.path.isfile(os.path.join(base_dir, folder, ref.file)):
+            # Not needed if it has been imported before, but validation
+            # doesn't look in the database to find out
+            errors.append(ValidationWarning(
+                f"{ref.yaml_tag} file {folder}/{ref.file} doesn't exist"))
+
+    return errors
+
+
+def has_field(model, name):
+    """Whether `name' is a field of `model'."""
+    try:
+        model._meta.get_field(name)
+        return True
+    except FieldDoesNotExist:
+        return False
+
+
+def validate_block(block, value, path=''):
+    """
+    Validate the raw value of a StreamField block against its definition.
+
+    Generates error messages.
+    """
+    if isinstance(block, StreamBlock):
+        if not isinstance(value, list):
+            yield f"{path or 'value'} must be a list of blocks"
+            return
+
+        for index, child in enumerate(value):
+            child_path = f'{path}[{index}]'
+            if not isinstance(child, dict) or 'type' not in child:
+                yield f"{child_path} must have a `type'"
+            elif child['type'] not in block.child_blocks:
+                yield f"{child_path}: unknown block type `{child['type']}'"
+            else:
+                yield from validate_block(
+                    block.child_blocks[child['type']],
+                    child.get('value'),
+                    f"{child_path}.{child['type']}")
+
+    elif isinstance(block, StructBlock):
+        if not isinstance(value, dict):
+            yield f"{path} must be a mapping"
+            return
+
+        for name, child in value.items():
+            if name not in block.child_blocks:
+                yield f"{path}: unknown child block `{name}'"
+            else:
+                yield from validate_block(block.child_blocks[name], child,
+                                          f"{path}.{name}")
+
+    elif isinstance(block, ListBlock):
+        if not isinstance(value, list):
+            yield f"{path} must be a list"
+            return
+
+        for index, child in enumerate(value):
+            if isinstance(child, dict) and child.get('type') == 'item':
+                child = child.get('value')
+            yield from validate_block(block.child_block, child,
+                                      f"{path}[{index}]")
+
+    elif isinstance(block, ChooserBlock):
+        if not (value is None or isinstance(value, int)
+                or isinstance(value, serializer.JSONSerializable)):
+            yield f"{path} must be an id or a reference"
+
+    elif isinstance(block, FieldBlock):
+        if isinstance(value, serializer.JSONSerializable):
+            return
+
+        try:
+            block.field.clean(value)
+        except ValidationError as exc:
+            yield f"{path}: {'; '.join(exc.messages)}"
+
+
+def _init_worker():
+    """Set up Django in a worker process, if it wasn't forked."""
+    if not apps.ready:
+        django.setup()
+
+
+def _validate_encoded(data, base_dir):
+    """Validate documents sent to a worker process."""
+    return [validate_document(doc, base_dir) for doc in cache.loads(data)]
+
+
+def validate_files(files, jobs=1, chunk_size=100):
+    """
+    Validate parsed files, given as a list of (filename, docs) pairs.
+
+    Generates (filename, document number, error message) for each error,
+    numbering documents from 1. Messages that are ValidationWarnings aren't
+    errors.
+    Documents are validated in `jobs' worker processes, `chunk_size'
+    documents at a time.
+    """
+    tasks = []
+    for filename, docs in files:
+        base_dir = os.path.dirname(os.path.abspath(filename))
+        for start in range(0, len(docs), chunk_size):
+            tasks.append((filename, start, base_dir,
+                          docs[start:start + chunk_size]))
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 initializer=_init_worker) as executor:
+            # Tag objects are sent in the cache format, because the classes
+            # for settings can't be pickled
+            results = executor.map(_validate_encoded, (
+                cache.dumps(docs) for _, _, _, docs in tasks
+            ), (base_dir for _, _, base_dir, _ in tasks))
+            results = list(results)
+    else:
+        results = [
+            [validate_document(doc, base_dir) for doc in docs]
+            for _, _, base_dir, docs in tasks
+        ]
+
+    for (filename, start, _, _), chunk in zip(tasks, results):
+        for index, errors in enumerate(chunk, start=start + 1):
+            for error in errors:
+                yield filename, index, error
@@ -0,0 +1,50 @@
+"""
+Wagtail admin views to submit and monitor ImportJobs.
+"""
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.shortcuts import get_object_or_404, redirect, render
+from wagtail.admin.auth import permission_required
+
+from .forms import ImportJobForm
+from .models import ImportJob
+
+PERMISSION = 'wagtailimporter.add_importjob'
+
+
+@permission_required(PERMISSION)
+def index(request):
+    """List the import jobs, newest first."""
+    paginator = Paginator(ImportJob.objects.select_related('submitted_by'),
+                          per_page=20)
+    return render(request, 'wagtailimporter/jobs/index.html', {
+        'page_obj': paginator.get_page(request.GET.get('p')),
+    })
+
+
+@permission_required(PERMISSION)
+def create(request):
+    """Upload a bundle to import."""
+    if request.method == 'POST':
+        form = ImportJobForm(request.POST, request.FILES)
+        if form.is_valid():
+            job = form.save(commit=False)
+            job.submitted_by = request.user
+            job.save()
+            messages.success(request, f"Import of {job} queued.")
+            return redirect('wagtailimporter_jobs:detail', job.pk)
+    else:
+        form = ImportJobForm()
+
+    return render(request, 'wagtailimporter/jobs/create.html', {
+        'form': form,
+    })
+
+
+@permission_required(PERMISSION)
+def detail(request, pk):
+    """Show the progress or results of an import job."""
+    job = get_object_or_404(ImportJob, pk=pk)
+    return render(request, 'wagtailimporter/jobs/detail.html', {
+        'job': job,
+    })
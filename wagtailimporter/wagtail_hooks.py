@@ -0,0 +1,41 @@
+"""
+Add the import jobs to the Wagtail admin.
+"""
+from django.contrib.auth.models import Permission
+from django.urls import include, path, reverse
+from wagtail import hooks
+from wagtail.admin.menu import MenuItem
+
+from . import admin_urls
+from .views import PERMISSION
+
+
+class ImportJobsMenuItem(MenuItem):
+    """A menu item for users who can submit imports."""
+
+    def is_shown(self, request):
+        return request.user.has_perm(PERMISSION)
+
+
+@hooks.register('register_admin_urls')
+def register_admin_urls():
+    """Add the import job views."""
+    return [
+        path('import-jobs/', include(admin_urls,
+                                     namespace='wagtailimporter_jobs')),
+    ]
+
+
+@hooks.register('register_admin_menu_item')
+def register_menu_item():
+    """Add the import jobs to the menu."""
+    return ImportJobsMenuItem("Imports",
+                              reverse('wagtailimporter_jobs:index'),
+                              icon_name='doc-full-inverse', order=1000)
+
+
+@hooks.register('register_permissions')
+def register_permissions():
+    """Let groups be given permission to submit imports."""
+    return Permission.objects.filter(content_type__app_label='wagtailimporter',
+                                     codename='add_importjob')
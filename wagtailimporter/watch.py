@@ -0,0 +1,322 @@
+"""
+Watch a directory and re-import what changes.
+
+Import files and media files under the directory are watched with inotify,
+where the C library has it, or by polling. When an import file changes,
+only the documents in it that are new or different are imported again; when
+a media file changes, it is stored again and the documents that refer to it
+are imported again, and likewise for fragment files that are included.
+
+The same Importer is used for every run, so its page type and URL path
+caches stay warm between runs (the URL paths are checked against the
+database at the start of each run). Each run is imported in its own
+transaction.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import time
+from itertools import chain
+from pathlib import Path
+
+import yaml
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.db import DatabaseError, transaction
+
+from . import cache, jsonl, richtext, serializer, storageindex
+from .importer import FAILED
+
+IMPORT_SUFFIXES = ('.yml', '.yaml') + jsonl.SUFFIXES
+
+# inotify(7) events
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+
+IN_EVENTS = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+             | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+             | IN_MOVE_SELF)
+
+
+class Inotify:
+    """
+    Wait for changes in directories with inotify(7).
+
+    Raises OSError if inotify isn't available.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        try:
+            self.add_watch = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except AttributeError as exc:
+            raise OSError("inotify is not available") from exc
+
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def close(self):
+        """Stop watching."""
+        os.close(self.fd)
+
+    def watch(self, directory):
+        """Watch a directory (not recursively)."""
+        if self.add_watch(self.fd, os.fsencode(directory), IN_EVENTS) < 0:
+            raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+
+    def wait(self, timeout=None):
+        """Wait for an event, or `timeout' seconds."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            self.drain()
+
+    def drain(self):
+        """Discard the events read so far."""
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class Watcher:
+    """
+    Find the files that change under `directory'.
+
+    Changes are found by comparing the size and modification time of every
+    file between scans. Scans are started by inotify where available, and
+    otherwise every `interval' seconds.
+    """
+
+    # Seconds between scans when polling
+    interval = 1.0
+    # Seconds to wait for a burst of changes to finish
+    settle = 0.1
+
+    def __init__(self, directory, use_inotify=True):
+        self.directory = Path(directory).resolve()
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                pass
+
+        self.files = self.scan()
+
+    def close(self):
+        """Stop watching."""
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def scan(self):
+        """
+        Get the size and modification time of every file, ignoring hidden
+        files (e.g. editor swap files).
+        """
+        files = {}
+
+        for root, dirs, filenames in os.walk(self.directory):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+
+            if self.inotify is not None:
+                # Watching is idempotent, so new directories can be added on
+                # every scan
+                self.inotify.watch(root)
+
+            for name in filenames:
+                if name.startswith('.') or name.endswith('~'):
+                    continue
+
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return files
+
+    def changes(self, timeout=None):
+        """
+        Wait for files to be added, changed or removed and return their
+        paths.
+
+        Returns an empty set if nothing changed within `timeout' seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            remaining = None if deadline is None \
+                else max(0.0, deadline - time.monotonic())
+
+            if self.inotify is not None:
+                self.inotify.wait(remaining)
+            else:
+                time.sleep(self.interval if remaining is None
+                           else min(self.interval, remaining))
+
+            time.sleep(self.settle)
+            if self.inotify is not None:
+                self.inotify.drain()
+
+            files = self.scan()
+            changed = {path for path in files.keys() | self.files.keys()
+                       if files.get(path) != self.files.get(path)}
+            self.files = files
+
+            if changed or (deadline is not None
+                           and time.monotonic() >= deadline):
+                return changed
+
+
+def digest(doc):
+    """A digest of a parsed document's contents."""
+    return hashlib.sha1(cache.dumps([doc])).hexdigest()
+
+
+class Watch:
+    """
+    Keep the documents under `directory' imported with `importer'.
+    """
+
+    def __init__(self, importer, directory, use_inotify=True):
+        self.importer = importer
+        self.watcher = Watcher(directory, use_inotify=use_inotify)
+
+        # Import file -> digests of the documents last imported from it
+        self.imported = {}
+        # Media source file -> import files that refer to it
+        self.media = {}
+        # Fragment file -> import files that include it
+        self.fragments = {}
+
+    @property
+    def import_files(self):
+        """The import files in the directory, in order."""
+        return sorted(path for path in self.watcher.files
+                      if path.suffix in IMPORT_SUFFIXES
+                      and path not in self.fragments)
+
+    def run(self):
+        """Import everything, then re-import changes until interrupted."""
+        try:
+            self.import_changes(self.import_files)
+
+            while True:
+                self.import_changes(self.watcher.changes())
+        finally:
+            self.watcher.close()
+
+    def import_changes(self, paths):
+        """
+        Import the documents affected by changes to `paths', returning a list
+        of ImportResult.
+
+        Errors are reported rather than raised, so watching can carry on.
+        """
+        changed_media = {path for path in paths if path in self.media}
+        files = {path for path in paths if path.suffix in IMPORT_SUFFIXES
+                 and path not in self.fragments}
+        for path in changed_media:
+            files.update(self.media[path])
+        for path in paths:
+            files.update(self.fragments.get(path, ()))
+
+        imported = {}
+        replaced = set()
+
+        try:
+            with transaction.atomic(), \
+                    storageindex.use(storageindex.StorageIndex()):
+                self.importer.paths.revalidate()
+                self.importer.fragments.revalidate()
+
+                results = []
+                for path in sorted(files):
+                    results.extend(self.import_file(
+                        path, changed_media, replaced, imported))
+        except (CommandError, ValueError, OSError, yaml.YAMLError,
+                ValidationError, DatabaseError) as exc:
+            self.importer.error(f"Error importing changes: {exc}")
+            return []
+
+        # Only remember what was imported once it has been committed
+        for path, digests in imported.items():
+            if digests is None:
+                self.imported.pop(path, None)
+            else:
+                self.imported[path] = digests
+
+        return results
+
+    def import_file(self, path, changed_media, replaced, imported):
+        """
+        Import the documents in an import file that are new, have changed, or
+        refer to changed media.
+
+        Changed media files are stored again the first time they are found,
+        and added to `replaced'. The digests of the documents imported are
+        put in `imported'.
+        """
+        if not path.exists():
+            imported[path] = None
+            return []
+
+        self.importer.start_file(path)
+
+        base_dir = path.parent
+        previous = self.imported.get(path, set())
+        digests = set()
+        docs = []
+        keys = []
+
+        for doc in self.importer.load_file(str(path)):
+            serializer.locate_media(doc, base_dir)
+            key = digest(doc)
+            digests.add(key)
+
+            links = list(richtext.iter_references(doc))
+            serializer.locate_media(links, base_dir)
+
+            media = set()
+            for ref in chain(serializer.iter_references(doc), links):
+                # Images referred to by their stored name have no file
+                if isinstance(ref, serializer.MediaFile) \
+                        and ref.file is not None:
+                    source = Path(ref.source_path)
+                    media.add(source)
+                    if source in changed_media and source not in replaced:
+                        ref.replace()
+                        replaced.add(source)
+
+            for source in media:
+                self.media.setdefault(source, set()).add(path)
+
+            if key not in previous or media & changed_media:
+                docs.append(doc)
+                keys.append(key)
+
+        for fragment in self.importer.fragments.used.get(str(path), ()):
+            self.fragments.setdefault(fragment, set()).add(path)
+
+        results = self.importer.import_documents(docs, base_dir=base_dir)
+
+        # Try documents that failed again next time
+        digests.difference_update(key for key, result in zip(keys, results)
+                                  if result.action == FAILED)
+        imported[path] = digests
+
+        return results